@@ -0,0 +1,168 @@
+# core/async_views.py
+import asyncio
+from functools import wraps
+
+from django.contrib import messages
+from django.http import HttpResponseBadRequest
+from django.shortcuts import render, redirect
+
+from . import queries
+from .cache import cliente_resolver
+from .mongo import async_registry, token_is_verified, verified_token
+from .pagination import akeyset_paginate, akeyset_aggregate
+from .rows import row_class
+
+# Versiones asíncronas de las vistas de listado, pensadas para servirse con mongo/asgi.py.
+# Bajo WSGI siguen funcionando, pero cada request crea su propio event loop y su propio cliente.
+
+
+async def aget_mongo_client(request):
+    """
+    Propósito: Versión asíncrona de get_mongo_client basada en AsyncMongoClient.
+
+    Funcionamiento:
+    - Lee las credenciales de la sesión con aget (sin bloquear el event loop).
+    - Pide el cliente a async_registry, que lo reutiliza por credenciales dentro del loop.
+    - Igual que get_mongo_client, no verifica las credenciales si la sesión trae un token
+      de credenciales verificadas vigente.
+    - Retorna None si faltan credenciales o la conexión falla.
+
+    """
+    username = await request.session.aget('mongo_username')
+    password = await request.session.aget('mongo_password')
+    if not username or not password:
+        return None
+    verificado = token_is_verified(await request.session.aget('mongo_verified'), username, password)
+    try:
+        client = await async_registry.get(username, password, verify=not verificado)
+    except Exception:
+        return None
+    if not verificado:
+        await request.session.aset('mongo_verified', verified_token(username, password))
+    return client
+
+
+def amongo_login_required(view_func):
+    """
+    Propósito: Equivalente asíncrono de mongo_login_required.
+    """
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        if not await request.session.ahas_key('mongo_username') or not await request.session.ahas_key('mongo_password'):
+            messages.error(request, 'Por favor, ingrese las credenciales de MongoDB.')
+            return redirect('login')
+        return await view_func(request, *args, **kwargs)
+    return wrapper
+
+
+async def _adb(request):
+    client = await aget_mongo_client(request)
+    if not client:
+        messages.error(request, 'Error al conectar a MongoDB.')
+        return None
+    return client['ecommerce_db']
+
+
+@amongo_login_required
+async def home_view(request):
+    """
+    Propósito: Versión asíncrona de home_view.
+
+    Funcionamiento:
+    - Pide la página de clientes y la de pedidos en paralelo con asyncio.gather,
+      así el tiempo de respuesta es el de la consulta más lenta y no la suma de ambas.
+    - Después resuelve los clientes de los pedidos con cliente_resolver (una consulta $in).
+
+    """
+    db = await _adb(request)
+    if db is None:
+        return redirect('login')
+    clientes, pedidos = await asyncio.gather(
+        akeyset_paginate(request, db['clientes'], {}, prefix='clientes_', row_class=row_class('clientes')),
+        akeyset_paginate(request, db['pedidos'], {}, prefix='pedidos_', row_class=row_class('pedidos')),
+    )
+    await cliente_resolver.aannotate(db, pedidos)
+    return render(request, 'core/home.html', {'clientes': clientes, 'pedidos': pedidos})
+
+
+async def _listado(request, consulta):
+    db = await _adb(request)
+    if db is None:
+        return redirect('login')
+    page = await akeyset_paginate(
+        request, db[consulta.coleccion], consulta.query,
+        sort_key=consulta.sort_key,
+        projection=consulta.projection,
+        descending=consulta.descending,
+        page_size=consulta.page_size,
+        hint=consulta.hint,
+        row_class=row_class(consulta.coleccion),
+    )
+    if consulta.coleccion == 'pedidos':
+        await cliente_resolver.aannotate(db, page)
+    return render(request, f'core/filter_{consulta.coleccion}.html', {consulta.coleccion: page})
+
+
+@amongo_login_required
+async def filter_clientes_ultimo_ano(request):
+    """
+    Propósito: Versión asíncrona de filter_clientes_ultimo_ano.
+    """
+    return await _listado(request, queries.preset('filter_clientes_ultimo_ano'))
+
+
+@amongo_login_required
+async def filter_pedidos_monto_100(request):
+    """
+    Propósito: Versión asíncrona de filter_pedidos_monto_100.
+    """
+    return await _listado(request, queries.preset('filter_pedidos_monto_100'))
+
+
+@amongo_login_required
+async def filter_clientes_gmail(request):
+    """
+    Propósito: Versión asíncrona de filter_clientes_gmail.
+    """
+    return await _listado(request, queries.preset('filter_clientes_gmail'))
+
+
+@amongo_login_required
+async def filter_clientes_dominio(request, dominio):
+    """
+    Propósito: Versión asíncrona de filter_clientes_dominio.
+    """
+    try:
+        consulta = queries.preset('filter_clientes_dominio', {'dominio': dominio})
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc), content_type='text/plain; charset=utf-8')
+    return await _listado(request, consulta)
+
+
+@amongo_login_required
+async def filter_pedidos_2023(request):
+    """
+    Propósito: Versión asíncrona de filter_pedidos_2023.
+    """
+    return await _listado(request, queries.preset('filter_pedidos_2023'))
+
+
+@amongo_login_required
+async def filter_pedidos_producto_101(request):
+    """
+    Propósito: Versión asíncrona de filter_pedidos_producto_101.
+    """
+    return await _listado(request, queries.preset('filter_pedidos_producto_101'))
+
+
+@amongo_login_required
+async def filter_clientes_pedidos_500_ultimo_ano(request):
+    """
+    Propósito: Versión asíncrona de filter_clientes_pedidos_500_ultimo_ano (misma agregación).
+    """
+    db = await _adb(request)
+    if db is None:
+        return redirect('login')
+    pipeline, lookup_clientes, opciones = queries.clientes_pedidos_500_pipeline()
+    clientes_list = await akeyset_aggregate(request, db['pedidos'], pipeline, lookup_clientes, **opciones)
+    return render(request, 'core/filter_clientes.html', {'clientes': clientes_list, 'con_totales': True})
@@ -0,0 +1,113 @@
+# core/bulk.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pymongo.errors import BulkWriteError
+
+DUPLICATE_KEY = 11000
+
+
+class BatchWriter:
+    """
+    Propósito: Escribe lotes con insert_many sin orden desde un pool de hilos pequeño.
+
+    Funcionamiento:
+    - submit(docs, fin) encola un lote; fin es la posición (línea, número de documento...)
+      del último elemento del lote en la entrada.
+    - Limita los lotes en vuelo a 2 × workers: si el pool va atrasado, submit bloquea y la
+      lectura de la entrada se frena (memoria acotada).
+    - Los errores de clave duplicada se cuentan como ya escritos (reanudar es idempotente
+      para documentos con _id propio); el resto se entrega a on_error(doc, error, posicion),
+      donde posicion es la de ese documento en posiciones (submit(docs, fin, posiciones))
+      o None si el lote no las trae.
+    - checkpoint es la mayor posición tal que todos los lotes hasta ella terminaron, aunque
+      los lotes acaben en otro orden; on_progress(writer) se llama tras cada lote.
+    - after_batch(collection, escritos, duplicados) permite escrituras derivadas del mismo
+      lote; duplicados son los documentos que ya existían (por ejemplo, de un lote que se
+      repite al reanudar) y cuyas escrituras derivadas pueden no haberse hecho.
+
+    """
+
+    def __init__(self, collection, workers=4, on_error=None, on_progress=None, after_batch=None):
+        self.collection = collection
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.after_batch = after_batch
+        self.inserted = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.checkpoint = None
+        self.started = time.monotonic()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bulk')
+        self._slots = threading.BoundedSemaphore(workers * 2)
+        self._lock = threading.Lock()
+        self._pending = []  # fines de los lotes enviados, en orden
+        self._done = set()
+        self._errors = []
+
+    def submit(self, docs, fin, posiciones=None):
+        if not docs:
+            with self._lock:
+                self._pending.append(fin)
+                self._done.add(fin)
+                self._advance()
+            return
+        self._slots.acquire()
+        with self._lock:
+            self._pending.append(fin)
+        future = self._executor.submit(self._write, docs, fin, posiciones)
+        future.add_done_callback(self._record_exception)
+
+    def _record_exception(self, future):
+        if future.exception() is not None:
+            with self._lock:
+                self._errors.append(future.exception())
+
+    def _write(self, docs, fin, posiciones=None):
+        try:
+            no_escritos = set()
+            duplicates, failed = [], []
+            try:
+                self.collection.insert_many(docs, ordered=False)
+            except BulkWriteError as exc:
+                for error in exc.details.get('writeErrors', []):
+                    no_escritos.add(error['index'])
+                    if error.get('code') == DUPLICATE_KEY:
+                        duplicates.append(docs[error['index']])
+                    else:
+                        posicion = posiciones[error['index']] if posiciones else None
+                        failed.append((docs[error['index']], error.get('errmsg'), posicion))
+            escritos = [doc for i, doc in enumerate(docs) if i not in no_escritos] if no_escritos else docs
+            if self.after_batch is not None and (escritos or duplicates):
+                self.after_batch(self.collection, escritos, duplicates)
+            for doc, errmsg, posicion in failed:
+                if self.on_error is not None:
+                    self.on_error(doc, errmsg, posicion)
+            with self._lock:
+                self.inserted += len(escritos)
+                self.duplicates += len(duplicates)
+                self.failed += len(failed)
+                self._done.add(fin)
+                self._advance()
+            if self.on_progress is not None:
+                self.on_progress(self)
+        finally:
+            self._slots.release()
+
+    def _advance(self):
+        while self._pending and self._pending[0] in self._done:
+            self.checkpoint = self._pending.pop(0)
+            self._done.discard(self.checkpoint)
+
+    def rate(self):
+        elapsed = time.monotonic() - self.started
+        return self.inserted / elapsed if elapsed else 0.0
+
+    def close(self):
+        """
+        Propósito: Espera a que terminen todos los lotes y relanza el primer error inesperado.
+        """
+        self._executor.shutdown(wait=True)
+        if self._errors:
+            raise self._errors[0]
@@ -0,0 +1,423 @@
+# core/cache.py
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import bson
+import bson.json_util
+from bson import ObjectId
+from django.conf import settings
+from django.core.cache import caches
+from pymongo.errors import InvalidOperation, PyMongoError
+
+from .rows import bson_size, with_field
+
+_VERSION_KEY = 'catalogo:version'
+
+
+def _catalog_setting(name, default):
+    return getattr(settings, 'CATALOG_CACHE', {}).get(name, default)
+
+
+def _shared_cache():
+    return caches[_catalog_setting('ALIAS', 'default')]
+
+
+class _LocalLRU:
+    """
+    Propósito: LRU en memoria del proceso con TTL, límite de entradas y de bytes.
+
+    Funcionamiento:
+    - Cada entrada guarda (vence, valor, tamaño); el tamaño lo calcula quien la inserta.
+    - Un valor más grande que max_bytes no se guarda.
+    - Los límites se leen en cada set() para que los cambios de settings apliquen sin reiniciar.
+
+    """
+
+    def __init__(self, limits):
+        self._limits = limits  # función que retorna (ttl, max_entries, max_bytes)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, now):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value, size = entry
+            if expires_at < now:
+                del self._entries[key]
+                self.bytes -= size
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, size, now, ttl=None):
+        default_ttl, max_entries, max_bytes = self._limits()
+        if size > max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[2]
+            self._entries[key] = (now + (default_ttl if ttl is None else ttl), value, size)
+            self.bytes += size
+            while self._entries and (len(self._entries) > max_entries or self.bytes > max_bytes):
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+
+
+class CatalogCache:
+    """
+    Propósito: Cache versionada del catálogo de productos, en dos niveles.
+
+    Funcionamiento:
+    - El número de versión vive en la cache de Django (compartida entre workers si el
+      backend lo es); invalidar consiste en incrementarlo.
+    - Nivel 1: LRU en memoria del proceso, con TTL, límite de entradas y de bytes (tamaño BSON).
+    - Nivel 2: la cache de Django, con el mismo TTL, bajo la clave catalogo:<db>:<versión>.
+    - Si ninguno tiene la versión vigente, se consulta productos y se llenan ambos niveles.
+    - Lleva contadores de aciertos locales, compartidos y fallos (stats()).
+
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = _LocalLRU(lambda: (
+            _catalog_setting('TTL', 300),
+            _catalog_setting('MAX_ENTRIES', 8),
+            _catalog_setting('MAX_BYTES', 16 * 1024 * 1024),
+        ))
+        self._counters = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def version(self):
+        cache = _shared_cache()
+        version = cache.get(_VERSION_KEY)
+        if version is None:
+            cache.add(_VERSION_KEY, 1, timeout=None)
+            version = cache.get(_VERSION_KEY, 1)
+        return version
+
+    def invalidate(self):
+        cache = _shared_cache()
+        try:
+            cache.incr(_VERSION_KEY)
+        except ValueError:
+            cache.set(_VERSION_KEY, 2, timeout=None)
+        self._count('invalidations')
+
+    def get(self, db):
+        """
+        Propósito: Retorna el catálogo de db como lista de productos con id_producto, nombre y precio.
+
+        Funcionamiento:
+        - La lista es compartida entre requests: quien la use no debe modificarla.
+
+        """
+        if _catalog_setting('CHANGE_STREAM', False):
+            change_stream_listener.ensure_started(db)
+        key = f'catalogo:{db.name}:{self.version()}'
+        now = time.monotonic()
+        productos = self._local.get(key, now)
+        if productos is not None:
+            self._count('local_hits')
+            return productos
+
+        productos = _shared_cache().get(key)
+        if productos is not None:
+            self._count('shared_hits')
+        else:
+            self._count('misses')
+            productos = []
+            for prod in db['productos'].find({}, {'nombre': 1, 'precio': 1}):
+                prod['id_producto'] = str(prod.pop('_id'))
+                productos.append(prod)
+            _shared_cache().set(key, productos, timeout=_catalog_setting('TTL', 300))
+        self._local.set(key, productos, sum(len(bson.encode(p)) for p in productos), now)
+        return productos
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats.update(entries=len(self._local), bytes=self._local.bytes)
+        total = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_ratio'] = (stats['local_hits'] + stats['shared_hits']) / total if total else 0.0
+        return stats
+
+
+def _query_setting(name, default):
+    return getattr(settings, 'QUERY_CACHE', {}).get(name, default)
+
+
+class QueryCache:
+    """
+    Propósito: Cache de resultados de consultas, invalidada por generaciones por colección.
+
+    Funcionamiento:
+    - Cada colección tiene un contador de generación en la cache de Django
+      (generacion:<db>:<colección>); las vistas de inserción lo incrementan con bump().
+    - La clave de un resultado es un hash de la forma normalizada de la consulta (filtro,
+      orden, límite, proyección serializados con json_util y claves ordenadas) junto con
+      la generación de cada colección de la que depende: una inserción deja obsoletas
+      todas las claves anteriores sin tener que recorrerlas.
+    - Los resultados viven en una LRU local con TTL (QUERY_CACHE['TTL'] o TTLS por
+      colección), límite de entradas y de bytes (tamaño BSON).
+    - Single-flight: si varios hilos piden la misma clave ausente, solo uno consulta a
+      MongoDB y el resto espera su resultado.
+
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = _LocalLRU(lambda: (
+            _query_setting('TTL', 60),
+            _query_setting('MAX_ENTRIES', 256),
+            _query_setting('MAX_BYTES', 32 * 1024 * 1024),
+        ))
+        self._inflight = {}
+        self._counters = {'hits': 0, 'misses': 0, 'waits': 0, 'bumps': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _cache(self):
+        return caches[_query_setting('ALIAS', 'default')]
+
+    def generation(self, db_name, coleccion):
+        key = f'generacion:{db_name}:{coleccion}'
+        cache = self._cache()
+        generation = cache.get(key)
+        if generation is None:
+            cache.add(key, 1, timeout=None)
+            generation = cache.get(key, 1)
+        return generation
+
+    def bump(self, db_name, coleccion):
+        key = f'generacion:{db_name}:{coleccion}'
+        cache = self._cache()
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 2, timeout=None)
+        self._count('bumps')
+
+    def key(self, db_name, colecciones, shape):
+        generaciones = [(c, self.generation(db_name, c)) for c in sorted(colecciones)]
+        normalizada = bson.json_util.dumps([db_name, generaciones, shape], sort_keys=True)
+        return 'consulta:' + hashlib.sha1(normalizada.encode('utf-8')).hexdigest()
+
+    def fetch(self, collection, shape, compute, depends_on=()):
+        """
+        Propósito: Retorna el resultado (lista) cacheado para shape o lo calcula con compute().
+
+        Funcionamiento:
+        - collection es la colección consultada; depends_on agrega otras colecciones cuyas
+          inserciones también invalidan el resultado (por ejemplo clientes en un $lookup).
+        - La lista retornada es compartida: quien la use no debe modificarla.
+        - Con QUERY_CACHE['ENABLED'] en False llama directamente a compute().
+
+        """
+        if not _query_setting('ENABLED', True):
+            return compute()
+        colecciones = {collection.name, *depends_on}
+        key = self.key(collection.database.name, colecciones, shape)
+        now = time.monotonic()
+        items = self._local.get(key, now)
+        if items is not None:
+            self._count('hits')
+            return items
+
+        with self._lock:
+            evento = self._inflight.get(key)
+            lider = evento is None
+            if lider:
+                evento = self._inflight[key] = threading.Event()
+        if not lider:
+            self._count('waits')
+            evento.wait(_query_setting('WAIT_TIMEOUT', 30))
+            items = self._local.get(key, time.monotonic())
+            # Si el líder falló o su resultado no cupo en la cache, se consulta directamente
+            return items if items is not None else compute()
+
+        try:
+            self._count('misses')
+            items = compute()
+            ttl = _query_setting('TTLS', {}).get(collection.name)
+            self._local.set(key, items, sum(bson_size(doc) for doc in items), now, ttl=ttl)
+            return items
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            evento.set()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats.update(entries=len(self._local), bytes=self._local.bytes)
+        total = stats['hits'] + stats['misses'] + stats['waits']
+        stats['hit_ratio'] = (stats['hits'] + stats['waits']) / total if total else 0.0
+        return stats
+
+
+class ChangeStreamListener:
+    """
+    Propósito: Invalida el catálogo cuando cambia productos, aunque el cambio venga de otro proceso.
+
+    Funcionamiento:
+    - Se activa con CATALOG_CACHE['CHANGE_STREAM'] (requiere replica set, como Atlas).
+    - Arranca un hilo daemon por proceso que hace watch() sobre productos e invalida
+      la cache en cada evento; si el stream falla, reintenta tras unos segundos.
+    - Tras un fork el hilo no existe en el hijo, por eso se controla el pid.
+
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def ensure_started(self, db):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, args=(db['productos'],), name='catalogo-change-stream', daemon=True).start()
+
+    def _run(self, collection):
+        while True:
+            try:
+                with collection.watch() as stream:
+                    for _ in stream:
+                        catalog_cache.invalidate()
+            except InvalidOperation:
+                # El registro cerró el cliente: el próximo get() arranca otro listener
+                self._pid = None
+                return
+            except PyMongoError:
+                time.sleep(_catalog_setting('CHANGE_STREAM_RETRY', 5))
+
+
+def _cliente_setting(name, default):
+    return getattr(settings, 'CLIENTE_CACHE', {}).get(name, default)
+
+
+_NO_ENCONTRADO = {}
+
+
+class ClienteResolver:
+    """
+    Propósito: Resuelve el nombre y email de los clientes de una página de pedidos con una sola consulta.
+
+    Funcionamiento:
+    - Los pedidos solo guardan cliente_id (texto): resolve() junta los ids distintos de la
+      página, toma de la LRU local los ya conocidos y pide el resto en un solo find con
+      $in y proyección {nombre, email}. Una página cuesta como mucho una consulta extra,
+      sea cual sea su tamaño.
+    - La LRU vive en el proceso, con CLIENTE_CACHE['TTL'] (corto: los datos de un cliente
+      pueden cambiar fuera de la app), MAX_ENTRIES y MAX_BYTES. Los ids que no existen se
+      recuerdan también, para no volver a buscarlos en cada página.
+    - annotate() retorna copias superficiales de los pedidos con la clave cliente: las
+      páginas de query_cache son compartidas y no se modifican.
+    - aresolve()/aannotate() son las versiones para AsyncMongoClient.
+
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = _LocalLRU(lambda: (
+            _cliente_setting('TTL', 60),
+            _cliente_setting('MAX_ENTRIES', 10000),
+            _cliente_setting('MAX_BYTES', 4 * 1024 * 1024),
+        ))
+        self._counters = {'hits': 0, 'misses': 0, 'queries': 0}
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._counters[name] += n
+
+    def _pendientes(self, db, pedidos):
+        # (resueltos desde la LRU, ids a consultar)
+        now = time.monotonic()
+        resueltos, faltantes = {}, []
+        for cliente_id in {str(p.get('cliente_id')) for p in pedidos if p.get('cliente_id')}:
+            cliente = self._local.get(f'cliente:{db.name}:{cliente_id}', now)
+            if cliente is not None:
+                resueltos[cliente_id] = cliente
+            elif ObjectId.is_valid(cliente_id):
+                faltantes.append(cliente_id)
+        self._count('hits', len(resueltos))
+        self._count('misses', len(faltantes))
+        return resueltos, faltantes
+
+    def _guardar(self, db, resueltos, faltantes, encontrados):
+        now = time.monotonic()
+        por_id = {str(doc.pop('_id')): doc for doc in encontrados}
+        for cliente_id in faltantes:
+            cliente = por_id.get(cliente_id, _NO_ENCONTRADO)
+            self._local.set(f'cliente:{db.name}:{cliente_id}', cliente, len(bson.encode(cliente)) + len(cliente_id), now)
+            resueltos[cliente_id] = cliente
+        return {cliente_id: cliente for cliente_id, cliente in resueltos.items() if cliente is not _NO_ENCONTRADO}
+
+    @staticmethod
+    def _consulta(faltantes):
+        return {'_id': {'$in': [ObjectId(cliente_id) for cliente_id in faltantes]}}, {'nombre': 1, 'email': 1}
+
+    def resolve(self, db, pedidos):
+        """
+        Propósito: Retorna {cliente_id: {'nombre', 'email'}} de los clientes de pedidos.
+        """
+        resueltos, faltantes = self._pendientes(db, pedidos)
+        encontrados = []
+        if faltantes:
+            self._count('queries')
+            encontrados = list(db['clientes'].find(*self._consulta(faltantes)))
+        return self._guardar(db, resueltos, faltantes, encontrados)
+
+    async def aresolve(self, db, pedidos):
+        resueltos, faltantes = self._pendientes(db, pedidos)
+        encontrados = []
+        if faltantes:
+            self._count('queries')
+            encontrados = await db['clientes'].find(*self._consulta(faltantes)).to_list()
+        return self._guardar(db, resueltos, faltantes, encontrados)
+
+    @staticmethod
+    def _con_clientes(pedidos, clientes):
+        return [with_field(pedido, 'cliente', clientes.get(str(pedido.get('cliente_id')))) for pedido in pedidos]
+
+    def annotate(self, db, page):
+        """
+        Propósito: Reemplaza los pedidos de page por copias con la clave cliente (o None).
+        """
+        page.items = self._con_clientes(page.items, self.resolve(db, page.items))
+        return page
+
+    async def aannotate(self, db, page):
+        page.items = self._con_clientes(page.items, await self.aresolve(db, page.items))
+        return page
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats.update(entries=len(self._local), bytes=self._local.bytes)
+        total = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / total if total else 0.0
+        return stats
+
+
+catalog_cache = CatalogCache()
+query_cache = QueryCache()
+change_stream_listener = ChangeStreamListener()
+cliente_resolver = ClienteResolver()
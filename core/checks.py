@@ -0,0 +1,38 @@
+# core/checks.py
+from django.conf import settings
+from django.core.checks import Warning, register
+
+from .indexes import unsupported_query_shapes
+from .mongo import get_database_name, get_service_client
+
+
+@register('mongo')
+def check_query_shape_indexes(app_configs, **kwargs):
+    """
+    Propósito: Advierte al iniciar cuando una vista consulta sin un índice que la soporte.
+
+    Funcionamiento:
+    - Solo se ejecuta si MONGO_CHECK_INDEXES_ON_STARTUP es True y hay MONGO_SERVICE_URI.
+    - Usa unsupported_query_shapes y emite un Warning (core.W001) por cada vista sin índice.
+    - Un error de conexión se reporta como core.W002 sin bloquear el arranque.
+
+    """
+    if not getattr(settings, 'MONGO_CHECK_INDEXES_ON_STARTUP', False):
+        return []
+    client = get_service_client()
+    if client is None:
+        return []
+    try:
+        faltantes = unsupported_query_shapes(client[get_database_name()])
+    except Exception as exc:
+        return [Warning(f'No se pudieron verificar los índices de MongoDB: {exc}', id='core.W002')]
+    finally:
+        client.close()
+    return [
+        Warning(
+            f"La vista {vista} consulta {coleccion} por {', '.join(campos)} sin un índice que la soporte.",
+            hint='Ejecute manage.py ensure_indexes.',
+            id='core.W001',
+        )
+        for vista, coleccion, campos in faltantes
+    ]
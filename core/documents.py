@@ -0,0 +1,117 @@
+# core/documents.py
+import unicodedata
+from datetime import datetime
+from decimal import Decimal
+
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+
+CENTAVOS = Decimal('0.01')
+
+
+def email_domain(email):
+    """
+    Propósito: Normaliza el dominio de un email (en minúsculas) para las búsquedas indexadas.
+    """
+    if not email or '@' not in email:
+        return None
+    return email.rsplit('@', 1)[1].strip().lower()
+
+
+def nombre_busqueda(texto):
+    """
+    Propósito: Normaliza un nombre para la búsqueda por prefijo: minúsculas, sin tildes y con
+    espacios simples ("José  Pérez" -> "jose perez").
+    """
+    if not texto:
+        return ''
+    sin_tildes = ''.join(c for c in unicodedata.normalize('NFKD', texto) if not unicodedata.combining(c))
+    return ' '.join(sin_tildes.casefold().split())
+
+
+def build_cliente(cleaned_data):
+    """
+    Propósito: Construye el documento de un cliente a partir de los datos validados de ClienteForm.
+
+    Funcionamiento:
+    - Ajusta fecha_registro a solo fecha (sin hora).
+    - Agrega email_domain normalizado, indexado para los filtros por dominio.
+    - Agrega nombre_busqueda (nombre normalizado), indexado para la búsqueda por prefijo.
+
+    """
+    cliente = dict(cleaned_data)
+    cliente['fecha_registro'] = datetime.combine(cliente['fecha_registro'], datetime.min.time())
+    cliente['email_domain'] = email_domain(cliente['email'])
+    cliente['nombre_busqueda'] = nombre_busqueda(cliente['nombre'])
+    return cliente
+
+
+def build_producto(cleaned_data):
+    """
+    Propósito: Construye el documento de un producto a partir de los datos validados de ProductoForm.
+
+    Funcionamiento:
+    - Usa id_producto como _id (texto) y guarda precio como Decimal128.
+    - Agrega nombre_busqueda como en build_cliente.
+
+    """
+    producto = dict(cleaned_data)
+    producto['_id'] = producto.pop('id_producto')
+    producto['precio'] = Decimal128(str(producto['precio']))
+    producto['nombre_busqueda'] = nombre_busqueda(producto['nombre'])
+    return producto
+
+
+def to_decimal(valor):
+    """
+    Propósito: Convierte un precio (Decimal128, float, int o str) a Decimal sin pasar por float.
+    """
+    if isinstance(valor, Decimal128):
+        return valor.to_decimal()
+    return Decimal(str(valor))
+
+
+def producto_id_query(ids):
+    """
+    Propósito: Construye el filtro $in por _id de productos a partir de ids en texto.
+
+    Funcionamiento:
+    - insert_producto guarda _id como texto; los productos antiguos pueden tener ObjectId,
+      así que también se incluye la versión ObjectId de los ids con formato válido.
+
+    """
+    valores = list(ids)
+    valores += [ObjectId(i) for i in ids if ObjectId.is_valid(i)]
+    return {'_id': {'$in': valores}}
+
+
+def build_pedido(cliente_id, fecha_pedido, productos_por_id, cantidades):
+    """
+    Propósito: Construye el documento de un pedido con aritmética decimal exacta.
+
+    Funcionamiento:
+    - productos_por_id es un dict {id_producto: producto} con nombre y precio.
+    - cantidades es un dict {id_producto: cantidad} (mínimo 1 por producto).
+    - Cada precio y el monto_total se calculan con Decimal y se guardan como Decimal128
+      redondeados a centavos.
+
+    """
+    productos_seleccionados = []
+    monto_total = Decimal('0')
+    for prod_id, cantidad in cantidades.items():
+        prod = productos_por_id[prod_id]
+        cantidad = max(int(cantidad), 1)
+        precio = to_decimal(prod['precio']).quantize(CENTAVOS)
+        productos_seleccionados.append({
+            'producto_id': prod_id,
+            'nombre': prod['nombre'],
+            'precio': Decimal128(precio),
+            'cantidad': cantidad
+        })
+        monto_total += precio * cantidad
+    return {
+        'cliente_id': cliente_id,
+        'fecha_pedido': datetime.combine(fecha_pedido, datetime.min.time()),
+        'monto_total': Decimal128(monto_total.quantize(CENTAVOS)),
+        'productos': productos_seleccionados
+    }
@@ -0,0 +1,99 @@
+# core/exports.py
+import csv
+import zlib
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+
+from .serializers import csv_value, dumps
+
+# Columnas exportables por colección (también definen la proyección)
+COLUMNAS = {
+    'clientes': ['_id', 'nombre', 'email', 'fecha_registro', 'direccion', 'telefono'],
+    'pedidos': ['_id', 'cliente_id', 'fecha_pedido', 'monto_total', 'productos'],
+}
+
+
+class _Echo:
+    # csv.writer escribe en este objeto y recibe la línea ya formateada
+    def write(self, valor):
+        return valor
+
+
+def columnas_pedidas(request, disponibles):
+    """
+    Propósito: Columnas pedidas con ?campos=a,b, limitadas a las disponibles (todas si no se indica).
+    """
+    pedidas = [c.strip() for c in request.GET.get('campos', '').split(',') if c.strip()]
+    return [c for c in pedidas if c in disponibles] or list(disponibles)
+
+
+def projection_for(columnas):
+    projection = {c: 1 for c in columnas}
+    if '_id' not in columnas:
+        projection['_id'] = 0
+    return projection
+
+
+def _csv_lines(cursor, columnas):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columnas)
+    for doc in cursor:
+        yield writer.writerow([csv_value(doc.get(c)) for c in columnas])
+
+
+def _ndjson_lines(cursor):
+    # La proyección ya limitó los campos: el documento se codifica tal cual llega
+    for doc in cursor:
+        yield dumps(doc) + '\n'
+
+
+def _encoded_chunks(lines, comprimir):
+    # Junta líneas en bloques de ~64 KB y, si se pide, los comprime en gzip sobre la marcha
+    chunk_bytes = getattr(settings, 'EXPORT_CHUNK_BYTES', 64 * 1024)
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 31) if comprimir else None
+    buffer, size = [], 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= chunk_bytes:
+            data = ''.join(buffer).encode('utf-8')
+            buffer, size = [], 0
+            yield compresor.compress(data) if compresor else data
+    data = ''.join(buffer).encode('utf-8')
+    if compresor:
+        yield compresor.compress(data) + compresor.flush()
+    elif data:
+        yield data
+
+
+def export_response(request, nombre, cursor, columnas):
+    """
+    Propósito: Exporta un cursor como CSV o NDJSON en streaming, opcionalmente comprimido.
+
+    Funcionamiento:
+    - ?formato=csv (por defecto) o ?formato=ndjson; ?gzip=1 entrega un archivo .gz.
+    - Cada documento se codifica al llegar del cursor y se descarta: la memoria no depende
+      del número de filas.
+    - Los tipos BSON se codifican con core.serializers (ObjectId y Decimal128 como texto,
+      fechas en ISO 8601).
+
+    """
+    formato = 'ndjson' if request.GET.get('formato') == 'ndjson' else 'csv'
+    comprimir = request.GET.get('gzip') in ('1', 'true')
+    lines = _ndjson_lines(cursor) if formato == 'ndjson' else _csv_lines(cursor, columnas)
+
+    def generar():
+        try:
+            yield from _encoded_chunks(lines, comprimir)
+        finally:
+            cursor.close()
+
+    content_type = 'application/x-ndjson' if formato == 'ndjson' else 'text/csv; charset=utf-8'
+    filename = f'{nombre}.{formato}'
+    if comprimir:
+        content_type = 'application/gzip'
+        filename += '.gz'
+    response = StreamingHttpResponse(generar(), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
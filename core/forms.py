@@ -98,4 +98,108 @@ class ProductoForm(forms.Form):
 
     def clean_nombre(self):
         nombre = self.cleaned_data['nombre']
-        return nombre
\ No newline at end of file
+        return nombre
+
+
+
+class FiltroClientesForm(forms.Form):
+    # Parámetros de filtro_view para clientes (ver core/queries.py, compile_filtro)
+    registrado_desde = forms.DateField(required=False, label='Registrado desde',
+                                       widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}))
+    registrado_hasta = forms.DateField(required=False, label='Registrado hasta',
+                                       widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}))
+    dominio = forms.CharField(required=False, max_length=253, label='Dominio del email',
+                              widget=forms.TextInput(attrs={'class': 'form-control'}))
+    orden = forms.ChoiceField(required=False, label='Orden', choices=[
+        ('_id', 'Más antiguos primero'),
+        ('-_id', 'Más recientes primero'),
+        ('fecha_registro', 'Fecha de registro ascendente'),
+        ('-fecha_registro', 'Fecha de registro descendente'),
+    ], widget=forms.Select(attrs={'class': 'form-control'}))
+    limite = forms.IntegerField(required=False, min_value=1, label='Filas por página',
+                                widget=forms.NumberInput(attrs={'class': 'form-control'}))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        desde, hasta = cleaned_data.get('registrado_desde'), cleaned_data.get('registrado_hasta')
+        if desde and hasta and desde > hasta:
+            raise forms.ValidationError('La fecha inicial debe ser anterior a la final.')
+        return cleaned_data
+
+
+class FiltroPedidosForm(forms.Form):
+    # Parámetros de filtro_view para pedidos (ver core/queries.py, compile_filtro)
+    desde = forms.DateField(required=False, label='Pedidos desde',
+                            widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}))
+    hasta = forms.DateField(required=False, label='Pedidos hasta',
+                            widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}))
+    monto_mayor_que = forms.DecimalField(required=False, max_digits=12, decimal_places=2, label='Monto mayor que',
+                                         widget=forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}))
+    monto_hasta = forms.DecimalField(required=False, max_digits=12, decimal_places=2, label='Monto hasta',
+                                     widget=forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}))
+    producto = forms.CharField(required=False, max_length=500, label='Productos (IDs separados por coma)',
+                               widget=forms.TextInput(attrs={'class': 'form-control'}))
+    cliente = forms.CharField(required=False, max_length=100, label='ID del cliente',
+                              widget=forms.TextInput(attrs={'class': 'form-control'}))
+    orden = forms.ChoiceField(required=False, label='Orden', choices=[
+        ('_id', 'Más antiguos primero'),
+        ('-_id', 'Más recientes primero'),
+        ('fecha_pedido', 'Fecha ascendente'),
+        ('-fecha_pedido', 'Fecha descendente'),
+        ('monto_total', 'Monto ascendente'),
+        ('-monto_total', 'Monto descendente'),
+    ], widget=forms.Select(attrs={'class': 'form-control'}))
+    limite = forms.IntegerField(required=False, min_value=1, label='Filas por página',
+                                widget=forms.NumberInput(attrs={'class': 'form-control'}))
+
+    def clean_producto(self):
+        return [p.strip() for p in self.cleaned_data['producto'].split(',') if p.strip()]
+
+    def clean(self):
+        cleaned_data = super().clean()
+        desde, hasta = cleaned_data.get('desde'), cleaned_data.get('hasta')
+        if desde and hasta and desde > hasta:
+            raise forms.ValidationError('La fecha inicial debe ser anterior a la final.')
+        return cleaned_data
+
+
+class ReporteForm(forms.Form):
+    # Parámetros de reportes_view (ver core/queries.py, reportes_pipeline)
+    desde = forms.DateField(required=False, label='Pedidos desde',
+                            widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}))
+    hasta = forms.DateField(required=False, label='Pedidos hasta',
+                            widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}))
+    top = forms.IntegerField(required=False, min_value=1, max_value=100, label='Top productos',
+                             widget=forms.NumberInput(attrs={'class': 'form-control'}))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        desde, hasta = cleaned_data.get('desde'), cleaned_data.get('hasta')
+        if desde and hasta and desde > hasta:
+            raise forms.ValidationError('La fecha inicial debe ser anterior a la final.')
+        return cleaned_data
+
+
+class BusquedaForm(forms.Form):
+    # Parámetros de buscar_view (ver core/queries.py, busqueda)
+    q = forms.CharField(required=False, max_length=200, label='Buscar',
+                        widget=forms.TextInput(attrs={'class': 'form-control', 'autocomplete': 'off'}))
+    coleccion = forms.ChoiceField(required=False, label='En', choices=[
+        ('clientes', 'Clientes'),
+        ('productos', 'Productos'),
+    ], widget=forms.Select(attrs={'class': 'form-control'}))
+    modo = forms.ChoiceField(required=False, label='Modo', choices=[
+        ('texto', 'Palabras (nombre, email, dirección)'),
+        ('prefijo', 'Nombre que empieza con'),
+    ], widget=forms.Select(attrs={'class': 'form-control'}))
+    limite = forms.IntegerField(required=False, min_value=1, max_value=100, label='Resultados',
+                                widget=forms.NumberInput(attrs={'class': 'form-control'}))
+
+    def clean_q(self):
+        return ' '.join(self.cleaned_data['q'].split())
+
+    def clean(self):
+        cleaned_data = super().clean()
+        cleaned_data['coleccion'] = cleaned_data.get('coleccion') or 'clientes'
+        cleaned_data['modo'] = cleaned_data.get('modo') or 'texto'
+        return cleaned_data
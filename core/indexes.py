@@ -0,0 +1,141 @@
+# core/indexes.py
+import pymongo
+
+# Especificación declarativa de índices de ecommerce_db.
+# Cada índice termina en _id cuando la vista pagina por (clave, _id) (ver core/pagination.py).
+# options se pasa tal cual a IndexModel (pesos e idioma de los índices de texto).
+INDEXES = {
+    'clientes': [
+        {'name': 'fecha_registro_1__id_1', 'keys': [('fecha_registro', pymongo.ASCENDING), ('_id', pymongo.ASCENDING)]},
+        {'name': 'email_domain_1__id_1', 'keys': [('email_domain', pymongo.ASCENDING), ('_id', pymongo.ASCENDING)]},
+        # Búsqueda de buscar_view: texto completo y prefijo del nombre normalizado
+        {'name': 'clientes_texto', 'keys': [
+            ('nombre', pymongo.TEXT), ('email', pymongo.TEXT), ('direccion', pymongo.TEXT),
+        ], 'options': {'weights': {'nombre': 10, 'email': 5, 'direccion': 1}, 'default_language': 'spanish'}},
+        {'name': 'nombre_busqueda_1__id_1', 'keys': [('nombre_busqueda', pymongo.ASCENDING), ('_id', pymongo.ASCENDING)]},
+    ],
+    'productos': [
+        {'name': 'productos_texto', 'keys': [('nombre', pymongo.TEXT)], 'options': {'default_language': 'spanish'}},
+        {'name': 'nombre_busqueda_1__id_1', 'keys': [('nombre_busqueda', pymongo.ASCENDING), ('_id', pymongo.ASCENDING)]},
+    ],
+    'pedidos': [
+        {'name': 'monto_total_1__id_1', 'keys': [('monto_total', pymongo.ASCENDING), ('_id', pymongo.ASCENDING)]},
+        {'name': 'fecha_pedido_1__id_1', 'keys': [('fecha_pedido', pymongo.ASCENDING), ('_id', pymongo.ASCENDING)]},
+        {'name': 'productos.producto_id_1__id_1', 'keys': [('productos.producto_id', pymongo.ASCENDING), ('_id', pymongo.ASCENDING)]},
+        {'name': 'cliente_id_1__id_1', 'keys': [('cliente_id', pymongo.ASCENDING), ('_id', pymongo.ASCENDING)]},
+        # Cubre el $match y el $group de filter_clientes_pedidos_500_ultimo_ano sin leer los documentos
+        {'name': 'monto_total_1_fecha_pedido_1_cliente_id_1', 'keys': [
+            ('monto_total', pymongo.ASCENDING), ('fecha_pedido', pymongo.ASCENDING), ('cliente_id', pymongo.ASCENDING),
+        ]},
+    ],
+    # Top de clientes por mes leyendo solo los rollups (core/rollups.py)
+    'rollup_clientes_mes': [
+        {'name': '_id.mes_1_monto_-1', 'keys': [('_id.mes', pymongo.ASCENDING), ('monto', pymongo.DESCENDING)]},
+    ],
+}
+
+# Forma de consulta de cada vista: (vista, colección, campos filtrados u ordenados en orden de uso)
+QUERY_SHAPES = [
+    ('filter_clientes_ultimo_ano', 'clientes', ['fecha_registro']),
+    ('filter_clientes_gmail', 'clientes', ['email_domain']),
+    ('filter_clientes_dominio', 'clientes', ['email_domain']),
+    ('filter_pedidos_monto_100', 'pedidos', ['monto_total']),
+    ('filter_pedidos_2023', 'pedidos', ['fecha_pedido']),
+    ('filter_pedidos_producto_101', 'pedidos', ['productos.producto_id']),
+    ('filter_clientes_pedidos_500_ultimo_ano', 'pedidos', ['monto_total', 'fecha_pedido']),
+    ('filtro', 'pedidos', ['cliente_id']),
+    ('reportes', 'pedidos', ['fecha_pedido']),
+    # $text usa el índice de texto de la colección (se lista con la clave _fts)
+    ('buscar', 'clientes', ['$text']),
+    ('buscar', 'clientes', ['nombre_busqueda']),
+    ('buscar', 'productos', ['$text']),
+    ('buscar', 'productos', ['nombre_busqueda']),
+]
+
+
+def _key_tuple(keys):
+    # El servidor puede devolver la dirección como double (1.0); se normaliza a int
+    return tuple((field, int(direction) if isinstance(direction, float) else direction) for field, direction in keys)
+
+
+def _spec_key_tuple(keys):
+    # list_indexes() muestra los campos de texto como (_fts, 'text'), (_ftsx, 1); los pesos
+    # y el idioma no se comparan
+    claves, texto = [], False
+    for field, direction in keys:
+        if direction != pymongo.TEXT:
+            claves.append((field, direction))
+        elif not texto:
+            claves += [('_fts', 'text'), ('_ftsx', 1)]
+            texto = True
+    return _key_tuple(claves)
+
+
+def _first_key(idx):
+    # Primera clave de un índice existente; los índices de texto cuentan como $text
+    campo = next(iter(idx['key']))
+    return '$text' if campo == '_fts' else campo
+
+
+def index_drift(db, spec=None):
+    """
+    Propósito: Compara los índices existentes con la especificación.
+
+    Funcionamiento:
+    - Para cada colección lee list_indexes() y clasifica los índices por nombre.
+    - missing: índices de la especificación que no existen.
+    - changed: índices con el mismo nombre pero distintas claves.
+    - extra: índices existentes que no están en la especificación (salvo _id_).
+    - Retorna un dict {coleccion: {'missing': [...], 'changed': [...], 'extra': [...]}}.
+
+    """
+    spec = INDEXES if spec is None else spec
+    drift = {}
+    for coleccion, indices in spec.items():
+        existentes = {idx['name']: _key_tuple(idx['key'].items()) for idx in db[coleccion].list_indexes()}
+        esperados = {idx['name']: _spec_key_tuple(idx['keys']) for idx in indices}
+        drift[coleccion] = {
+            'missing': [idx for idx in indices if idx['name'] not in existentes],
+            'changed': [idx for idx in indices if idx['name'] in existentes and existentes[idx['name']] != esperados[idx['name']]],
+            'extra': sorted(name for name in existentes if name not in esperados and name != '_id_'),
+        }
+    return drift
+
+
+def ensure_indexes(db, spec=None):
+    """
+    Propósito: Crea en segundo plano los índices de la especificación que faltan.
+
+    Funcionamiento:
+    - Calcula el drift y crea solo los índices faltantes con create_indexes (background=True).
+    - No borra ni modifica índices existentes: los cambios y extras solo se reportan.
+    - Retorna el drift calculado antes de crear los índices.
+
+    """
+    drift = index_drift(db, spec)
+    for coleccion, estado in drift.items():
+        if estado['missing']:
+            db[coleccion].create_indexes([
+                pymongo.IndexModel(idx['keys'], name=idx['name'], background=True, **idx.get('options', {}))
+                for idx in estado['missing']
+            ])
+    return drift
+
+
+def unsupported_query_shapes(db, shapes=None):
+    """
+    Propósito: Lista las formas de consulta de las vistas que no tienen un índice que las soporte.
+
+    Funcionamiento:
+    - Considera soportada una forma si algún índice existente empieza por uno de sus campos.
+    - Retorna una lista de (vista, colección, campos).
+
+    """
+    shapes = QUERY_SHAPES if shapes is None else shapes
+    prefijos = {}
+    for coleccion in {coleccion for _, coleccion, _ in shapes}:
+        prefijos[coleccion] = {_first_key(idx) for idx in db[coleccion].list_indexes()}
+    return [
+        (vista, coleccion, campos) for vista, coleccion, campos in shapes
+        if not prefijos[coleccion].intersection(campos)
+    ]
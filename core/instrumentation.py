@@ -0,0 +1,289 @@
+# core/instrumentation.py
+import bisect
+import contextvars
+import math
+import threading
+import time
+from collections import Counter
+from collections.abc import Mapping
+from contextlib import contextmanager
+
+import bson
+from bson.raw_bson import RawBSONDocument
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from pymongo import monitoring
+
+
+def _instrumentation_setting(name, default):
+    return getattr(settings, 'MONGO_INSTRUMENTATION', {}).get(name, default)
+
+
+class RequestStats:
+    """
+    Propósito: Comandos de MongoDB ejecutados durante un request.
+
+    Funcionamiento:
+    - commands cuenta los comandos por nombre (find, aggregate, insert, getMore, ...).
+    - duration_ms es la suma de las duraciones informadas por el driver.
+    - documents son los documentos devueltos (firstBatch/nextBatch) o escritos (n).
+    - bytes es el tamaño BSON de las respuestas: el de las respuestas crudas (RawBSONDocument,
+      las de MONGO_LAZY_ROWS) siempre, y el de las demás solo con MEASURE_BYTES.
+
+    """
+
+    def __init__(self):
+        self.commands = Counter()
+        self.duration_ms = 0.0
+        self.documents = 0
+        self.bytes = 0
+        self.failures = 0
+
+    @property
+    def total(self):
+        return sum(self.commands.values())
+
+
+_current = contextvars.ContextVar('mongo_request_stats', default=None)
+_capture = contextvars.ContextVar('mongo_command_capture', default=None)
+
+
+@contextmanager
+def capture_commands(command_names=('find', 'aggregate', 'count', 'distinct')):
+    """
+    Propósito: Captura los comandos de MongoDB emitidos dentro del bloque (ver core/plans.py).
+
+    Funcionamiento:
+    - Entrega una lista que se llena con (base de datos, comando) por cada comando cuyo
+      nombre esté en command_names, en el orden en que el driver los envía.
+    - Usa la misma ContextVar que el resto del módulo: captura lo que ejecute el hilo o la
+      tarea actual, incluidas las vistas llamadas con el cliente de pruebas de Django.
+
+    """
+    capturados = []
+    token = _capture.set((frozenset(command_names), capturados))
+    try:
+        yield capturados
+    finally:
+        _capture.reset(token)
+
+
+def _documentos(reply):
+    # Con MONGO_LAZY_ROWS la respuesta y su cursor son RawBSONDocument, no dict
+    cursor = reply.get('cursor')
+    if isinstance(cursor, Mapping):
+        return len(cursor.get('firstBatch') or cursor.get('nextBatch') or ())
+    n = reply.get('n')
+    return n if isinstance(n, int) else 0
+
+
+def _bytes(reply):
+    # pymongo no entrega al listener la respuesta cruda, solo el documento decodificado:
+    # una respuesta RawBSONDocument trae sus bytes sin costo, las demás hay que volver a
+    # codificarlas, y eso solo se hace con MEASURE_BYTES
+    if isinstance(reply, RawBSONDocument):
+        return len(reply.raw)
+    if _instrumentation_setting('MEASURE_BYTES', False):
+        return len(bson.encode(reply))
+    return 0
+
+
+class RequestCommandListener(monitoring.CommandListener):
+    """
+    Propósito: CommandListener de pymongo que anota cada comando en el RequestStats del request actual.
+
+    Funcionamiento:
+    - El request actual se guarda en una ContextVar: el driver llama al listener en el mismo
+      hilo (o la misma tarea asyncio) que ejecutó la operación.
+    - Fuera de un request (comandos de manage.py, hilos de la cache) no hace nada.
+    - Dentro de capture_commands además guarda una copia de cada comando.
+
+    """
+
+    def started(self, event):
+        captura = _capture.get()
+        if captura is not None and event.command_name in captura[0]:
+            captura[1].append((event.database_name, dict(event.command)))
+
+    def succeeded(self, event):
+        stats = _current.get()
+        if stats is None:
+            return
+        stats.commands[event.command_name] += 1
+        stats.duration_ms += event.duration_micros / 1000
+        stats.documents += _documentos(event.reply)
+        stats.bytes += _bytes(event.reply)
+
+    def failed(self, event):
+        stats = _current.get()
+        if stats is None:
+            return
+        stats.commands[event.command_name] += 1
+        stats.duration_ms += event.duration_micros / 1000
+        stats.failures += 1
+
+
+command_listener = RequestCommandListener()
+
+
+class LatencyHistogram:
+    """
+    Propósito: Histograma de latencias con cubetas exponenciales y memoria fija.
+
+    Funcionamiento:
+    - Las cubetas crecen un 10 % entre límites, desde 0,1 ms hasta unos 10 minutos
+      (unas 170 cubetas), así el error de los percentiles es como mucho del 10 %.
+    - percentile(p) retorna el límite superior de la cubeta que contiene el percentil p.
+
+    """
+
+    BOUNDS = [0.1 * 1.1 ** i for i in range(int(math.log(6e6) / math.log(1.1)) + 1)]
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.BOUNDS, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, p):
+        if not self.count:
+            return 0.0
+        rank = math.ceil(self.count * p / 100)
+        acumulado = 0
+        for i, n in enumerate(self.counts):
+            acumulado += n
+            if acumulado >= rank:
+                return min(self.BOUNDS[i], self.max) if i < len(self.BOUNDS) else self.max
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean': round(self.total / self.count, 3) if self.count else 0.0,
+            'p50': round(self.percentile(50), 3),
+            'p95': round(self.percentile(95), 3),
+            'p99': round(self.percentile(99), 3),
+            'max': round(self.max, 3),
+        }
+
+
+class ViewStats:
+    """
+    Propósito: Agrega por vista la latencia total, el tiempo en MongoDB y los comandos por request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view_name, elapsed_ms, stats):
+        with self._lock:
+            view = self._views.get(view_name)
+            if view is None:
+                view = self._views[view_name] = {
+                    'request_ms': LatencyHistogram(),
+                    'mongo_ms': LatencyHistogram(),
+                    'commands': LatencyHistogram(),
+                    'documents': 0,
+                    'bytes': 0,
+                    'failures': 0,
+                    'command_names': Counter(),
+                }
+            view['request_ms'].add(elapsed_ms)
+            view['mongo_ms'].add(stats.duration_ms)
+            view['commands'].add(stats.total)
+            view['documents'] += stats.documents
+            view['bytes'] += stats.bytes
+            view['failures'] += stats.failures
+            view['command_names'].update(stats.commands)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: {
+                    'request_ms': view['request_ms'].summary(),
+                    'mongo_ms': view['mongo_ms'].summary(),
+                    'commands_per_request': view['commands'].summary(),
+                    'documents': view['documents'],
+                    'bytes': view['bytes'],
+                    'failures': view['failures'],
+                    'command_names': dict(view['command_names']),
+                }
+                for name, view in sorted(self._views.items())
+            }
+
+    def reset(self):
+        with self._lock:
+            self._views = {}
+
+
+view_stats = ViewStats()
+
+
+def server_timing(elapsed_ms, stats):
+    return (
+        f'mongo;dur={stats.duration_ms:.1f};desc="{stats.total} comandos, {stats.documents} documentos", '
+        f'app;dur={elapsed_ms - stats.duration_ms:.1f}, total;dur={elapsed_ms:.1f}'
+    )
+
+
+class MongoInstrumentationMiddleware:
+    """
+    Propósito: Mide los comandos de MongoDB de cada request y la latencia por vista.
+
+    Funcionamiento:
+    - Antes de la vista instala un RequestStats nuevo en la ContextVar que usa command_listener.
+    - Al terminar agrega la cabecera Server-Timing (tiempo en MongoDB, resto de la app y total)
+      y registra el request en view_stats bajo el nombre de la vista resuelta.
+    - Funciona con vistas síncronas y asíncronas; en respuestas en streaming solo cuenta los
+      comandos ejecutados antes de devolver la respuesta.
+    - Se desactiva con MONGO_INSTRUMENTATION['ENABLED'] en False.
+
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not _instrumentation_setting('ENABLED', True):
+            return self.get_response(request)
+        stats, started = RequestStats(), time.perf_counter()
+        token = _current.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, stats, started)
+
+    async def __acall__(self, request):
+        if not _instrumentation_setting('ENABLED', True):
+            return await self.get_response(request)
+        stats, started = RequestStats(), time.perf_counter()
+        token = _current.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, stats, started)
+
+    def _finish(self, request, response, stats, started):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        response['Server-Timing'] = server_timing(elapsed_ms, stats)
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            view_stats.record(match.view_name, elapsed_ms, stats)
+        return response
@@ -0,0 +1,200 @@
+# core/management/base.py
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+from urllib.parse import unquote, urlencode, urlsplit
+
+import pymongo
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import URLPattern, reverse
+
+from core import urls as core_urls
+from core.indexes import ensure_indexes
+from core.mongo import get_database_name, get_service_client, registry
+from core.pagination import encode_token
+from core.rollups import CLIENTES_MES, PRODUCTOS_DIA, VENTAS_DIA
+from core.seed import seed_database
+
+# Vistas que no se recorren: login escribe la sesión y las estadísticas no tocan MongoDB
+EXCLUIDAS = {'login', 'mongo_stats'}
+# Valores para las rutas con parámetros
+PARAMETROS = {'dominio': 'gmail.com', 'filtro': 'filter_pedidos_2023', 'coleccion': 'pedidos'}
+# Vistas que se recorren con parámetros GET: (sufijo del nombre, parámetros) por vista
+CONSULTAS = {
+    'buscar': [
+        ('texto', {'q': 'Pérez', 'modo': 'texto'}),
+        ('prefijo', {'q': 'mar', 'modo': 'prefijo'}),
+        ('productos', {'q': 'producto 10', 'coleccion': 'productos', 'modo': 'prefijo'}),
+    ],
+}
+# Vistas que se recorren también en una página siguiente: (prefijo de paginación, valor de
+# la clave de orden) por vista. El token continúa desde ese valor, así que la consulta lleva
+# la condición keyset (rango más $or sobre la clave de orden y _id)
+SIGUIENTES = {
+    'home': [('pedidos_', None)],
+    'filter_pedidos_monto_100': [('', Decimal128('150'))],
+}
+
+
+class MongoCommand(BaseCommand):
+    """
+    Propósito: Base de los comandos de manage.py que trabajan contra ecommerce_db.
+
+    Funcionamiento:
+    - Agrega las opciones --uri, --username, --password y --database.
+    - get_db(options) abre el cliente con get_service_client y retorna la base de datos.
+
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--uri', help='URI de MongoDB (por defecto MONGO_SERVICE_URI o $MONGO_URI).')
+        parser.add_argument('--username', help='Usuario de MongoDB para construir la URI del cluster.')
+        parser.add_argument('--password', help='Contraseña de MongoDB para construir la URI del cluster.')
+        parser.add_argument('--database', default=get_database_name(), help='Base de datos (por defecto ecommerce_db).')
+
+    def get_db(self, options):
+        client = get_service_client(options['uri'], options['username'], options['password'])
+        if client is None:
+            raise CommandError('No hay conexión configurada: use --uri, --username/--password o MONGO_SERVICE_URI.')
+        self.mongo_client = client
+        return client[options['database']]
+
+
+class SeededMongoCommand(MongoCommand):
+    """
+    Propósito: Base de los comandos que recorren las vistas contra un conjunto de datos sintético.
+
+    Funcionamiento:
+    - open_dataset(options): sin --uri inicia un mongod temporal (dbpath en un directorio
+      temporal y puerto libre) con un usuario para las vistas; con --uri usa ese servidor y
+      solo carga datos con --seed. Crea los índices de core/indexes.py y retorna
+      (client, username, password, ajustes), donde ajustes apunta las vistas a ese servidor
+      (para override_settings).
+    - close_dataset(): cierra los clientes y detiene el mongod temporal.
+    - escenarios(options): (nombre, ruta) de cada URL con nombre de core/urls.py, más las
+      variantes de CONSULTAS y las páginas siguientes de SIGUIENTES.
+    - cliente(username, password): cliente de pruebas de Django con la sesión autenticada.
+
+    """
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--mongod', default='mongod', help='Binario de mongod a iniciar si no se usa --uri.')
+        parser.add_argument('--seed', action='store_true',
+                            help='Con --uri, borra clientes/productos/pedidos de la base y carga los datos sintéticos.')
+        parser.add_argument('--clientes', type=int, default=2000)
+        parser.add_argument('--productos', type=int, default=50)
+        parser.add_argument('--pedidos', type=int, default=10000)
+        parser.add_argument('--semilla', type=int, default=42, help='Semilla de los datos sintéticos.')
+        parser.add_argument('--urls', help='Nombres de URL separados por coma (por defecto todas).')
+
+    def open_dataset(self, options):
+        self._mongod = self._dbpath = None
+        if options['uri']:
+            partes = urlsplit(options['uri'])
+            if not partes.username:
+                raise CommandError('La URI debe incluir usuario y contraseña: las vistas se autentican con ellos.')
+            scheme, host, opciones = partes.scheme, partes.netloc.rsplit('@', 1)[1], partes.query
+            username, password = unquote(partes.username), unquote(partes.password or '')
+            client = pymongo.MongoClient(options['uri'])
+            cargar = options['seed']
+        else:
+            port = self._start_mongod(options['mongod'])
+            scheme, host, opciones = 'mongodb', f'127.0.0.1:{port}', 'authSource=admin'
+            username = password = 'benchmark'
+            client = pymongo.MongoClient(host)
+            client.admin.command('createUser', username, pwd=password, roles=['root'])
+            cargar = True
+
+        # Las vistas usan siempre ecommerce_db
+        db = client['ecommerce_db']
+        if cargar:
+            self._seed(db, options)
+        ensure_indexes(db)
+        ajustes = {
+            'MONGO_URI_SCHEME': scheme,
+            'MONGO_CLUSTER_HOST': host,
+            'MONGO_URI_OPTIONS': opciones,
+        }
+        return client, username, password, ajustes
+
+    def close_dataset(self):
+        registry.close_all()
+        if getattr(self, '_mongod', None) is not None:
+            self._mongod.terminate()
+            self._mongod.wait(timeout=30)
+            shutil.rmtree(self._dbpath, ignore_errors=True)
+            self._mongod = None
+
+    def _start_mongod(self, binario):
+        ruta = shutil.which(binario)
+        if ruta is None:
+            raise CommandError(f'No se encontró {binario}: instale MongoDB o use --uri.')
+        dbpath = tempfile.mkdtemp(prefix='benchmark-mongod-')
+        with socket.socket() as libre:
+            libre.bind(('127.0.0.1', 0))
+            port = libre.getsockname()[1]
+        proceso = subprocess.Popen(
+            [ruta, '--dbpath', dbpath, '--port', str(port), '--bind_ip', '127.0.0.1'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        client = pymongo.MongoClient('127.0.0.1', port, serverSelectionTimeoutMS=500)
+        limite = time.monotonic() + 30
+        while True:
+            try:
+                client.admin.command('ping')
+                break
+            except pymongo.errors.PyMongoError:
+                if proceso.poll() is not None or time.monotonic() > limite:
+                    proceso.kill()
+                    shutil.rmtree(dbpath, ignore_errors=True)
+                    raise CommandError('mongod no respondió a tiempo.')
+                time.sleep(0.2)
+        client.close()
+        self.stderr.write(f'mongod temporal en el puerto {port} ({dbpath})')
+        self._mongod, self._dbpath = proceso, dbpath
+        return port
+
+    def _seed(self, db, options):
+        for coleccion in ('clientes', 'productos', 'pedidos', CLIENTES_MES, PRODUCTOS_DIA, VENTAS_DIA):
+            db[coleccion].drop()
+        inicio = time.perf_counter()
+        insertados = seed_database(db, options['clientes'], options['productos'], options['pedidos'], semilla=options['semilla'])
+        self.stderr.write(f'Datos cargados en {time.perf_counter() - inicio:.1f}s: {insertados}')
+
+    def escenarios(self, options):
+        """
+        Propósito: Lista (nombre, ruta) de cada URL con nombre de core/urls.py (o de --urls).
+        """
+        elegidas = set(options['urls'].split(',')) if options['urls'] else None
+        vistos = set()
+        escenarios = []
+        for patron in core_urls.urlpatterns:
+            if not isinstance(patron, URLPattern) or not patron.name or patron.name in vistos | EXCLUIDAS:
+                continue
+            vistos.add(patron.name)
+            if elegidas is not None and patron.name not in elegidas:
+                continue
+            kwargs = {k: PARAMETROS[k] for k in patron.pattern.converters}
+            ruta = reverse(patron.name, kwargs=kwargs)
+            if patron.name in CONSULTAS:
+                escenarios += [(f'{patron.name}:{sufijo}', f'{ruta}?{urlencode(params)}') for sufijo, params in CONSULTAS[patron.name]]
+            else:
+                escenarios.append((patron.name, ruta))
+            for prefijo, valor in SIGUIENTES.get(patron.name, []):
+                token = encode_token(valor, ObjectId('0' * 24))
+                escenarios.append((f'{patron.name}:siguiente', f'{ruta}?{urlencode({f"{prefijo}after": token})}'))
+        return escenarios
+
+    def cliente(self, username, password):
+        cliente = Client(HTTP_HOST='localhost')
+        session = cliente.session
+        session['mongo_username'] = username
+        session['mongo_password'] = password
+        session.save()
+        return cliente
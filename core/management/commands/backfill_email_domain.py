@@ -0,0 +1,57 @@
+# core/management/commands/backfill_email_domain.py
+import pymongo
+from pymongo import UpdateOne
+
+from core.cache import query_cache
+from core.documents import email_domain
+from core.management.base import MongoCommand
+
+CHECKPOINT_ID = 'backfill_email_domain'
+
+
+class Command(MongoCommand):
+    help = 'Completa email_domain en los clientes existentes por lotes, guardando un checkpoint para poder reanudar.'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--batch-size', type=int, default=1000, help='Documentos por lote (por defecto 1000).')
+        parser.add_argument('--restart', action='store_true', help='Ignora el checkpoint y empieza desde el principio.')
+
+    def handle(self, *args, **options):
+        """
+        Propósito: Recorre clientes por _id y escribe email_domain con bulk_write por lotes.
+
+        Funcionamiento:
+        - Lee el último _id procesado de la colección _checkpoints (salvo --restart).
+        - Pide el siguiente lote con _id > checkpoint ordenado por _id (usa el índice _id_).
+        - Actualiza con UpdateOne($set email_domain) sin orden y guarda el checkpoint tras cada lote.
+        - Si se interrumpe, la siguiente ejecución continúa desde el último lote confirmado.
+
+        """
+        db = self.get_db(options)
+        checkpoints = db['_checkpoints']
+        ultimo_id = None
+        if not options['restart']:
+            checkpoint = checkpoints.find_one({'_id': CHECKPOINT_ID})
+            ultimo_id = checkpoint['ultimo_id'] if checkpoint else None
+
+        total = 0
+        while True:
+            query = {'_id': {'$gt': ultimo_id}} if ultimo_id is not None else {}
+            lote = list(db['clientes'].find(query, {'email': 1, 'email_domain': 1})
+                        .sort('_id', pymongo.ASCENDING).limit(options['batch_size']))
+            if not lote:
+                break
+            operaciones = [
+                UpdateOne({'_id': doc['_id']}, {'$set': {'email_domain': email_domain(doc.get('email'))}})
+                for doc in lote if doc.get('email_domain') != email_domain(doc.get('email'))
+            ]
+            if operaciones:
+                db['clientes'].bulk_write(operaciones, ordered=False)
+            ultimo_id = lote[-1]['_id']
+            checkpoints.update_one({'_id': CHECKPOINT_ID}, {'$set': {'ultimo_id': ultimo_id}}, upsert=True)
+            total += len(operaciones)
+            self.stdout.write(f'{total} clientes actualizados (último _id {ultimo_id})')
+
+        query_cache.bump(db.name, 'clientes')
+        self.stdout.write(self.style.SUCCESS(f'Backfill completo: {total} clientes actualizados.'))
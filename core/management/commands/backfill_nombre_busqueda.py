@@ -0,0 +1,67 @@
+# core/management/commands/backfill_nombre_busqueda.py
+import pymongo
+from pymongo import UpdateOne
+
+from core.cache import query_cache
+from core.documents import nombre_busqueda
+from core.management.base import MongoCommand
+
+COLECCIONES = ('clientes', 'productos')
+
+
+class Command(MongoCommand):
+    help = (
+        'Completa nombre_busqueda (búsqueda por prefijo) en los clientes y productos existentes '
+        'por lotes, guardando un checkpoint por colección para poder reanudar.'
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--batch-size', type=int, default=1000, help='Documentos por lote (por defecto 1000).')
+        parser.add_argument('--restart', action='store_true', help='Ignora los checkpoints y empieza desde el principio.')
+
+    def handle(self, *args, **options):
+        """
+        Propósito: Recorre clientes y productos por _id y escribe nombre_busqueda con bulk_write por lotes.
+
+        Funcionamiento:
+        - Igual que backfill_email_domain: checkpoint en _checkpoints (uno por colección),
+          lotes por _id > checkpoint y UpdateOne($set) sin orden solo para los documentos
+          cuyo nombre_busqueda no coincide con el nombre normalizado.
+        - Los _id de productos pueden ser texto u ObjectId (ver producto_id_query).
+        - Al terminar cada colección incrementa su generación en query_cache.
+
+        """
+        db = self.get_db(options)
+        checkpoints = db['_checkpoints']
+        for coleccion in COLECCIONES:
+            checkpoint_id = f'backfill_nombre_busqueda:{coleccion}'
+            ultimo_id = None
+            if not options['restart']:
+                checkpoint = checkpoints.find_one({'_id': checkpoint_id})
+                ultimo_id = checkpoint['ultimo_id'] if checkpoint else None
+
+            total = 0
+            while True:
+                query = {'_id': {'$gt': ultimo_id}} if ultimo_id is not None else {}
+                if isinstance(ultimo_id, str):
+                    # Productos con _id de texto y antiguos con ObjectId: $gt solo compara dentro
+                    # de un tipo, y en el orden por _id los ObjectId van después de los textos
+                    query = {'$or': [query, {'_id': {'$type': 'objectId'}}]}
+                lote = list(db[coleccion].find(query, {'nombre': 1, 'nombre_busqueda': 1})
+                            .sort('_id', pymongo.ASCENDING).limit(options['batch_size']))
+                if not lote:
+                    break
+                operaciones = [
+                    UpdateOne({'_id': doc['_id']}, {'$set': {'nombre_busqueda': nombre_busqueda(doc.get('nombre'))}})
+                    for doc in lote if doc.get('nombre_busqueda') != nombre_busqueda(doc.get('nombre'))
+                ]
+                if operaciones:
+                    db[coleccion].bulk_write(operaciones, ordered=False)
+                ultimo_id = lote[-1]['_id']
+                checkpoints.update_one({'_id': checkpoint_id}, {'$set': {'ultimo_id': ultimo_id}}, upsert=True)
+                total += len(operaciones)
+                self.stdout.write(f'{coleccion}: {total} documentos actualizados (último _id {ultimo_id})')
+
+            query_cache.bump(db.name, coleccion)
+            self.stdout.write(self.style.SUCCESS(f'{coleccion}: backfill completo, {total} documentos actualizados.'))
@@ -0,0 +1,203 @@
+# core/management/commands/benchmark.py
+import json
+import math
+import platform
+import re
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+
+import django
+import pymongo
+from django.core.management.base import CommandError
+from django.test import override_settings
+from django.urls import reverse
+
+from core.management.base import SeededMongoCommand
+from core.seed import cliente_id
+
+_SERVER_TIMING = re.compile(r'mongo;dur=([\d.]+);desc="(\d+) comandos')
+
+
+def _percentil(ordenados, p):
+    if not ordenados:
+        return 0.0
+    return ordenados[max(0, math.ceil(len(ordenados) * p / 100) - 1)]
+
+
+def _resumen(latencias):
+    ordenados = sorted(latencias)
+    return {
+        'mean': round(sum(ordenados) / len(ordenados), 3) if ordenados else 0.0,
+        'p50': round(_percentil(ordenados, 50), 3),
+        'p95': round(_percentil(ordenados, 95), 3),
+        'p99': round(_percentil(ordenados, 99), 3),
+        'max': round(ordenados[-1], 3) if ordenados else 0.0,
+    }
+
+
+class Command(SeededMongoCommand):
+    help = (
+        'Mide throughput y latencia (p50/p95/p99) de cada URL de core/urls.py con clientes '
+        'concurrentes contra un mongod local (o --uri) cargado con datos sintéticos. Escribe '
+        'el resultado en JSON y falla si una vista empeora más que --threshold respecto de --baseline.'
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--concurrency', type=int, default=8, help='Clientes concurrentes por URL.')
+        parser.add_argument('--requests', type=int, default=200, help='Requests medidos por URL.')
+        parser.add_argument('--warmup', type=int, default=10, help='Requests de calentamiento por URL (no se miden).')
+        parser.add_argument('--writes', action='store_true', help='Incluye POST a insert_cliente e insert_pedido.')
+        parser.add_argument('--no-query-cache', action='store_true', help='Desactiva QUERY_CACHE durante la medición.')
+        parser.add_argument('--output', help='Archivo JSON de resultados (por defecto stdout).')
+        parser.add_argument('--baseline', help='JSON de una ejecución anterior contra el cual comparar.')
+        parser.add_argument('--threshold', type=float, default=20.0, help='Empeoramiento máximo permitido, en %%.')
+        parser.add_argument('--metric', choices=['p50', 'p95', 'p99', 'mean'], default='p95')
+
+    def handle(self, *args, **options):
+        """
+        Propósito: Ejecuta el benchmark completo y compara con una ejecución anterior.
+
+        Funcionamiento:
+        - Sin --uri inicia un mongod temporal (dbpath en un directorio temporal y puerto libre),
+          crea un usuario para las vistas y lo detiene al terminar.
+        - Carga los datos con core/seed.py (misma semilla y tamaños = mismos documentos) y crea
+          los índices de core/indexes.py.
+        - Cada URL se pide --requests veces desde --concurrency hilos con el cliente de pruebas
+          de Django (en proceso, sin servidor HTTP), con una sesión ya autenticada.
+        - Registra latencia, errores, throughput y el tiempo en MongoDB de la cabecera Server-Timing.
+
+        """
+        dataset = {k: options[k] for k in ('clientes', 'productos', 'pedidos', 'semilla')}
+        try:
+            client, username, password, ajustes = self.open_dataset(options)
+            if options['no_query_cache']:
+                ajustes['QUERY_CACHE'] = {'ENABLED': False}
+            with override_settings(**ajustes):
+                resultados = {
+                    nombre: self._medir(nombre, metodo, ruta, datos, username, password, options)
+                    for nombre, metodo, ruta, datos in self._escenarios(options)
+                }
+            informe = {
+                'meta': {
+                    'fecha': datetime.now(timezone.utc).isoformat(),
+                    'commit': self._commit(),
+                    'dataset': dataset,
+                    'concurrency': options['concurrency'],
+                    'requests': options['requests'],
+                    'query_cache': not options['no_query_cache'],
+                    'mongodb': client.server_info().get('version'),
+                    'python': platform.python_version(),
+                    'django': django.get_version(),
+                    'pymongo': pymongo.version,
+                },
+                'results': resultados,
+            }
+            client.close()
+        finally:
+            self.close_dataset()
+
+        salida = json.dumps(informe, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as archivo:
+                archivo.write(salida + '\n')
+        else:
+            self.stdout.write(salida)
+        if options['baseline']:
+            self._comparar(informe, options)
+
+    def _escenarios(self, options):
+        """
+        Propósito: Lista (nombre, método, ruta, datos) de cada URL con nombre de core/urls.py.
+        """
+        elegidas = set(options['urls'].split(',')) if options['urls'] else None
+        escenarios = [(nombre, 'GET', ruta, None) for nombre, ruta in self.escenarios(options)]
+        if options['writes']:
+            hoy = date.today().isoformat()
+            escenarios += [
+                ('insert_cliente:POST', 'POST', reverse('insert_cliente'), lambda i: {
+                    'nombre': f'Benchmark {i}', 'email': f'benchmark.{i}@gmail.com', 'fecha_registro': hoy,
+                    'direccion': 'Calle 1', 'telefono': '+56912345678',
+                }),
+                ('insert_pedido:POST', 'POST', reverse('insert_pedido'), lambda i: {
+                    'cliente': str(cliente_id(options['semilla'], i % max(options['clientes'], 1))),
+                    'fecha_pedido': hoy, 'productos': ['101', '102'], 'cantidad_101': '2', 'cantidad_102': '1',
+                }),
+            ]
+        return [e for e in escenarios if elegidas is None or e[0] in elegidas or e[0].split(':')[0] in elegidas]
+
+    def _medir(self, nombre, metodo, ruta, datos, username, password, options):
+        # Un cliente de pruebas (y una sesión) por hilo: Client no es seguro entre hilos
+        por_hilo = threading.local()
+        esperado = 302 if metodo == 'POST' else 200
+
+        def pedir(i):
+            cliente = getattr(por_hilo, 'cliente', None)
+            if cliente is None:
+                cliente = por_hilo.cliente = self.cliente(username, password)
+            inicio = time.perf_counter()
+            try:
+                if metodo == 'POST':
+                    respuesta = cliente.post(ruta, datos(i))
+                else:
+                    respuesta = cliente.get(ruta)
+                if respuesta.streaming:
+                    # Las exportaciones y ?stream= se miden hasta enviar el último bloque
+                    for _ in respuesta.streaming_content:
+                        pass
+            except Exception:
+                return (time.perf_counter() - inicio) * 1000, False, None
+            latencia = (time.perf_counter() - inicio) * 1000
+            return latencia, respuesta.status_code == esperado, _SERVER_TIMING.search(respuesta.get('Server-Timing', ''))
+
+        for i in range(options['warmup']):
+            pedir(i)
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            inicio = time.perf_counter()
+            muestras = list(pool.map(pedir, range(options['warmup'], options['warmup'] + options['requests'])))
+            duracion = time.perf_counter() - inicio
+
+        timings = [m.groups() for _, _, m in muestras if m]
+        resultado = {
+            'requests': len(muestras),
+            'errors': sum(1 for _, ok, _ in muestras if not ok),
+            'throughput_rps': round(len(muestras) / duracion, 2) if duracion else 0.0,
+            'latency_ms': _resumen([latencia for latencia, _, _ in muestras]),
+            'mongo_ms': _resumen([float(dur) for dur, _ in timings]),
+            'commands_per_request': round(sum(int(n) for _, n in timings) / len(timings), 2) if timings else 0.0,
+        }
+        self.stderr.write(
+            f"{nombre:45} {resultado['throughput_rps']:9.1f} req/s  "
+            f"p50 {resultado['latency_ms']['p50']:8.1f} ms  p95 {resultado['latency_ms']['p95']:8.1f} ms  "
+            f"p99 {resultado['latency_ms']['p99']:8.1f} ms  errores {resultado['errors']}"
+        )
+        return resultado
+
+    def _commit(self):
+        try:
+            return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def _comparar(self, informe, options):
+        with open(options['baseline'], encoding='utf-8') as archivo:
+            anterior = json.load(archivo)
+        if anterior.get('meta', {}).get('dataset') != informe['meta']['dataset']:
+            self.stderr.write(self.style.WARNING('El baseline usa otro conjunto de datos: la comparación no es equivalente.'))
+        metrica, limite = options['metric'], 1 + options['threshold'] / 100
+        regresiones = []
+        for nombre, actual in informe['results'].items():
+            base = anterior.get('results', {}).get(nombre)
+            if base is None:
+                continue
+            antes, ahora = base['latency_ms'][metrica], actual['latency_ms'][metrica]
+            if antes and ahora > antes * limite:
+                regresiones.append(f'{nombre}: {metrica} {antes:.1f} ms -> {ahora:.1f} ms (+{(ahora / antes - 1) * 100:.0f} %)')
+            if actual['errors'] > base.get('errors', 0):
+                regresiones.append(f"{nombre}: errores {base.get('errors', 0)} -> {actual['errors']}")
+        if regresiones:
+            raise CommandError('Regresiones respecto del baseline:\n' + '\n'.join(regresiones))
+        self.stderr.write(self.style.SUCCESS(f'Sin regresiones de {metrica} mayores a {options["threshold"]:.0f} %.'))
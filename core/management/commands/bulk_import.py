@@ -0,0 +1,212 @@
+# core/management/commands/bulk_import.py
+import csv
+import hashlib
+import json
+import os
+import threading
+
+from bson import ObjectId
+from django.core.management.base import CommandError
+
+from core.bulk import BatchWriter
+from core.cache import catalog_cache, query_cache
+from core.documents import build_cliente, build_pedido, build_producto
+from core.forms import ClienteForm, PedidoForm, ProductoForm
+from core.management.base import MongoCommand
+from core.rollups import aplicar_rollups_pendientes, marcar_rollups_pendientes, rollups_enabled
+
+
+def _import_id(archivo, linea, fila):
+    # _id determinista por ruta absoluta, línea y contenido de la fila: reanudar no duplica los
+    # lotes que quedaron en vuelo, y dos archivos con el mismo nombre en carpetas distintas (o
+    # una fila editada) no chocan con filas ya importadas
+    contenido = json.dumps(fila, sort_keys=True, default=str)
+    clave = f'{os.path.realpath(archivo)}:{linea}:{contenido}'
+    return ObjectId(hashlib.sha1(clave.encode('utf-8')).digest()[:12])
+
+
+def _lista(valor):
+    if isinstance(valor, list):
+        return [str(v) for v in valor]
+    return [v.strip() for v in str(valor or '').split(';') if v.strip()]
+
+
+def _cantidades(valor):
+    if isinstance(valor, dict):
+        return {str(k): v for k, v in valor.items()}
+    cantidades = {}
+    for par in _lista(valor):
+        prod_id, _, cantidad = par.partition(':')
+        cantidades[prod_id.strip()] = cantidad.strip() or 1
+    return cantidades
+
+
+class Command(MongoCommand):
+    help = (
+        'Importa clientes, productos o pedidos desde CSV o NDJSON con insert_many por lotes. '
+        'Valida cada fila con ClienteForm/ProductoForm/PedidoForm, escribe las filas rechazadas '
+        'en un archivo dead-letter y guarda un checkpoint para reanudar. En pedidos, la columna '
+        'productos es "101;102" y cantidades "101:2;102:1" (en NDJSON, lista y objeto).'
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('coleccion', choices=['clientes', 'productos', 'pedidos'])
+        parser.add_argument('archivo')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help='Por defecto según la extensión del archivo.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--dead-letter', help='Archivo NDJSON de filas rechazadas (por defecto <archivo>.rechazados.ndjson).')
+        parser.add_argument('--checkpoint', help='Archivo de checkpoint (por defecto <archivo>.checkpoint).')
+        parser.add_argument('--restart', action='store_true', help='Ignora el checkpoint y empieza desde la primera fila.')
+
+    def handle(self, *args, **options):
+        """
+        Propósito: Carga un archivo completo en lotes, con memoria acotada y reanudable.
+
+        Funcionamiento:
+        - Lee el archivo fila a fila (nunca entero) y salta las filas hasta el checkpoint.
+        - Valida cada lote y lo entrega a BatchWriter, que lo escribe desde el pool de hilos.
+        - Tras cada lote actualiza el checkpoint con la última línea escrita de forma contigua.
+
+        """
+        archivo = options['archivo']
+        if not os.path.exists(archivo):
+            raise CommandError(f'No existe el archivo {archivo}.')
+        formato = options['format'] or ('ndjson' if archivo.endswith(('.ndjson', '.jsonl')) else 'csv')
+        self.archivo = archivo
+        self.coleccion = options['coleccion']
+        self.db = self.get_db(options)
+        self.checkpoint_path = options['checkpoint'] or f'{archivo}.checkpoint'
+        desde = 0 if options['restart'] else self._leer_checkpoint()
+        if desde:
+            self.stdout.write(f'Reanudando después de la línea {desde}.')
+
+        # Los pedidos se insertan marcados: al reanudar se aplican los rollups de los que se
+        # escribieron sin alcanzar a aplicarlos (core.rollups.aplicar_rollups_pendientes)
+        self.rollups = self.coleccion == 'pedidos' and rollups_enabled()
+        if self.coleccion == 'pedidos':
+            self.catalogo = {p['id_producto']: p for p in catalog_cache.get(self.db)}
+
+        self._lock = threading.Lock()
+        self._guardado = desde
+        self.rechazados = 0
+        with open(options['dead_letter'] or f'{archivo}.rechazados.ndjson', 'a', encoding='utf-8') as dead_letter:
+            self.dead_letter = dead_letter
+            writer = BatchWriter(
+                self.db[self.coleccion],
+                workers=options['workers'],
+                on_error=lambda doc, error, linea: self._rechazar(linea, doc, error),
+                on_progress=self._progreso,
+                after_batch=aplicar_rollups_pendientes if self.rollups else None,
+            )
+            lote = []
+            for linea, fila in self._filas(archivo, formato):
+                if linea <= desde:
+                    continue
+                lote.append((linea, fila))
+                if len(lote) >= options['batch_size']:
+                    self._enviar(writer, lote)
+                    lote = []
+            if lote:
+                self._enviar(writer, lote)
+            writer.close()
+            self._progreso(writer)
+        query_cache.bump(self.db.name, self.coleccion)
+        if self.coleccion == 'productos':
+            catalog_cache.invalidate()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{writer.inserted} insertados, {writer.duplicates} ya existentes, '
+            f'{self.rechazados + writer.failed} rechazados ({writer.rate():.0f} docs/s).'
+        ))
+
+    def _filas(self, archivo, formato):
+        with open(archivo, newline='', encoding='utf-8') as entrada:
+            if formato == 'csv':
+                for linea, fila in enumerate(csv.DictReader(entrada), start=1):
+                    yield linea, fila
+            else:
+                for linea, texto in enumerate(entrada, start=1):
+                    if not texto.strip():
+                        continue
+                    try:
+                        yield linea, json.loads(texto)
+                    except ValueError as exc:
+                        self._rechazar(linea, texto.strip(), f'JSON inválido: {exc}')
+
+    def _enviar(self, writer, lote):
+        # El lote válido va como docs más sus líneas, para que los rechazos del servidor
+        # lleguen al dead-letter con su número de línea
+        validos = self._validar(lote)
+        docs = [doc for _, doc in validos]
+        writer.submit(marcar_rollups_pendientes(docs) if self.rollups else docs, lote[-1][0], [linea for linea, _ in validos])
+
+    def _validar(self, lote):
+        if self.coleccion == 'pedidos':
+            ids = [ObjectId(f.get('cliente')) for _, f in lote if ObjectId.is_valid(f.get('cliente') or '')]
+            self.clientes_lote = {str(c['_id']) for c in self.db['clientes'].find({'_id': {'$in': ids}}, {'_id': 1})}
+        docs = []
+        for linea, fila in lote:
+            doc, errores = getattr(self, f'_doc_{self.coleccion}')(linea, fila)
+            if doc is None:
+                self._rechazar(linea, fila, errores)
+            else:
+                docs.append((linea, doc))
+        return docs
+
+    def _doc_clientes(self, linea, fila):
+        form = ClienteForm(fila)
+        if not form.is_valid():
+            return None, form.errors.get_json_data()
+        doc = build_cliente(form.cleaned_data)
+        doc['_id'] = _import_id(self.archivo, linea, fila)
+        return doc, None
+
+    def _doc_productos(self, linea, fila):
+        form = ProductoForm(fila)
+        if not form.is_valid():
+            return None, form.errors.get_json_data()
+        return build_producto(form.cleaned_data), None
+
+    def _doc_pedidos(self, linea, fila):
+        ids = _lista(fila.get('productos'))
+        cliente = str(fila.get('cliente') or '')
+        form = PedidoForm(
+            {'cliente': cliente, 'fecha_pedido': fila.get('fecha_pedido'), 'productos': ids},
+            clientes=[{'_id': cliente, 'nombre': ''}] if cliente in self.clientes_lote else [],
+            productos=[self.catalogo[i] for i in ids if i in self.catalogo],
+        )
+        if not form.is_valid():
+            return None, form.errors.get_json_data()
+        cantidades_fila = _cantidades(fila.get('cantidades'))
+        cantidades = {}
+        for prod_id in form.cleaned_data['productos']:
+            try:
+                cantidades[prod_id] = int(cantidades_fila.get(prod_id, 1))
+            except (TypeError, ValueError):
+                return None, {'cantidades': f'Cantidad inválida para {prod_id}.'}
+        doc = build_pedido(form.cleaned_data['cliente'], form.cleaned_data['fecha_pedido'], self.catalogo, cantidades)
+        doc['_id'] = _import_id(self.archivo, linea, fila)
+        return doc, None
+
+    def _rechazar(self, linea, fila, errores):
+        with self._lock:
+            self.rechazados += 1
+            self.dead_letter.write(json.dumps({'linea': linea, 'fila': fila, 'errores': errores}, default=str) + '\n')
+
+    def _leer_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, encoding='utf-8') as entrada:
+                return json.load(entrada).get('linea', 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _progreso(self, writer):
+        with self._lock:
+            if writer.checkpoint is not None and writer.checkpoint > self._guardado:
+                self._guardado = writer.checkpoint
+                with open(self.checkpoint_path, 'w', encoding='utf-8') as salida:
+                    json.dump({'archivo': self.archivo, 'linea': writer.checkpoint}, salida)
+            self.dead_letter.flush()
+        self.stdout.write(f'{writer.inserted} insertados, línea {self._guardado} ({writer.rate():.0f} docs/s)')
@@ -0,0 +1,69 @@
+# core/management/commands/check_query_plans.py
+from bson import json_util
+from django.core.management.base import CommandError
+from django.test import override_settings
+
+from core.cache import catalog_cache
+from core.management.base import SeededMongoCommand
+from core.plans import MAX_EXAMINADOS_POR_DEVUELTO, capture_view_commands, check_plans
+
+
+class Command(SeededMongoCommand):
+    help = (
+        'Pide cada URL de core/urls.py contra un mongod local (o --uri) cargado con datos '
+        'sintéticos, captura las consultas que emiten las vistas y ejecuta explain sobre cada '
+        'forma de consulta. Falla si un plan usa COLLSCAN o examina más de --max-ratio '
+        'documentos por cada uno que devuelve.'
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--max-ratio', type=float, default=MAX_EXAMINADOS_POR_DEVUELTO,
+                            help='Documentos o claves examinados permitidos por documento devuelto.')
+        parser.add_argument('--json', action='store_true', help='Escribe el informe completo en JSON.')
+
+    def handle(self, *args, **options):
+        """
+        Propósito: Verifica los planes de consulta de todas las vistas.
+
+        Funcionamiento:
+        - Prepara los datos como manage.py benchmark (mongod temporal o --uri, datos de
+          core/seed.py e índices de core/indexes.py).
+        - Desactiva QUERY_CACHE y vacía catalog_cache para que cada vista consulte MongoDB.
+        - Captura los comandos de cada vista (core/plans.py), explica cada forma una vez y
+          reporta etapas, examinados y devueltos.
+        - Falla si hay problemas no permitidos en COLLSCAN_PERMITIDOS o si una vista no responde 200.
+
+        """
+        try:
+            client, username, password, ajustes = self.open_dataset(options)
+            with override_settings(QUERY_CACHE={'ENABLED': False}, **ajustes):
+                catalog_cache.invalidate()
+                capturados, errores = capture_view_commands(self.cliente(username, password), self.escenarios(options))
+            informe = check_plans(client, capturados, options['max_ratio'])
+            client.close()
+        finally:
+            self.close_dataset()
+
+        if options['json']:
+            self.stdout.write(json_util.dumps({'shapes': informe, 'errors': errores}, indent=2, ensure_ascii=False))
+        fallidos = []
+        for forma in informe:
+            plan = forma['plan']
+            linea = (
+                f"{', '.join(forma['views'])} -> {forma['collection']}: {' > '.join(plan['stages'])} "
+                f"(examinados {plan['examined']}, devueltos {plan['returned']})"
+            )
+            if not forma['problems']:
+                self.stderr.write(linea)
+            elif forma['allowed']:
+                self.stderr.write(self.style.WARNING(f"{linea} — permitido: {'; '.join(forma['allowed'])}"))
+            else:
+                fallidos.append(forma)
+                self.stderr.write(self.style.ERROR(f"{linea} — {'; '.join(forma['problems'])}"))
+                self.stderr.write(f"    {json_util.dumps(forma['command'], ensure_ascii=False)}")
+        for vista, error in errores.items():
+            self.stderr.write(self.style.ERROR(f'{vista}: respondió {error}'))
+        if fallidos or errores:
+            raise CommandError(f'{len(fallidos)} formas de consulta con planes problemáticos y {len(errores)} vistas con error.')
+        self.stderr.write(self.style.SUCCESS(f'{len(informe)} formas de consulta verificadas.'))
@@ -0,0 +1,31 @@
+# core/management/commands/ensure_indexes.py
+from django.core.management.base import CommandError
+
+from core.indexes import ensure_indexes, index_drift
+from core.management.base import MongoCommand
+
+
+class Command(MongoCommand):
+    help = 'Crea en segundo plano los índices faltantes de ecommerce_db y reporta el drift respecto de core.indexes.INDEXES.'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--check', action='store_true', help='Solo reporta el drift, sin crear índices; falla si hay diferencias.')
+
+    def handle(self, *args, **options):
+        db = self.get_db(options)
+        drift = index_drift(db) if options['check'] else ensure_indexes(db)
+        hay_drift = False
+        for coleccion, estado in drift.items():
+            for idx in estado['missing']:
+                hay_drift = True
+                accion = 'falta' if options['check'] else 'creado'
+                self.stdout.write(f"{coleccion}: {idx['name']} {accion}")
+            for idx in estado['changed']:
+                hay_drift = True
+                self.stdout.write(self.style.WARNING(f"{coleccion}: {idx['name']} tiene claves distintas a la especificación"))
+            for name in estado['extra']:
+                self.stdout.write(self.style.WARNING(f"{coleccion}: {name} no está en la especificación"))
+        if options['check'] and hay_drift:
+            raise CommandError('Los índices no coinciden con la especificación.')
+        self.stdout.write(self.style.SUCCESS('Índices verificados.'))
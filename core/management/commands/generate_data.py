@@ -0,0 +1,153 @@
+# core/management/commands/generate_data.py
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import date
+
+import pymongo
+from django.core.management.base import CommandError
+
+from core.bulk import BatchWriter
+from core.indexes import ensure_indexes
+from core.management.base import MongoCommand
+from core.mongo import get_service_uri
+from core.rollups import CLIENTES_MES, PRODUCTOS_DIA, VENTAS_DIA, aplicar_rollups_pendientes, marcar_rollups_pendientes
+from core.seed import Distribucion, catalogo, generar_lote, lotes
+
+# Estado de cada proceso del pool: su propio MongoClient (pymongo no es fork-safe) y el catálogo
+_worker = {}
+
+
+def _init_worker(uri, database, semilla, totales, rollups):
+    _worker['db'] = pymongo.MongoClient(uri)[database]
+    _worker['catalogo'] = catalogo(semilla, totales['productos']) if totales['pedidos'] else {}
+    _worker['rollups'] = rollups
+
+
+def _escribir_lote(coleccion, semilla, inicio, cantidad, totales, distribucion):
+    docs = generar_lote(coleccion, semilla, inicio, cantidad, totales, distribucion, _worker['catalogo'])
+    after_batch = None
+    if coleccion == 'pedidos' and _worker['rollups']:
+        # Repetir la generación no vuelve a contar los pedidos cuyos rollups ya se aplicaron
+        after_batch = aplicar_rollups_pendientes
+        marcar_rollups_pendientes(docs)
+    writer = BatchWriter(_worker['db'][coleccion], workers=1, after_batch=after_batch)
+    writer.submit(docs, inicio + cantidad)
+    writer.close()
+    return coleccion, writer.inserted, writer.duplicates, writer.failed
+
+
+def _fecha(valor):
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise CommandError(f'Fecha inválida: {valor} (use AAAA-MM-DD).')
+
+
+class Command(MongoCommand):
+    help = (
+        'Genera clientes, productos y pedidos sintéticos y reproducibles (misma semilla = mismos '
+        'documentos) con la forma de insert_cliente/insert_producto/insert_pedido, escribiéndolos '
+        'en lotes desde varios procesos.'
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--clientes', type=int, default=100000)
+        parser.add_argument('--productos', type=int, default=1000)
+        parser.add_argument('--pedidos', type=int, default=1000000)
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--skew', type=float, default=1.0, help='Exponente Zipf de la popularidad de productos (0 = uniforme).')
+        parser.add_argument('--gmail', type=float, default=0.35, help='Proporción de clientes con email @gmail.com.')
+        parser.add_argument('--desde', help='Primera fecha de registro/pedido (AAAA-MM-DD, por defecto hace 3 años).')
+        parser.add_argument('--hasta', help='Última fecha de registro/pedido (AAAA-MM-DD, por defecto hoy).')
+        parser.add_argument('--max-productos', type=int, default=4, help='Productos distintos por pedido.')
+        parser.add_argument('--max-cantidad', type=int, default=5, help='Unidades por producto.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--processes', type=int, default=os.cpu_count(), help='Procesos generadores (por defecto uno por CPU).')
+        parser.add_argument('--drop', action='store_true', help='Borra clientes, productos, pedidos y rollups antes de generar.')
+        parser.add_argument('--skip-rollups', action='store_true',
+                            help='No actualiza los rollups por lote (más rápido; después ejecute rebuild_rollups).')
+
+    def handle(self, *args, **options):
+        """
+        Propósito: Genera el conjunto de datos repartiendo los lotes entre procesos.
+
+        Funcionamiento:
+        - Cada lote (colección, inicio, cantidad) se genera de forma determinista a partir de
+          la semilla y su posición (core/seed.py), así que puede generarse en cualquier proceso
+          y en cualquier orden; los pedidos referencian clientes por su _id determinista.
+        - Cada proceso tiene su propio MongoClient y escribe su lote con BatchWriter
+          (insert_many sin orden). Generar documentos es trabajo de CPU: con procesos, y no
+          hilos, el GIL no limita el throughput.
+        - Mantiene a lo sumo 2 × processes lotes en vuelo para acotar la memoria.
+        - Volver a ejecutar con la misma semilla no duplica documentos (los duplicados se
+          cuentan como ya existentes), por lo que una ejecución interrumpida puede repetirse.
+        - Al final crea los índices de core/indexes.py.
+
+        """
+        uri = get_service_uri(options['uri'], options['username'], options['password'])
+        if not uri:
+            raise CommandError('No hay conexión configurada: use --uri, --username/--password o MONGO_SERVICE_URI.')
+        try:
+            distribucion = Distribucion(
+                skew=options['skew'],
+                gmail=options['gmail'],
+                desde=_fecha(options['desde']) if options['desde'] else None,
+                hasta=_fecha(options['hasta']) if options['hasta'] else None,
+                max_productos=options['max_productos'],
+                max_cantidad=options['max_cantidad'],
+            )
+            totales = {k: options[k] for k in ('clientes', 'productos', 'pedidos')}
+            pendientes = lotes(totales, options['batch_size'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        db = self.get_db(options)
+        if options['drop']:
+            for coleccion in ('clientes', 'productos', 'pedidos', CLIENTES_MES, PRODUCTOS_DIA, VENTAS_DIA):
+                db[coleccion].drop()
+        # Los procesos abren sus propios clientes; el del comando no debe cruzar el fork
+        self.mongo_client.close()
+
+        semilla, procesos = options['semilla'], max(1, options['processes'] or 1)
+        conteos = {c: {'insertados': 0, 'existentes': 0, 'fallidos': 0} for c in totales}
+        inicio = ultimo_reporte = time.monotonic()
+        # fork evita reimportar Django en cada proceso; donde no existe se usa el método por defecto
+        contexto = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+        with ProcessPoolExecutor(
+            max_workers=procesos,
+            mp_context=contexto,
+            initializer=_init_worker,
+            initargs=(uri, options['database'], semilla, totales, not options['skip_rollups']),
+        ) as pool:
+            en_vuelo = set()
+            pendientes.reverse()
+            while pendientes or en_vuelo:
+                while pendientes and len(en_vuelo) < 2 * procesos:
+                    coleccion, desde, cantidad = pendientes.pop()
+                    en_vuelo.add(pool.submit(_escribir_lote, coleccion, semilla, desde, cantidad, totales, distribucion))
+                listos, en_vuelo = wait(en_vuelo, return_when=FIRST_COMPLETED)
+                for futuro in listos:
+                    coleccion, insertados, existentes, fallidos = futuro.result()
+                    conteos[coleccion]['insertados'] += insertados
+                    conteos[coleccion]['existentes'] += existentes
+                    conteos[coleccion]['fallidos'] += fallidos
+                if time.monotonic() - ultimo_reporte > 5:
+                    ultimo_reporte = time.monotonic()
+                    self._reportar(conteos, inicio)
+
+        self._reportar(conteos, inicio)
+        ensure_indexes(self.get_db(options))
+        self.stdout.write(self.style.SUCCESS(f'Datos generados en {time.monotonic() - inicio:.0f}s; índices creados.'))
+        if options['skip_rollups'] and totales['pedidos']:
+            self.stdout.write('Los rollups no se actualizaron: ejecute manage.py rebuild_rollups.')
+
+    def _reportar(self, conteos, inicio):
+        total = sum(c['insertados'] + c['existentes'] for c in conteos.values())
+        transcurrido = time.monotonic() - inicio
+        detalle = ', '.join(f"{coleccion} {c['insertados']}" + (f" (+{c['existentes']} ya existentes)" if c['existentes'] else '')
+                            + (f" ({c['fallidos']} fallidos)" if c['fallidos'] else '')
+                            for coleccion, c in conteos.items())
+        self.stdout.write(f'{detalle} — {total / transcurrido if transcurrido else 0:.0f} docs/s')
@@ -0,0 +1,64 @@
+# core/management/commands/rebuild_rollups.py
+from django.core.management.base import CommandError
+
+from core.indexes import INDEXES, ensure_indexes
+from core.management.base import MongoCommand
+from core.rollups import ROLLUP_CAMPOS, ROLLUPS_PENDIENTES, rollup_pipelines, verify_pipeline
+
+
+class Command(MongoCommand):
+    help = (
+        'Recalcula los rollups de ventas desde pedidos y los verifica contra los pedidos. '
+        'Detenga antes las escrituras de pedidos (insert_pedido, bulk_import, escritura diferida): '
+        'los $inc que lleguen durante la reconstrucción se perderían.'
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--verify-only', action='store_true', help='No recalcula; solo compara los rollups con pedidos.')
+        parser.add_argument('--show', type=int, default=10, help='Diferencias a mostrar por colección.')
+
+    def handle(self, *args, **options):
+        """
+        Propósito: Reconstruye y verifica rollup_clientes_mes, rollup_productos_dia y rollup_ventas_dia.
+
+        Funcionamiento:
+        - Requiere las escrituras de pedidos detenidas: cada rollup se recalcula con $out en
+          una colección temporal (con sus índices) que luego reemplaza a la actual con rename,
+          así que un $inc que llegue entre tanto se pierde. Si la cantidad de pedidos cambia
+          durante el recálculo se descarta la colección temporal y el comando falla.
+        - Al terminar quita la marca ROLLUPS_PENDIENTES de los pedidos: ya están contados.
+        - La verificación recalcula los grupos y los compara por _id con lo guardado, en el servidor.
+        - Falla si algún grupo falta o difiere, o si sobran documentos de rollup.
+
+        """
+        db = self.get_db(options)
+        if not options['verify_only']:
+            for coleccion, pipeline in rollup_pipelines().items():
+                temporal = f'{coleccion}_reconstruccion'
+                antes = db['pedidos'].estimated_document_count()
+                db['pedidos'].aggregate(pipeline + [{'$out': temporal}], allowDiskUse=True)
+                if db['pedidos'].estimated_document_count() != antes:
+                    db[temporal].drop()
+                    raise CommandError(f'{coleccion}: pedidos cambió durante la reconstrucción. Detenga las '
+                                       'escrituras de pedidos y vuelva a ejecutar el comando.')
+                ensure_indexes(db, {temporal: INDEXES.get(coleccion, [])})
+                db[temporal].rename(coleccion, dropTarget=True)
+                self.stdout.write(f'{coleccion}: reconstruido ({db[coleccion].estimated_document_count()} documentos)')
+            db['pedidos'].update_many({ROLLUPS_PENDIENTES: True}, {'$unset': {ROLLUPS_PENDIENTES: ''}})
+
+        errores = 0
+        for coleccion, campos in ROLLUP_CAMPOS.items():
+            diferencias = list(db['pedidos'].aggregate(verify_pipeline(coleccion, campos), allowDiskUse=True))
+            grupos = next(db['pedidos'].aggregate(rollup_pipelines()[coleccion] + [{'$count': 'n'}], allowDiskUse=True), {'n': 0})['n']
+            guardados = db[coleccion].count_documents({})
+            for diferencia in diferencias[:options['show']]:
+                self.stdout.write(self.style.WARNING(f"{coleccion}: {diferencia['_id']} esperado {[diferencia.get(c) for c in campos]}, "
+                                                     f"guardado {[diferencia.get('guardado', {}).get(c) for c in campos]}"))
+            if guardados != grupos:
+                self.stdout.write(self.style.WARNING(f'{coleccion}: {guardados} documentos guardados para {grupos} grupos'))
+            errores += len(diferencias) + (guardados != grupos)
+            self.stdout.write(f'{coleccion}: {len(diferencias)} diferencias')
+        if errores:
+            raise CommandError('Los rollups no coinciden con pedidos.')
+        self.stdout.write(self.style.SUCCESS('Rollups verificados.'))
@@ -0,0 +1,79 @@
+# core/management/commands/replay_write_behind.py
+import glob
+import os
+import time
+
+from django.core.management.base import CommandError
+
+from core.bulk import BatchWriter
+from core.cache import query_cache
+from core.management.base import MongoCommand
+from core.rollups import aplicar_rollups_pendientes, marcar_rollups_pendientes
+from core.writebehind import read_spill, spill_path
+
+
+class Command(MongoCommand):
+    help = (
+        'Escribe los pedidos derramados por la escritura diferida (WRITE_BEHIND["SPILL_FILE"]) '
+        'y sus rollups; los pedidos ya escritos se cuentan como existentes.'
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--file', help='Archivo de derrame (por defecto WRITE_BEHIND["SPILL_FILE"]).')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--keep', action='store_true', help='No borra los archivos procesados al terminar.')
+
+    def handle(self, *args, **options):
+        """
+        Propósito: Reintenta los pedidos del archivo de derrame con la conexión de servicio.
+
+        Funcionamiento:
+        - Cada línea guarda la base de datos y el pedido con su _id, así que repetir la
+          operación no duplica pedidos ni rollups: los pedidos se escriben marcados y sus
+          rollups se aplican una sola vez, aunque un intento anterior los haya insertado sin
+          alcanzar a aplicarlos (core.rollups.aplicar_rollups_pendientes).
+        - Renombra el archivo a <archivo>.replay-<fecha>-<pid> antes de leerlo: lo que se
+          derrame mientras tanto queda en un archivo nuevo, y dos ejecuciones no pisan sus archivos.
+        - Primero reintenta los .replay-* que dejó una ejecución fallida (o con --keep), así
+          que los pedidos que fallaron no se pierden ni se ignoran.
+        - Si algún pedido falla se conservan todos los archivos procesados; si no, se borran
+          (con --keep quedan en su lugar y la siguiente ejecución los vuelve a reintentar).
+
+        """
+        path = options['file'] or spill_path()
+        if not path:
+            raise CommandError('No hay archivo de derrame configurado: use --file o WRITE_BEHIND["SPILL_FILE"].')
+        archivos = sorted(glob.glob(glob.escape(path) + '.replay*'))
+        if os.path.exists(path):
+            en_proceso = base = f'{path}.replay-{time.strftime("%Y%m%d%H%M%S")}-{os.getpid()}'
+            sufijo = 0
+            while os.path.exists(en_proceso):
+                sufijo += 1
+                en_proceso = f'{base}-{sufijo}'
+            os.replace(path, en_proceso)
+            archivos.append(en_proceso)
+        if not archivos:
+            self.stdout.write('No hay pedidos pendientes.')
+            return
+
+        self.get_db(options)
+        por_db = {}
+        for archivo in archivos:
+            for db_name, pedido in read_spill(archivo):
+                por_db.setdefault(db_name, []).append(pedido)
+        fallidos = 0
+        for db_name, pedidos in por_db.items():
+            writer = BatchWriter(self.mongo_client[db_name]['pedidos'], after_batch=aplicar_rollups_pendientes)
+            for inicio in range(0, len(pedidos), options['batch_size']):
+                writer.submit(marcar_rollups_pendientes(pedidos[inicio:inicio + options['batch_size']]), inicio)
+            writer.close()
+            query_cache.bump(db_name, 'pedidos')
+            fallidos += writer.failed
+            self.stdout.write(f'{db_name}: {writer.inserted} escritos, {writer.duplicates} ya existentes, {writer.failed} fallidos')
+        if fallidos:
+            raise CommandError(f'{fallidos} pedidos no se pudieron escribir; se conservan en {", ".join(archivos)}.')
+        if not options['keep']:
+            for archivo in archivos:
+                os.remove(archivo)
+        self.stdout.write(self.style.SUCCESS('Pedidos pendientes escritos.'))
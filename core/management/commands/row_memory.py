@@ -0,0 +1,80 @@
+# core/management/commands/row_memory.py
+import gc
+import tracemalloc
+
+from django.template.loader import render_to_string
+
+from core.management.base import MongoCommand
+from core.rows import ROW_CLASSES, raw_collection
+
+# Plantilla de fila y nombre de variable de cada colección
+PLANTILLAS = {'clientes': ('core/rows/cliente.html', 'cliente'), 'pedidos': ('core/rows/pedido.html', 'pedido')}
+
+
+class Command(MongoCommand):
+    help = (
+        'Mide la memoria por fila de un listado con dicts y con las filas perezosas de '
+        'core/rows.py (MONGO_LAZY_ROWS), antes y después de renderizar cada fila.'
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--coleccion', choices=sorted(ROW_CLASSES), default='pedidos')
+        parser.add_argument('--limit', type=int, default=5000, help='Documentos a cargar.')
+
+    def _medir(self, cargar, plantilla, variable):
+        # (bytes retenidos tras cargar, bytes retenidos tras renderizar cada fila)
+        gc.collect()
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        filas = cargar()
+        cargadas = tracemalloc.get_traced_memory()[0] - base
+        for fila in filas:
+            render_to_string(plantilla, {variable: fila})
+        gc.collect()
+        renderizadas = tracemalloc.get_traced_memory()[0] - base
+        tracemalloc.stop()
+        return len(filas), cargadas, renderizadas
+
+    def handle(self, *args, **options):
+        """
+        Propósito: Compara la memoria por fila de dicts y de filas perezosas para una colección.
+
+        Funcionamiento:
+        - Carga los mismos --limit documentos (por _id) dos veces: como dicts, como hace
+          keyset_paginate por defecto, y como filas de core/rows.py desde BSON crudo.
+        - Mide con tracemalloc la memoria retenida por la lista tras cargarla y tras
+          renderizar cada fila con su plantilla (core/templates/core/rows/), que es lo que
+          ocurre en home.html y en los filtros.
+        - Escribe los bytes por fila de cada modo; la cache de plantillas se calienta antes.
+
+        """
+        db = self.get_db(options)
+        coleccion, limit = options['coleccion'], options['limit']
+        plantilla, variable = PLANTILLAS[coleccion]
+        collection = db[coleccion]
+        row_class = ROW_CLASSES[coleccion]
+
+        muestra = collection.find_one()
+        if muestra is None:
+            self.stdout.write(self.style.WARNING(f'{coleccion} está vacía.'))
+            return
+        render_to_string(plantilla, {variable: muestra})
+
+        modos = {
+            'dict': lambda: list(collection.find({}).sort('_id').limit(limit)),
+            'lazy': lambda: [row_class(doc.raw) for doc in raw_collection(collection).find({}).sort('_id').limit(limit)],
+        }
+        resultados = {modo: self._medir(cargar, plantilla, variable) for modo, cargar in modos.items()}
+        self.mongo_client.close()
+
+        for modo, (n, cargadas, renderizadas) in resultados.items():
+            self.stdout.write(
+                f'{modo:>5}: {n} filas, {cargadas / max(n, 1):,.0f} bytes/fila cargadas, '
+                f'{renderizadas / max(n, 1):,.0f} bytes/fila tras renderizar'
+            )
+        (_, dict_cargadas, dict_renderizadas), (_, lazy_cargadas, lazy_renderizadas) = resultados['dict'], resultados['lazy']
+        if dict_cargadas and dict_renderizadas:
+            self.stdout.write(self.style.SUCCESS(
+                f'lazy/dict: {lazy_cargadas / dict_cargadas:.0%} cargadas, {lazy_renderizadas / dict_renderizadas:.0%} tras renderizar'
+            ))
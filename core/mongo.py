@@ -0,0 +1,459 @@
+# core/mongo.py
+import asyncio
+import hashlib
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from urllib.parse import quote_plus
+
+import pymongo
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import signing
+
+from .instrumentation import command_listener
+
+
+def _pool_setting(name, default):
+    return getattr(settings, 'MONGO_POOL', {}).get(name, default)
+
+
+def credential_fingerprint(username, password):
+    """
+    Propósito: Genera una huella estable de las credenciales sin guardar la contraseña en claro.
+
+    Funcionamiento:
+    - Calcula un SHA-256 sobre usuario y contraseña.
+    - Se usa como clave del registro de clientes.
+
+    """
+    return hashlib.sha256(f'{username}\x00{password}'.encode('utf-8')).hexdigest()
+
+
+_VERIFIED_SALT = 'core.mongo.verified'
+
+
+def verified_token(username, password):
+    """
+    Propósito: Token firmado que certifica que las credenciales se verificaron contra el servidor.
+
+    Funcionamiento:
+    - Firma la huella de las credenciales (nunca la contraseña) con SECRET_KEY y la hora actual.
+    - Se guarda en la sesión al verificar las credenciales; token_is_verified lo valida.
+
+    """
+    return signing.dumps(credential_fingerprint(username, password), salt=_VERIFIED_SALT)
+
+
+def token_is_verified(token, username, password):
+    """
+    Propósito: Indica si token certifica estas credenciales y tiene menos de MONGO_VERIFIED_TTL segundos.
+    """
+    if not token:
+        return False
+    try:
+        huella = signing.loads(token, salt=_VERIFIED_SALT, max_age=getattr(settings, 'MONGO_VERIFIED_TTL', 300))
+    except signing.BadSignature:
+        return False
+    return huella == credential_fingerprint(username, password)
+
+
+def build_mongo_uri(username, password):
+    host = getattr(settings, 'MONGO_CLUSTER_HOST', 'cluster0.cc5wfzr.mongodb.net')
+    options = getattr(settings, 'MONGO_URI_OPTIONS', 'retryWrites=true&w=majority&appName=Cluster0')
+    scheme = getattr(settings, 'MONGO_URI_SCHEME', 'mongodb+srv')
+    return f"{scheme}://{quote_plus(username)}:{quote_plus(password)}@{host}/?{options}"
+
+
+def get_database_name():
+    return getattr(settings, 'MONGO_DB_NAME', 'ecommerce_db')
+
+
+def get_service_uri(uri=None, username=None, password=None):
+    """
+    Propósito: Resuelve la URI de servicio para tareas fuera de un request.
+
+    Funcionamiento:
+    - Usa la URI recibida; si no, construye una con usuario y contraseña.
+    - Si tampoco hay credenciales, usa settings.MONGO_SERVICE_URI o la variable de entorno MONGO_URI.
+    - Retorna None si no hay ninguna forma de conectarse.
+
+    """
+    if not uri and username and password:
+        uri = build_mongo_uri(username, password)
+    return uri or getattr(settings, 'MONGO_SERVICE_URI', None) or os.environ.get('MONGO_URI') or None
+
+
+def get_service_client(uri=None, username=None, password=None):
+    """
+    Propósito: Crea un cliente para tareas fuera de un request (comandos de manage.py, chequeos de inicio).
+
+    Funcionamiento:
+    - Resuelve la URI con get_service_uri; retorna None si no hay ninguna forma de conectarse.
+
+    """
+    uri = get_service_uri(uri, username, password)
+    if not uri:
+        return None
+    return pymongo.MongoClient(uri)
+
+
+class _Entrada:
+    # Cliente del registro con su último uso y los préstamos (leases) activos
+    __slots__ = ('client', 'last_used', 'leases', 'retired')
+
+    def __init__(self, client, last_used):
+        self.client = client
+        self.last_used = last_used
+        self.leases = 0
+        self.retired = False
+
+
+class MongoClientRegistry:
+    """
+    Propósito: Mantiene un MongoClient de larga vida por huella de credenciales.
+
+    Funcionamiento:
+    - Guarda los clientes en un OrderedDict usado como LRU, protegido por un lock.
+    - Limita el número de clientes (MAX_CLIENTS) y saca del registro el menos usado al exceder el límite.
+    - Saca los clientes que llevan más de IDLE_TIMEOUT segundos sin usarse.
+    - get(..., lease=True) presta el cliente: cuenta un préstamo hasta release(client).
+      Un cliente prestado no se considera inactivo, y si el LRU lo saca del registro se
+      cierra recién al devolver el último préstamo (un export en streaming o la escritura
+      diferida pueden seguir usándolo después de que otra sesión lo desplace). retain(client)
+      agrega un préstamo a un cliente ya obtenido.
+    - Tras un fork descarta los clientes heredados del padre (pymongo no es fork-safe) sin cerrarlos.
+    - Solo verifica la conexión (ping) al crear un cliente nuevo; los siguientes accesos lo reutilizan.
+    - Con verify=False ni siquiera al crearlo: lo usa get_mongo_client cuando la sesión trae
+      un token de credenciales verificadas vigente (ver verified_token).
+
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._clients = OrderedDict()
+        self._por_cliente = {}
+        self._pid = os.getpid()
+
+    def _client_kwargs(self):
+        return {
+            'maxPoolSize': _pool_setting('MAX_POOL_SIZE', 50),
+            'minPoolSize': _pool_setting('MIN_POOL_SIZE', 0),
+            'maxIdleTimeMS': _pool_setting('MAX_IDLE_TIME_MS', 60000),
+            'connectTimeoutMS': _pool_setting('CONNECT_TIMEOUT_MS', 10000),
+            'serverSelectionTimeoutMS': _pool_setting('SERVER_SELECTION_TIMEOUT_MS', 10000),
+            # Anota los comandos de cada request (core/instrumentation.py)
+            'event_listeners': [command_listener],
+        }
+
+    def _check_fork(self):
+        if os.getpid() != self._pid:
+            self._clients = OrderedDict()
+            self._por_cliente = {}
+            self._pid = os.getpid()
+
+    def _reset_after_fork(self):
+        # El lock pudo quedar tomado por otro hilo del padre en el momento del fork
+        self._lock = threading.RLock()
+        self._clients = OrderedDict()
+        self._por_cliente = {}
+        self._pid = os.getpid()
+
+    def _retire(self, key):
+        # Saca la entrada del registro; retorna el cliente si se puede cerrar ya (sin préstamos)
+        entrada = self._clients.pop(key)
+        entrada.retired = True
+        if entrada.leases:
+            return None
+        del self._por_cliente[id(entrada.client)]
+        return entrada.client
+
+    def _evict(self, now):
+        # Inactivos (sin préstamos) y exceso sobre MAX_CLIENTS; retorna los clientes a cerrar
+        idle_timeout = _pool_setting('IDLE_TIMEOUT', 300)
+        cerrar = [
+            self._retire(key) for key, entrada in list(self._clients.items())
+            if not entrada.leases and now - entrada.last_used > idle_timeout
+        ]
+        while len(self._clients) > _pool_setting('MAX_CLIENTS', 32):
+            cerrar.append(self._retire(next(iter(self._clients))))
+        return [client for client in cerrar if client is not None]
+
+    def _use(self, entrada, key, now, lease):
+        entrada.last_used = now
+        if lease:
+            entrada.leases += 1
+        self._clients.move_to_end(key)
+        return entrada.client
+
+    def get(self, username, password, verify=True, lease=False):
+        key = credential_fingerprint(username, password)
+        now = time.monotonic()
+        with self._lock:
+            self._check_fork()
+            cerrar = self._evict(now)
+            entrada = self._clients.get(key)
+            client = self._use(entrada, key, now, lease) if entrada is not None else None
+        for evicted in cerrar:
+            evicted.close()
+        if client is not None:
+            return client
+
+        client = pymongo.MongoClient(build_mongo_uri(username, password), **self._client_kwargs())
+        try:
+            if verify:
+                client.admin.command('ping')  # Verificar credenciales solo al crear el cliente
+        except Exception:
+            client.close()
+            raise
+
+        with self._lock:
+            self._check_fork()
+            existing = self._clients.get(key)
+            if existing is not None:
+                # Otro hilo creó el cliente mientras verificábamos: usamos el suyo
+                sobrante, client = client, self._use(existing, key, now, lease)
+            else:
+                sobrante = None
+                entrada = self._clients[key] = self._por_cliente[id(client)] = _Entrada(client, now)
+                self._use(entrada, key, now, lease)
+            cerrar = self._evict(now)
+        for evicted in ([sobrante] if sobrante is not None else []) + cerrar:
+            evicted.close()
+        return client
+
+    def retain(self, client):
+        """
+        Propósito: Agrega un préstamo a un cliente del registro; retorna False si no es del registro.
+        """
+        with self._lock:
+            entrada = self._por_cliente.get(id(client))
+            if entrada is None or entrada.client is not client:
+                return False
+            entrada.leases += 1
+            return True
+
+    def release(self, client):
+        """
+        Propósito: Devuelve un préstamo; cierra el cliente si ya salió del registro y era el último.
+        """
+        with self._lock:
+            entrada = self._por_cliente.get(id(client))
+            if entrada is None or entrada.client is not client or not entrada.leases:
+                return
+            entrada.leases -= 1
+            entrada.last_used = time.monotonic()
+            cerrar = entrada.retired and not entrada.leases
+            if cerrar:
+                del self._por_cliente[id(client)]
+        if cerrar:
+            client.close()
+
+    def discard(self, username, password):
+        key = credential_fingerprint(username, password)
+        with self._lock:
+            client = self._retire(key) if key in self._clients else None
+        if client is not None:
+            client.close()
+
+    def close_all(self):
+        with self._lock:
+            entradas = list(self._por_cliente.values())
+            self._clients, self._por_cliente = OrderedDict(), {}
+        for entrada in entradas:
+            entrada.client.close()
+        # También los AsyncMongoClient de las vistas asíncronas
+        async_registry.close_all()
+
+
+class MongoLeaseMiddleware:
+    """
+    Propósito: Devuelve al registro los clientes prestados a un request cuando termina su respuesta.
+
+    Funcionamiento:
+    - get_mongo_client anota en request.mongo_leases los clientes que pidió prestados.
+    - Una respuesta normal ya está renderizada al volver de la vista: los préstamos se
+      devuelven enseguida.
+    - En una respuesta en streaming los cursores se recorren al transmitir: su contenido se
+      envuelve en un iterable cuyo close() devuelve los préstamos. Django lo llama al cerrar
+      la respuesta, después del último fragmento o si el cliente cortó antes.
+
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        request.mongo_leases = []
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            _release_all(request)
+            raise
+        return _liberar_al_cerrar(response, request)
+
+    async def __acall__(self, request):
+        request.mongo_leases = []
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            _release_all(request)
+            raise
+        return _liberar_al_cerrar(response, request)
+
+
+def _release_all(request):
+    leases, request.mongo_leases = request.mongo_leases, []
+    for client in leases:
+        registry.release(client)
+
+
+class _ContenidoPrestado:
+    # Contenido de una respuesta en streaming: Django llama a close() del contenido al
+    # cerrar la respuesta (StreamingHttpResponse.streaming_content)
+    def __init__(self, contenido, request):
+        self.contenido = contenido
+        self.request = request
+
+    def close(self):
+        _release_all(self.request)
+
+
+class _ContenidoPrestadoSincrono(_ContenidoPrestado):
+    def __iter__(self):
+        return iter(self.contenido)
+
+
+class _ContenidoPrestadoAsincrono(_ContenidoPrestado):
+    def __aiter__(self):
+        return aiter(self.contenido)
+
+
+def _liberar_al_cerrar(response, request):
+    if not response.streaming:
+        _release_all(request)
+    elif response.is_async:
+        response.streaming_content = _ContenidoPrestadoAsincrono(response.streaming_content, request)
+    else:
+        response.streaming_content = _ContenidoPrestadoSincrono(response.streaming_content, request)
+    return response
+
+
+async def _cerrar_al_terminar(clients):
+    # Generador asíncrono "guardián" de un loop: el loop lo cierra en shutdown_asyncgens
+    # (asyncio.run, y con él async_to_sync, lo hace antes de cerrarse) y al cerrarlo se
+    # cierran los clientes de ese loop
+    try:
+        yield
+    finally:
+        while clients:
+            _, (client, _) = clients.popitem(last=False)
+            await client.close()
+
+
+class AsyncMongoClientRegistry:
+    """
+    Propósito: Equivalente de MongoClientRegistry para AsyncMongoClient (vistas asíncronas).
+
+    Funcionamiento:
+    - Un AsyncMongoClient queda ligado al event loop en que se usa, así que se guarda un
+      LRU por loop en un WeakKeyDictionary.
+    - Cada loop tiene un generador asíncrono guardián: cuando el loop termina con
+      shutdown_asyncgens (asyncio.run; bajo WSGI y en el Client de pruebas cada request usa
+      un loop propio) se cierran sus clientes, con su pool y sus tareas de monitoreo.
+    - close_all() cierra los clientes de todos los loops; registry.close_all() lo llama.
+    - Aplica los mismos límites (MAX_CLIENTS, IDLE_TIMEOUT) y opciones de pool que el registro síncrono.
+    - Solo hace ping al crear un cliente (y no lo hace con verify=False).
+
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._por_loop = weakref.WeakKeyDictionary()
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+        self._por_loop = weakref.WeakKeyDictionary()
+
+    async def _clients(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            estado = self._por_loop.get(loop)
+            nuevo = estado is None
+            if nuevo:
+                clients = OrderedDict()
+                estado = self._por_loop[loop] = (clients, _cerrar_al_terminar(clients))
+        if nuevo:
+            # Iniciarlo lo registra en el loop (sys.set_asyncgen_hooks) para shutdown_asyncgens
+            await estado[1].__anext__()
+        return estado[0]
+
+    def close_all(self):
+        """
+        Propósito: Cierra los clientes de todos los loops (el loop en curso, otro hilo o uno detenido).
+        """
+        with self._lock:
+            por_loop, self._por_loop = list(self._por_loop.items()), weakref.WeakKeyDictionary()
+        try:
+            actual = asyncio.get_running_loop()
+        except RuntimeError:
+            actual = None
+        for loop, (_, guardian) in por_loop:
+            if loop.is_closed():
+                continue
+            if loop is actual:
+                loop.create_task(guardian.aclose())
+            elif loop.is_running():
+                asyncio.run_coroutine_threadsafe(guardian.aclose(), loop).result(timeout=10)
+            else:
+                loop.run_until_complete(guardian.aclose())
+
+    async def get(self, username, password, verify=True):
+        key = credential_fingerprint(username, password)
+        clients = await self._clients()
+        now = time.monotonic()
+        idle_timeout = _pool_setting('IDLE_TIMEOUT', 300)
+        for k in [k for k, (_, last_used) in clients.items() if now - last_used > idle_timeout]:
+            client, _ = clients.pop(k)
+            await client.close()
+        entry = clients.get(key)
+        if entry is not None:
+            clients[key] = (entry[0], now)
+            clients.move_to_end(key)
+            return entry[0]
+
+        client = pymongo.AsyncMongoClient(build_mongo_uri(username, password), **registry._client_kwargs())
+        try:
+            if verify:
+                await client.admin.command('ping')
+        except Exception:
+            await client.close()
+            raise
+        existing = clients.get(key)
+        if existing is not None:
+            await client.close()
+            client = existing[0]
+        clients[key] = (client, now)
+        clients.move_to_end(key)
+        while len(clients) > _pool_setting('MAX_CLIENTS', 32):
+            _, (evicted, _) = clients.popitem(last=False)
+            await evicted.close()
+        return client
+
+
+registry = MongoClientRegistry()
+async_registry = AsyncMongoClientRegistry()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=registry._reset_after_fork)
+    os.register_at_fork(after_in_child=async_registry._reset_after_fork)
@@ -0,0 +1,251 @@
+# core/pagination.py
+import pymongo
+from bson import json_util
+from django.conf import settings
+from django.core import signing
+
+from .rows import raw_collection
+
+_TOKEN_SALT = 'core.pagination'
+
+
+def encode_token(sort_value, last_id):
+    """
+    Propósito: Codifica la posición (clave de orden, _id) como un token opaco y firmado.
+
+    Funcionamiento:
+    - Serializa los valores con json_util para conservar ObjectId, Decimal128 y fechas.
+    - Firma el resultado con django.core.signing para que no pueda manipularse desde la URL.
+
+    """
+    return signing.dumps(json_util.dumps({'v': sort_value, 'id': last_id}), salt=_TOKEN_SALT, compress=True)
+
+
+def decode_token(token):
+    """
+    Propósito: Recupera (clave de orden, _id) de un token; retorna None si es inválido.
+    """
+    try:
+        data = json_util.loads(signing.loads(token, salt=_TOKEN_SALT))
+        return data['v'], data['id']
+    except (signing.BadSignature, ValueError, KeyError, TypeError):
+        return None
+
+
+def get_page_size(request, prefix='', default=None):
+    default = default or getattr(settings, 'MONGO_PAGE_SIZE', 50)
+    maximum = getattr(settings, 'MONGO_MAX_PAGE_SIZE', 500)
+    try:
+        size = int(request.GET.get(f'{prefix}page_size', default))
+    except ValueError:
+        size = default
+    return max(1, min(size, maximum))
+
+
+def _keyset_condition(sort_key, sort_value, last_id, op):
+    if sort_key == '_id':
+        return {'_id': {op: last_id}}
+    # El rango sobre sort_key acota la primera clave del índice (sort_key, _id): el planificador
+    # hace un solo recorrido desde la posición en vez de dos recorridos y un SORT_MERGE
+    return {
+        sort_key: {'$gte' if op == '$gt' else '$lte': sort_value},
+        '$or': [
+            {sort_key: {op: sort_value}},
+            {sort_key: sort_value, '_id': {op: last_id}},
+        ],
+    }
+
+
+class Page:
+    """
+    Propósito: Una página de resultados con tokens opacos hacia la página siguiente y la anterior.
+
+    Funcionamiento:
+    - items contiene los documentos de la página en el orden de sort_key.
+    - next_query y prev_query son querystrings que conservan el resto de parámetros del request.
+
+    """
+
+    def __init__(self, request, prefix, items, next_token, prev_token):
+        self.items = items
+        self.next_token = next_token
+        self.prev_token = prev_token
+        self.next_query = self._query(request, prefix, 'after', next_token)
+        self.prev_query = self._query(request, prefix, 'before', prev_token)
+
+    @staticmethod
+    def _query(request, prefix, direction, token):
+        if token is None:
+            return None
+        params = request.GET.copy()
+        params.pop(f'{prefix}after', None)
+        params.pop(f'{prefix}before', None)
+        params[f'{prefix}{direction}'] = token
+        return params.urlencode()
+
+    @property
+    def has_next(self):
+        return self.next_token is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_token is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+class _Keyset:
+    """
+    Propósito: Estado de una petición de página (tamaño, posición y dirección) leído del request.
+
+    Funcionamiento:
+    - find_args/aggregate_stages construyen la consulta; page() arma la Page con los documentos.
+    - Separa la construcción de la consulta de su ejecución para compartirla entre las
+      versiones síncronas y asíncronas (core/async_views.py).
+    - descending recorre (sort_key, _id) de mayor a menor; page_size reemplaza a
+      MONGO_PAGE_SIZE como tamaño por defecto (?<prefix>page_size sigue teniendo prioridad).
+
+    """
+
+    def __init__(self, request, prefix, sort_key='_id', descending=False, page_size=None):
+        self.request = request
+        self.prefix = prefix
+        self.sort_key = sort_key
+        self.page_size = get_page_size(request, prefix, page_size)
+        self.after = decode_token(request.GET.get(f'{prefix}after', ''))
+        self.before = None if self.after else decode_token(request.GET.get(f'{prefix}before', ''))
+        self.backwards = self.before is not None
+        self.position = self.before or self.after
+        # Retroceder en un orden descendente es consultar en orden ascendente, y viceversa
+        self.reverse = self.backwards != descending
+        self.direction = pymongo.DESCENDING if self.reverse else pymongo.ASCENDING
+
+    def find_args(self, query):
+        filtro = query
+        if self.position is not None:
+            op = '$lt' if self.reverse else '$gt'
+            filtro = {'$and': [query, _keyset_condition(self.sort_key, self.position[0], self.position[1], op)]}
+        if self.sort_key == '_id':
+            sort = [('_id', self.direction)]
+        else:
+            sort = [(self.sort_key, self.direction), ('_id', self.direction)]
+        return filtro, sort, self.page_size + 1
+
+    def aggregate_stages(self, pipeline, page_pipeline=()):
+        stages = list(pipeline)
+        if self.position is not None:
+            stages.append({'$match': {'_id': {'$lt' if self.reverse else '$gt': self.position[1]}}})
+        stages += [
+            {'$sort': {'_id': self.direction}},
+            {'$limit': self.page_size + 1},
+        ] + list(page_pipeline)
+        return stages
+
+    def _token_for(self, doc):
+        return encode_token(doc.get(self.sort_key) if self.sort_key != '_id' else None, doc['_id'])
+
+    def page(self, items):
+        has_more = len(items) > self.page_size
+        items = items[:self.page_size]
+        if self.backwards:
+            items.reverse()
+        next_token = prev_token = None
+        if items:
+            if has_more or self.backwards:
+                next_token = self._token_for(items[-1])
+            if (has_more and self.backwards) or (self.after is not None and not self.backwards):
+                prev_token = self._token_for(items[0])
+        return Page(self.request, self.prefix, items, next_token, prev_token)
+
+
+def keyset_paginate(request, collection, query, sort_key='_id', prefix='', projection=None, cache=None,
+                    descending=False, page_size=None, hint=None, row_class=None):
+    """
+    Propósito: Pagina una consulta por keyset (clave de orden + _id) en vez de usar skip.
+
+    Funcionamiento:
+    - Ordena por (sort_key, _id) y pide page_size + 1 documentos para saber si hay más.
+    - Con el parámetro <prefix>after continúa después del último documento visto; con
+      <prefix>before retrocede pidiendo en orden inverso y luego invierte la página.
+    - Cada página cuesta lo mismo sin importar su profundidad, siempre que exista un índice
+      sobre (sort_key, _id).
+    - prefix permite paginar varias listas en la misma vista (p. ej. home_view).
+    - cache (core.cache.query_cache) guarda los documentos de la página por forma de consulta;
+      los tokens se generan en cada request.
+    - descending y page_size se describen en _Keyset; hint fuerza un índice por nombre.
+    - row_class (core.rows, con MONGO_LAZY_ROWS) pide los documentos como BSON crudo y
+      los entrega como filas perezosas en vez de dicts.
+
+    """
+    keyset = _Keyset(request, prefix, sort_key, descending, page_size)
+    filtro, sort, limit = keyset.find_args(query)
+
+    def consultar():
+        origen = collection if row_class is None else raw_collection(collection)
+        cursor = origen.find(filtro, projection).sort(sort).limit(limit)
+        cursor = cursor.hint(hint) if hint else cursor
+        if row_class is None:
+            return list(cursor)
+        return [row_class(doc.raw) for doc in cursor]
+
+    if cache is None:
+        return keyset.page(consultar())
+    filas = row_class.__name__ if row_class else None
+    return keyset.page(cache.fetch(collection, ['find', filtro, sort, limit, projection, hint, filas], consultar))
+
+
+def keyset_aggregate(request, collection, pipeline, page_pipeline=(), prefix='', cache=None, depends_on=(),
+                     **aggregate_kwargs):
+    """
+    Propósito: Pagina por keyset el resultado de una agregación cuyos documentos tienen _id único.
+
+    Funcionamiento:
+    - pipeline produce documentos con _id único (por ejemplo tras un $group).
+    - Agrega $match por _id respecto del token, $sort por _id y $limit page_size + 1.
+    - page_pipeline (por ejemplo un $lookup) va después del $limit en la misma agregación:
+      solo se ejecuta sobre los documentos de la página y no cambia su _id.
+    - aggregate_kwargs se pasa a aggregate (allowDiskUse, maxTimeMS, ...).
+    - cache funciona como en keyset_paginate; depends_on nombra las colecciones que lee el
+      pipeline además de collection (por ejemplo las de un $lookup).
+
+    """
+    keyset = _Keyset(request, prefix)
+    stages = keyset.aggregate_stages(pipeline, page_pipeline)
+
+    def consultar():
+        return list(collection.aggregate(stages, **aggregate_kwargs))
+
+    if cache is None:
+        return keyset.page(consultar())
+    return keyset.page(cache.fetch(collection, ['aggregate', stages], consultar, depends_on=depends_on))
+
+
+async def akeyset_paginate(request, collection, query, sort_key='_id', prefix='', projection=None,
+                           descending=False, page_size=None, hint=None, row_class=None):
+    """
+    Propósito: Versión asíncrona de keyset_paginate para colecciones de AsyncMongoClient.
+    """
+    keyset = _Keyset(request, prefix, sort_key, descending, page_size)
+    filtro, sort, limit = keyset.find_args(query)
+    origen = collection if row_class is None else raw_collection(collection)
+    cursor = origen.find(filtro, projection).sort(sort).limit(limit)
+    docs = await (cursor.hint(hint) if hint else cursor).to_list()
+    if row_class is None:
+        return keyset.page(docs)
+    return keyset.page([row_class(doc.raw) for doc in docs])
+
+
+async def akeyset_aggregate(request, collection, pipeline, page_pipeline=(), prefix='', **aggregate_kwargs):
+    """
+    Propósito: Versión asíncrona de keyset_aggregate para colecciones de AsyncMongoClient.
+    """
+    keyset = _Keyset(request, prefix)
+    cursor = await collection.aggregate(keyset.aggregate_stages(pipeline, page_pipeline), **aggregate_kwargs)
+    return keyset.page(await cursor.to_list())
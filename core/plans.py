@@ -0,0 +1,198 @@
+# core/plans.py
+import json
+
+from .instrumentation import capture_commands
+
+# Revisión de planes de consulta: ejecuta explain('executionStats') sobre los comandos que
+# emiten las vistas (capturados con core.instrumentation.capture_commands) y marca los que
+# recorren una colección completa (COLLSCAN) o examinan demasiados documentos por cada uno
+# que devuelven. Lo usa manage.py check_query_plans.
+
+# Claves o documentos examinados permitidos por cada documento devuelto
+MAX_EXAMINADOS_POR_DEVUELTO = 10
+
+# Lecturas completas aceptadas a propósito: (vista, colección) -> motivo
+COLLSCAN_PERMITIDOS = {
+    ('insert_pedido', 'productos'): 'catálogo completo del formulario, leído una vez por proceso (CatalogCache)',
+    ('insert_pedido', 'clientes'): 'el formulario de pedidos lista todos los clientes',
+}
+
+# Campos del comando que dependen de la sesión o del servidor y no van dentro de explain
+_CAMPOS_DE_SESION = {
+    'lsid', 'txnNumber', 'autocommit', 'startTransaction', 'readConcern', 'writeConcern',
+    'apiVersion', 'apiStrict', 'apiDeprecationErrors',
+}
+# Campos que se comparan por valor al agrupar formas: cambian el plan aunque no el tipo
+_LITERALES = {'sort', 'hint', 'projection'}
+# Etapas que no devuelven documentos de la colección: con ellas la proporción no aplica
+_ETAPAS_DE_AGREGACION = {'GROUP', 'EQ_LOOKUP', 'UNWIND', 'REPLACE_ROOT'}
+# Etapas de $text: ordenar por relevancia exige puntuar todas las coincidencias antes del
+# límite, así que tampoco se aplica la proporción
+_ETAPAS_DE_TEXTO = {'TEXT', 'TEXT_MATCH', 'TEXT_OR'}
+
+
+def _forma(valor, clave=None):
+    # Reemplaza cada valor por su tipo; las listas de $in/$nin/$all se reducen a sus tipos
+    if isinstance(valor, dict):
+        return {k: _forma(v, k) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        formas = [_forma(v) for v in valor]
+        if clave in ('$in', '$nin', '$all'):
+            return sorted({json.dumps(f, sort_keys=True) for f in formas})
+        return formas
+    return type(valor).__name__
+
+
+def shape_key(comando):
+    """
+    Propósito: Clave que agrupa los comandos con la misma forma de consulta.
+
+    Funcionamiento:
+    - Conserva el nombre del comando, la colección, los nombres de campos y operadores, y
+      sort/hint/projection por valor; el resto de los valores se reduce a su tipo.
+    - Dos filtros por dominio distinto (o dos páginas de la misma vista) tienen la misma clave.
+
+    """
+    nombre = next(iter(comando))
+    cuerpo = {
+        k: v if k in _LITERALES else _forma(v, k)
+        for k, v in comando.items()
+        if k != nombre and not k.startswith('$') and k not in _CAMPOS_DE_SESION
+    }
+    return json.dumps([nombre, comando[nombre], cuerpo], sort_keys=True, default=str)
+
+
+def explain(db, comando):
+    """
+    Propósito: Ejecuta explain('executionStats') sobre un comando capturado.
+    """
+    limpio = {k: v for k, v in comando.items() if not k.startswith('$') and k not in _CAMPOS_DE_SESION}
+    return db.command('explain', limpio, verbosity='executionStats')
+
+
+def _etapas(plan):
+    # Nombres de etapa del plan ganador, de arriba hacia abajo
+    etapas = [plan['stage']] if 'stage' in plan else []
+    for hijo in ('inputStage', 'thenStage', 'elseStage'):
+        if hijo in plan:
+            etapas += _etapas(plan[hijo])
+    for hijo in plan.get('inputStages', []):
+        etapas += _etapas(hijo)
+    return etapas
+
+
+def summarize(explicacion):
+    """
+    Propósito: Resume un explain en etapas, documentos examinados y documentos devueltos.
+
+    Funcionamiento:
+    - Lee queryPlanner/executionStats del nivel superior (find, count, distinct, o una
+      agregación que se ejecutó completa en el motor de consultas) y de la etapa $cursor de
+      una agregación.
+    - En el motor SBE el plan legible está en winningPlan.queryPlan.
+    - examined es el mayor entre claves y documentos examinados; returned son los documentos
+      que salen de la consulta (antes de $group en las agregaciones).
+    - lookup_collscans cuenta los recorridos completos de las etapas $lookup.
+
+    """
+    partes = [explicacion] if 'queryPlanner' in explicacion else []
+    resumen = {'stages': [], 'examined': 0, 'returned': 0, 'lookup_collscans': 0}
+    for etapa in explicacion.get('stages', []):
+        if '$cursor' in etapa:
+            partes.append(etapa['$cursor'])
+        elif '$lookup' in etapa:
+            resumen['lookup_collscans'] += etapa.get('collectionScans', 0)
+    for parte in partes:
+        plan = parte['queryPlanner']['winningPlan']
+        resumen['stages'] += _etapas(plan.get('queryPlan', plan))
+        stats = parte.get('executionStats', {})
+        resumen['examined'] += max(stats.get('totalKeysExamined', 0), stats.get('totalDocsExamined', 0))
+        resumen['returned'] += stats.get('nReturned', 0)
+    return resumen
+
+
+def plan_problems(resumen, max_ratio=MAX_EXAMINADOS_POR_DEVUELTO):
+    """
+    Propósito: Lista los problemas de un plan resumido con summarize.
+
+    Funcionamiento:
+    - COLLSCAN en el plan ganador o un $lookup que recorre la colección extranjera.
+    - Más de max_ratio examinados por documento devuelto (no aplica si el plan agrupa:
+      entonces devuelve grupos, no documentos; ni a las búsquedas $text por relevancia).
+
+    """
+    problemas = []
+    if 'COLLSCAN' in resumen['stages']:
+        problemas.append('recorre la colección completa (COLLSCAN)')
+    if resumen['lookup_collscans']:
+        problemas.append(f"$lookup sin índice ({resumen['lookup_collscans']} recorridos completos)")
+    agrupa = (_ETAPAS_DE_AGREGACION | _ETAPAS_DE_TEXTO).intersection(resumen['stages'])
+    if not agrupa and resumen['examined'] > max_ratio * max(resumen['returned'], 1):
+        problemas.append(f"examina {resumen['examined']} para devolver {resumen['returned']} (máximo {max_ratio}×)")
+    return problemas
+
+
+def capture_view_commands(cliente, escenarios):
+    """
+    Propósito: Pide cada URL con el cliente de pruebas y captura los comandos que emite.
+
+    Funcionamiento:
+    - escenarios es una lista de (vista, ruta); las respuestas en streaming se consumen
+      completas, porque sus consultas se ejecutan al transmitir.
+    - Retorna (capturados, errores): capturados es una lista de (vista, base de datos,
+      comando) y errores un dict {vista: status o excepción} de las respuestas que no son 200.
+
+    """
+    capturados, errores = [], {}
+    for vista, ruta in escenarios:
+        with capture_commands() as comandos:
+            try:
+                respuesta = cliente.get(ruta)
+                if respuesta.streaming:
+                    for _ in respuesta.streaming_content:
+                        pass
+            except Exception as exc:
+                errores[vista] = repr(exc)
+            else:
+                if respuesta.status_code != 200:
+                    errores[vista] = respuesta.status_code
+        capturados += [(vista, database, comando) for database, comando in comandos]
+    return capturados, errores
+
+
+def check_plans(client, capturados, max_ratio=MAX_EXAMINADOS_POR_DEVUELTO, permitidos=None):
+    """
+    Propósito: Explica cada forma de consulta capturada una sola vez y reporta sus problemas.
+
+    Funcionamiento:
+    - Agrupa los comandos con shape_key y explica el primero de cada forma con client
+      (que necesita permisos de lectura sobre las colecciones).
+    - Un COLLSCAN se acepta si todas las vistas que emiten la forma lo tienen permitido en
+      permitidos (por defecto COLLSCAN_PERMITIDOS); allowed lleva los motivos.
+    - Retorna una lista de dicts con views, collection, command, plan, problems y allowed.
+
+    """
+    permitidos = COLLSCAN_PERMITIDOS if permitidos is None else permitidos
+    formas = {}
+    for vista, database, comando in capturados:
+        clave = shape_key(comando)
+        if clave not in formas:
+            formas[clave] = {'views': [], 'database': database, 'command': comando}
+        if vista not in formas[clave]['views']:
+            formas[clave]['views'].append(vista)
+
+    informe = []
+    for forma in formas.values():
+        comando = forma['command']
+        coleccion = comando[next(iter(comando))]
+        resumen = summarize(explain(client[forma['database']], comando))
+        motivos = [permitidos.get((vista, coleccion)) for vista in forma['views']]
+        informe.append({
+            'views': forma['views'],
+            'collection': coleccion,
+            'command': comando,
+            'plan': resumen,
+            'problems': plan_problems(resumen, max_ratio),
+            'allowed': sorted(set(motivos)) if all(motivos) else None,
+        })
+    return informe
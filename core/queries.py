@@ -0,0 +1,316 @@
+# core/queries.py
+import re
+from datetime import date, datetime, time, timedelta, timezone
+
+import pymongo
+from bson.decimal128 import Decimal128
+from django.conf import settings
+
+from .documents import nombre_busqueda
+from .exports import COLUMNAS, projection_for
+from .indexes import INDEXES
+
+# Consultas de los filtros, compartidas por las vistas síncronas, las asíncronas y las exportaciones.
+# Todas salen de compile_filtro: los parámetros, las formas de consulta y los órdenes posibles
+# son los de FiltroClientesForm/FiltroPedidosForm, y cada forma tiene un índice en core/indexes.py.
+
+
+def _hace_un_ano(ahora):
+    # Las fechas se guardan sin hora (build_cliente/build_pedido): comparar con la medianoche
+    # siguiente a hace_un_ano selecciona los mismos documentos y deja la consulta fija durante
+    # todo el día, así su resultado se puede cachear (core/cache.py, QueryCache).
+    return datetime.combine((ahora - timedelta(days=365)).date(), time.min) + timedelta(days=1)
+
+
+def _medianoche(dia):
+    return datetime.combine(dia, time.min)
+
+
+def _index_name(coleccion, campo):
+    # Primer índice declarado cuya primera clave es campo (los de texto no admiten hint)
+    for indice in INDEXES.get(coleccion, []):
+        if indice['keys'][0] == (campo, pymongo.ASCENDING):
+            return indice['name']
+    return None
+
+
+class Consulta:
+    """
+    Propósito: Consulta compilada de un filtro, lista para keyset_paginate o stream_cursor.
+
+    Funcionamiento:
+    - query, projection y hint van a find(); sort_key y descending definen el orden keyset.
+    - page_size es el límite pedido (None = MONGO_PAGE_SIZE).
+
+    """
+
+    def __init__(self, coleccion, query, sort_key='_id', descending=False, projection=None, hint=None, page_size=None):
+        self.coleccion = coleccion
+        self.query = query
+        self.sort_key = sort_key
+        self.descending = descending
+        self.projection = projection
+        self.hint = hint
+        self.page_size = page_size
+
+
+def _rango(desde, hasta):
+    # Fechas inclusivas: hasta se convierte en "antes de la medianoche del día siguiente"
+    rango = {}
+    if desde:
+        rango['$gte'] = _medianoche(desde)
+    if hasta:
+        rango['$lt'] = _medianoche(hasta) + timedelta(days=1)
+    return rango
+
+
+def _hint(coleccion, igualdades, sort_key):
+    """
+    Propósito: Elige un índice para la forma de consulta, o None para dejarlo al planificador.
+
+    Funcionamiento:
+    - Una igualdad sobre un campo indexado (dominio, producto) es lo más selectivo: ese índice.
+    - Si no, y se ordena por un campo distinto de _id, el índice (campo, _id) recorre en orden
+      y evita un SORT en memoria aunque haya filtros sobre otros campos.
+    - Solo con MONGO_FILTER_HINTS = True (por defecto False): un hint a un índice que no
+      existe hace fallar la consulta, así que requiere manage.py ensure_indexes.
+
+    """
+    if not getattr(settings, 'MONGO_FILTER_HINTS', False):
+        return None
+    for campo in igualdades:
+        nombre = _index_name(coleccion, campo)
+        if nombre:
+            return nombre
+    if sort_key != '_id':
+        return _index_name(coleccion, sort_key)
+    return None
+
+
+def compile_filtro(coleccion, datos):
+    """
+    Propósito: Compila los parámetros validados de un filtro en una Consulta.
+
+    Funcionamiento:
+    - datos es el cleaned_data de FiltroClientesForm o FiltroPedidosForm (o el dict de un preset).
+    - Solo se traducen los parámetros conocidos: las consultas posibles son las de este
+      módulo y no lo que llegue en la URL.
+    - Proyecta las columnas de COLUMNAS[coleccion] (las que muestran las plantillas).
+
+    """
+    query, igualdades = {}, []
+    if coleccion == 'clientes':
+        rango = _rango(datos.get('registrado_desde'), datos.get('registrado_hasta'))
+        if rango:
+            query['fecha_registro'] = rango
+        if datos.get('dominio'):
+            query['email_domain'] = datos['dominio'].strip().lower()
+            igualdades.append('email_domain')
+    elif coleccion == 'pedidos':
+        rango = _rango(datos.get('desde'), datos.get('hasta'))
+        if rango:
+            query['fecha_pedido'] = rango
+        monto = {}
+        if datos.get('monto_mayor_que') is not None:
+            monto['$gt'] = Decimal128(str(datos['monto_mayor_que']))
+        if datos.get('monto_hasta') is not None:
+            monto['$lte'] = Decimal128(str(datos['monto_hasta']))
+        if monto:
+            query['monto_total'] = monto
+        productos = datos.get('producto') or []
+        if productos:
+            query['productos.producto_id'] = productos[0] if len(productos) == 1 else {'$in': productos}
+            igualdades.append('productos.producto_id')
+        if datos.get('cliente'):
+            # Un cliente es la igualdad más selectiva: su índice va primero
+            query['cliente_id'] = datos['cliente']
+            igualdades.insert(0, 'cliente_id')
+    else:
+        raise ValueError(f'Colección sin filtros: {coleccion}')
+
+    orden = datos.get('orden') or '_id'
+    sort_key = orden.lstrip('-')
+    return Consulta(
+        coleccion,
+        query,
+        sort_key=sort_key,
+        descending=orden.startswith('-'),
+        projection=projection_for(COLUMNAS[coleccion]),
+        hint=_hint(coleccion, igualdades, sort_key),
+        page_size=datos.get('limite'),
+    )
+
+
+def _dominio_requerido(params):
+    # Sin dominio el filtro no filtraría nada: exportaría o listaría todos los clientes
+    dominio = (params.get('dominio') or '').strip()
+    if not dominio:
+        raise ValueError('Falta el dominio.')
+    return dominio
+
+
+# Filtros fijos de las URLs existentes: (colección, función que recibe request.GET y retorna
+# los parámetros para compile_filtro). filter_clientes_pedidos_500_ultimo_ano no está aquí
+# porque es una agregación.
+PRESETS = {
+    'filter_clientes_ultimo_ano': ('clientes', lambda params: {
+        'registrado_desde': _hace_un_ano(datetime.now()).date(), 'orden': 'fecha_registro'}),
+    'filter_pedidos_monto_100': ('pedidos', lambda params: {'monto_mayor_que': 100, 'orden': 'monto_total'}),
+    'filter_clientes_gmail': ('clientes', lambda params: {'dominio': 'gmail.com'}),
+    'filter_clientes_dominio': ('clientes', lambda params: {'dominio': _dominio_requerido(params)}),
+    'filter_pedidos_2023': ('pedidos', lambda params: {
+        'desde': date(2023, 1, 1), 'hasta': date(2023, 12, 31), 'orden': 'fecha_pedido'}),
+    'filter_pedidos_producto_101': ('pedidos', lambda params: {'producto': ['101']}),
+}
+
+
+def preset(nombre, params=None):
+    """
+    Propósito: Compila el filtro fijo nombre (una clave de PRESETS) con los parámetros de la URL.
+
+    Funcionamiento:
+    - Lanza ValueError si faltan parámetros requeridos (el dominio de filter_clientes_dominio).
+
+    """
+    coleccion, datos_para = PRESETS[nombre]
+    return compile_filtro(coleccion, datos_para(params or {}))
+
+
+def clientes_pedidos_500_pipeline(monto_mayor_que=500):
+    """
+    Propósito: Agregación de clientes con pedidos > $500 en el último año.
+
+    Funcionamiento:
+    - Retorna (pipeline, lookup_clientes, opciones).
+    - pipeline agrupa los pedidos calificados por cliente (cliente_id convertido a ObjectId).
+    - lookup_clientes une cada grupo con su cliente; se aplica después de paginar.
+    - opciones lleva allowDiskUse y maxTimeMS (MONGO_AGGREGATION_TIME_LIMIT_MS).
+
+    """
+    hace_un_ano = _hace_un_ano(datetime.now(timezone.utc))
+    pipeline = [
+        {'$match': {'monto_total': {'$gt': monto_mayor_que}, 'fecha_pedido': {'$gte': hace_un_ano}}},
+        {'$group': {
+            '_id': {'$convert': {'input': '$cliente_id', 'to': 'objectId', 'onError': '$cliente_id', 'onNull': None}},
+            'pedidos_count': {'$sum': 1},
+            'monto_acumulado': {'$sum': '$monto_total'},
+        }},
+    ]
+    lookup_clientes = [
+        {'$lookup': {'from': 'clientes', 'localField': '_id', 'foreignField': '_id', 'as': 'cliente'}},
+        {'$replaceRoot': {'newRoot': {'$mergeObjects': [{'$arrayElemAt': ['$cliente', 0]}, '$$ROOT']}}},
+        {'$project': {'cliente': 0}},
+    ]
+    opciones = {
+        'allowDiskUse': True,
+        'maxTimeMS': getattr(settings, 'MONGO_AGGREGATION_TIME_LIMIT_MS', 30000),
+    }
+    return pipeline, lookup_clientes, opciones
+
+
+def reportes_pipeline(desde=None, hasta=None, top=10):
+    """
+    Propósito: Agregación $facet con los reportes de ventas de reportes_view.
+
+    Funcionamiento:
+    - Un $match por rango de fecha_pedido (inclusivo, índice fecha_pedido_1__id_1); sin
+      fechas se usa el último año, para no recorrer todos los pedidos por defecto.
+    - Un $project con solo los campos que usan los reportes.
+    - $facet calcula en una sola pasada:
+      - por_mes: ingresos y pedidos por mes (AAAA-MM).
+      - top_productos: los top productos por cantidad vendida, tras $unwind de productos.
+      - resumen: pedidos, ingresos y ticket promedio del rango.
+    - Retorna (pipeline, opciones); el resultado es un solo documento con los tres reportes.
+
+    """
+    if not desde and not hasta:
+        desde = _hace_un_ano(datetime.now()).date()
+    pipeline = [
+        {'$match': {'fecha_pedido': _rango(desde, hasta)}},
+        {'$project': {'_id': 0, 'fecha_pedido': 1, 'monto_total': 1,
+                      'productos.producto_id': 1, 'productos.nombre': 1, 'productos.precio': 1, 'productos.cantidad': 1}},
+        {'$facet': {
+            'por_mes': [
+                {'$group': {
+                    '_id': {'$dateToString': {'format': '%Y-%m', 'date': '$fecha_pedido'}},
+                    'ingresos': {'$sum': '$monto_total'},
+                    'pedidos': {'$sum': 1},
+                }},
+                {'$sort': {'_id': 1}},
+            ],
+            'top_productos': [
+                {'$unwind': '$productos'},
+                {'$group': {
+                    '_id': '$productos.producto_id',
+                    'nombre': {'$first': '$productos.nombre'},
+                    'cantidad': {'$sum': '$productos.cantidad'},
+                    'ingresos': {'$sum': {'$multiply': ['$productos.precio', '$productos.cantidad']}},
+                }},
+                {'$sort': {'cantidad': -1, '_id': 1}},
+                {'$limit': top},
+            ],
+            'resumen': [
+                {'$group': {
+                    '_id': None,
+                    'pedidos': {'$sum': 1},
+                    'ingresos': {'$sum': '$monto_total'},
+                    'ticket_promedio': {'$avg': '$monto_total'},
+                }},
+            ],
+        }},
+    ]
+    opciones = {
+        'allowDiskUse': True,
+        'maxTimeMS': getattr(settings, 'MONGO_AGGREGATION_TIME_LIMIT_MS', 30000),
+    }
+    return pipeline, opciones
+
+
+# Columnas de los resultados de búsqueda por colección
+COLUMNAS_BUSQUEDA = {
+    'clientes': ['_id', 'nombre', 'email', 'direccion', 'telefono'],
+    'productos': ['_id', 'nombre', 'precio'],
+}
+
+
+def busqueda(coleccion, texto, modo='texto', limite=None):
+    """
+    Propósito: Compila una búsqueda de buscar_view en los argumentos de find().
+
+    Funcionamiento:
+    - modo 'texto': $text sobre el índice de texto de la colección (clientes: nombre, email y
+      direccion con pesos 10/5/1; productos: nombre), ordenado por textScore. El servidor
+      ordena solo los documentos que contienen los términos y retorna los primeros limite.
+    - modo 'prefijo' (autocompletado): rango ^prefijo sobre nombre_busqueda, el nombre
+      normalizado en minúsculas y sin tildes (core/documents.py). Una expresión anclada sin
+      opciones se resuelve como un rango del índice (nombre_busqueda, _id), que además
+      entrega los resultados en orden alfabético sin ordenar en memoria.
+    - limite por defecto es MONGO_SEARCH_LIMIT; maxTimeMS es MONGO_SEARCH_TIME_LIMIT_MS.
+    - Retorna un dict con filter, projection, sort, limit, max_time_ms y, si corresponde, hint.
+
+    """
+    if coleccion not in COLUMNAS_BUSQUEDA:
+        raise ValueError(f'Colección sin búsqueda: {coleccion}')
+    projection = projection_for(COLUMNAS_BUSQUEDA[coleccion])
+    argumentos = {
+        'limit': limite or getattr(settings, 'MONGO_SEARCH_LIMIT', 20),
+        'max_time_ms': getattr(settings, 'MONGO_SEARCH_TIME_LIMIT_MS', 2000),
+    }
+    if modo == 'texto':
+        projection['score'] = {'$meta': 'textScore'}
+        argumentos.update(
+            filter={'$text': {'$search': texto}},
+            sort=[('score', {'$meta': 'textScore'}), ('_id', pymongo.ASCENDING)],
+        )
+    elif modo == 'prefijo':
+        argumentos.update(
+            filter={'nombre_busqueda': {'$regex': '^' + re.escape(nombre_busqueda(texto))}},
+            sort=[('nombre_busqueda', pymongo.ASCENDING), ('_id', pymongo.ASCENDING)],
+        )
+        hint = _hint(coleccion, ['nombre_busqueda'], '_id')
+        if hint:
+            argumentos['hint'] = hint
+    else:
+        raise ValueError(f'Modo de búsqueda desconocido: {modo}')
+    argumentos['projection'] = projection
+    return argumentos
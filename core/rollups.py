@@ -0,0 +1,228 @@
+# core/rollups.py
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+import pymongo
+from bson.decimal128 import Decimal128
+from django.conf import settings
+from pymongo import UpdateOne
+
+from .documents import to_decimal
+
+CLIENTES_MES = 'rollup_clientes_mes'
+PRODUCTOS_DIA = 'rollup_productos_dia'
+VENTAS_DIA = 'rollup_ventas_dia'
+
+# Contadores de cada rollup que compara rebuild_rollups
+ROLLUP_CAMPOS = {
+    CLIENTES_MES: ['pedidos', 'monto'],
+    PRODUCTOS_DIA: ['pedidos', 'cantidad', 'monto'],
+    VENTAS_DIA: ['pedidos', 'monto'],
+}
+
+
+# Marca de los pedidos escritos por lotes cuyos rollups aún no se aplicaron (ver
+# aplicar_rollups_pendientes); rebuild_rollups la quita de todos
+ROLLUPS_PENDIENTES = '_rollups_pendientes'
+# Topologías que admiten transacciones (un servidor standalone no las admite)
+_TOPOLOGIAS_CON_TRANSACCIONES = {'ReplicaSetWithPrimary', 'Sharded', 'LoadBalanced'}
+
+
+def _rollup_setting(name, default):
+    return getattr(settings, 'ROLLUPS', {}).get(name, default)
+
+
+def rollups_enabled():
+    return _rollup_setting('ENABLED', True)
+
+
+def _usar_transaccion(client):
+    # ROLLUPS['TRANSACTIONS']: True/False fuerza el modo; None lo decide según el servidor
+    transacciones = _rollup_setting('TRANSACTIONS', None)
+    if transacciones is None:
+        return client.topology_description.topology_type_name in _TOPOLOGIAS_CON_TRANSACCIONES
+    return transacciones
+
+
+def _dia(fecha):
+    return datetime(fecha.year, fecha.month, fecha.day)
+
+
+def rollup_updates(pedidos):
+    """
+    Propósito: Calcula las actualizaciones $inc de los rollups para una lista de pedidos.
+
+    Funcionamiento:
+    - Acumula primero en memoria por clave, así un lote con muchos pedidos del mismo día o
+      cliente produce una sola operación por documento de rollup.
+    - Retorna {coleccion: [UpdateOne(..., upsert=True)]}.
+    - Claves: (cliente_id, mes 'YYYY-MM'), (producto_id, día) y día.
+
+    """
+    clientes = defaultdict(lambda: [0, Decimal('0')])
+    productos = defaultdict(lambda: [0, 0, Decimal('0')])
+    dias = defaultdict(lambda: [0, Decimal('0')])
+    for pedido in pedidos:
+        fecha = pedido['fecha_pedido']
+        monto = to_decimal(pedido['monto_total'])
+        acumulado = clientes[(str(pedido['cliente_id']), fecha.strftime('%Y-%m'))]
+        acumulado[0] += 1
+        acumulado[1] += monto
+        acumulado = dias[_dia(fecha)]
+        acumulado[0] += 1
+        acumulado[1] += monto
+        for linea in pedido.get('productos', []):
+            acumulado = productos[(str(linea['producto_id']), _dia(fecha))]
+            acumulado[0] += 1
+            acumulado[1] += linea['cantidad']
+            acumulado[2] += to_decimal(linea['precio']) * linea['cantidad']
+
+    return {
+        CLIENTES_MES: [
+            UpdateOne({'_id': {'cliente_id': cliente_id, 'mes': mes}},
+                      {'$inc': {'pedidos': n, 'monto': Decimal128(monto)}}, upsert=True)
+            for (cliente_id, mes), (n, monto) in clientes.items()
+        ],
+        PRODUCTOS_DIA: [
+            UpdateOne({'_id': {'producto_id': producto_id, 'dia': dia}},
+                      {'$inc': {'pedidos': n, 'cantidad': cantidad, 'monto': Decimal128(monto)}}, upsert=True)
+            for (producto_id, dia), (n, cantidad, monto) in productos.items()
+        ],
+        VENTAS_DIA: [
+            UpdateOne({'_id': dia}, {'$inc': {'pedidos': n, 'monto': Decimal128(monto)}}, upsert=True)
+            for dia, (n, monto) in dias.items()
+        ],
+    }
+
+
+def apply_rollups(db, pedidos, session=None):
+    """
+    Propósito: Aplica los $inc de rollup_updates con un bulk_write sin orden por colección.
+    """
+    for coleccion, operaciones in rollup_updates(pedidos).items():
+        if operaciones:
+            db[coleccion].bulk_write(operaciones, ordered=False, session=session)
+
+
+def marcar_rollups_pendientes(pedidos):
+    """
+    Propósito: Marca pedidos antes de insertarlos por lotes; aplicar_rollups_pendientes quita la marca.
+    """
+    for pedido in pedidos:
+        pedido[ROLLUPS_PENDIENTES] = True
+    return pedidos
+
+
+def aplicar_rollups_pendientes(collection, escritos, duplicados=()):
+    """
+    Propósito: after_batch de BatchWriter para pedidos marcados: aplica sus rollups una sola vez aunque el lote se repita.
+
+    Funcionamiento:
+    - escritos se acaban de insertar con la marca ROLLUPS_PENDIENTES: sus rollups se aplican.
+    - duplicados son pedidos de un lote repetido (al reanudar bulk_import, replay_write_behind
+      o generate_data): solo se aplican los que siguen marcados en la colección, es decir los
+      que se insertaron pero cuyos rollups fallaron o no alcanzaron a aplicarse.
+    - Después quita la marca con un update_many por _id. Si el proceso cae entre los $inc y
+      ese $unset, la siguiente ejecución vuelve a contarlos; rebuild_rollups lo corrige.
+
+    """
+    pendientes = list(escritos)
+    if duplicados:
+        ids = [pedido['_id'] for pedido in duplicados]
+        marcados = {doc['_id'] for doc in collection.find({'_id': {'$in': ids}, ROLLUPS_PENDIENTES: True}, {'_id': 1})}
+        pendientes += [pedido for pedido in duplicados if pedido['_id'] in marcados]
+    if not pendientes:
+        return
+    apply_rollups(collection.database, pendientes)
+    collection.update_many({'_id': {'$in': [pedido['_id'] for pedido in pendientes]}}, {'$unset': {ROLLUPS_PENDIENTES: ''}})
+
+
+def insert_pedido_con_rollups(client, db, pedido):
+    """
+    Propósito: Inserta un pedido y actualiza sus rollups.
+
+    Funcionamiento:
+    - Si el servidor admite transacciones (replica set o sharded; ROLLUPS['TRANSACTIONS']
+      None) el insert y los $inc van en una sola transacción: o se aplican todos o ninguno.
+    - En un servidor standalone (o con TRANSACTIONS False) son dos escrituras: el pedido se
+      inserta primero y luego se aplican los $inc. Si el proceso cae entre ambas, los
+      rollups quedan cortos hasta ejecutar manage.py rebuild_rollups.
+
+    """
+    if not rollups_enabled():
+        db['pedidos'].insert_one(pedido)
+        return
+    if _usar_transaccion(client):
+        def escribir(session):
+            db['pedidos'].insert_one(pedido, session=session)
+            apply_rollups(db, [pedido], session=session)
+        with client.start_session() as session:
+            session.with_transaction(escribir)
+    else:
+        db['pedidos'].insert_one(pedido)
+        apply_rollups(db, [pedido])
+
+
+def rollup_pipelines():
+    """
+    Propósito: Pipelines que recalculan cada rollup desde pedidos, con las mismas claves.
+    """
+    dia = {'$dateTrunc': {'date': '$fecha_pedido', 'unit': 'day'}}
+    return {
+        CLIENTES_MES: [
+            {'$group': {
+                '_id': {'cliente_id': {'$toString': '$cliente_id'}, 'mes': {'$dateToString': {'date': '$fecha_pedido', 'format': '%Y-%m'}}},
+                'pedidos': {'$sum': 1},
+                'monto': {'$sum': {'$toDecimal': '$monto_total'}},
+            }},
+        ],
+        PRODUCTOS_DIA: [
+            {'$unwind': '$productos'},
+            {'$group': {
+                '_id': {'producto_id': {'$toString': '$productos.producto_id'}, 'dia': dia},
+                'pedidos': {'$sum': 1},
+                'cantidad': {'$sum': '$productos.cantidad'},
+                'monto': {'$sum': {'$multiply': [{'$toDecimal': '$productos.precio'}, '$productos.cantidad']}},
+            }},
+        ],
+        VENTAS_DIA: [
+            {'$group': {'_id': dia, 'pedidos': {'$sum': 1}, 'monto': {'$sum': {'$toDecimal': '$monto_total'}}}},
+        ],
+    }
+
+
+def ventas_diarias(db, desde, hasta):
+    """
+    Propósito: Ventas por día entre dos fechas leyendo solo rollup_ventas_dia.
+    """
+    return list(db[VENTAS_DIA].find({'_id': {'$gte': desde, '$lt': hasta}}).sort('_id', pymongo.ASCENDING))
+
+
+def top_clientes_mes(db, mes, limit=10):
+    """
+    Propósito: Clientes que más gastaron en un mes ('YYYY-MM') leyendo solo rollup_clientes_mes.
+    """
+    return list(db[CLIENTES_MES].find({'_id.mes': mes}).sort('monto', pymongo.DESCENDING).limit(limit))
+
+
+def verify_pipeline(coleccion, campos):
+    """
+    Propósito: Agrega al pipeline de un rollup la comparación contra la colección guardada.
+
+    Funcionamiento:
+    - Une cada grupo recalculado con su documento de rollup por _id ($lookup sobre el índice _id_).
+    - Deja solo los grupos que faltan o cuyos contadores difieren (montos redondeados a centavos).
+
+    """
+    distintos = []
+    for campo in campos:
+        if campo == 'monto':
+            distintos.append({'$ne': [{'$round': ['$monto', 2]}, {'$round': ['$guardado.monto', 2]}]})
+        else:
+            distintos.append({'$ne': [f'${campo}', f'$guardado.{campo}']})
+    return rollup_pipelines()[coleccion] + [
+        {'$lookup': {'from': coleccion, 'localField': '_id', 'foreignField': '_id', 'as': 'guardado'}},
+        {'$set': {'guardado': {'$arrayElemAt': ['$guardado', 0]}}},
+        {'$match': {'$expr': {'$or': distintos}}},
+    ]
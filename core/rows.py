@@ -0,0 +1,127 @@
+# core/rows.py
+import bson
+from bson.raw_bson import RawBSONDocument
+from django.conf import settings
+
+from .exports import COLUMNAS
+
+# Filas perezosas para los listados (opcional, MONGO_LAZY_ROWS): el cursor entrega el BSON
+# sin decodificar y cada fila lo decodifica solo cuando la plantilla lee un campo.
+
+
+class Row:
+    """
+    Propósito: Documento de un listado que guarda su BSON crudo y decodifica al primer acceso.
+
+    Funcionamiento:
+    - Mientras nadie lee un campo, la fila es un objeto con __slots__ y los bytes BSON
+      (sin dicts, strings ni Decimal128 intermedios).
+    - Al primer acceso a uno de FIELDS se decodifica el documento, se guardan los campos en
+      sus slots y se liberan los bytes: una fila renderizada no retiene el BSON y sus
+      valores a la vez, y ocupa menos que el dict equivalente (no tiene tabla hash).
+    - Los campos de FIELDS que el documento no trae (por una proyección) valen None; los
+      campos que no están en FIELDS se descartan.
+    - Se usa como un dict de solo lectura (fila['campo'], fila.get('campo')) y como objeto
+      (fila.campo): así funciona en las plantillas, en la paginación y en query_cache.
+    - with_field() retorna una copia con un campo extra (por ejemplo cliente), sin tocar la
+      fila original, que puede ser compartida por la cache.
+
+    """
+
+    __slots__ = ('raw', '_decodificada')
+    FIELDS = ()
+
+    def __init__(self, raw):
+        self.raw = raw
+        self._decodificada = False
+
+    def _decodificar(self):
+        raw = self.raw
+        if raw is None:
+            # Otro hilo ya la decodificó (las filas de query_cache se comparten)
+            return
+        documento = bson.decode(raw)
+        for campo in self.FIELDS:
+            if campo in documento:
+                object.__setattr__(self, campo, documento[campo])
+        self.raw = None
+        self._decodificada = True
+
+    def to_dict(self):
+        return {campo: getattr(self, campo) for campo in self.FIELDS if hasattr(self, campo)}
+
+    def __getattr__(self, name):
+        # Solo se llama para slots vacíos: el campo no se ha decodificado o no existe
+        if name in self.FIELDS and not self._decodificada:
+            self._decodificar()
+            return object.__getattribute__(self, name)
+        raise AttributeError(name)
+
+    def __getitem__(self, key):
+        # Los campos de FIELDS que el documento no trae valen None: las plantillas buscan
+        # primero fila[campo] y un slot vacío haría fallar el getattr que intentan después
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key, None)
+
+    def get(self, key, default=None):
+        valor = self[key] if key in self.FIELDS else None
+        return default if valor is None else valor
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def with_field(self, campo, valor):
+        copia = type(self)(None)
+        for nombre in self.FIELDS:
+            if nombre != campo and self[nombre] is not None:
+                object.__setattr__(copia, nombre, self[nombre])
+        object.__setattr__(copia, campo, valor)
+        copia._decodificada = True
+        return copia
+
+
+class ClienteRow(Row):
+    FIELDS = tuple(COLUMNAS['clientes'])
+    __slots__ = FIELDS
+
+
+class PedidoRow(Row):
+    # cliente lo agrega core.cache.ClienteResolver; no viene del documento
+    FIELDS = tuple(COLUMNAS['pedidos']) + ('cliente',)
+    __slots__ = FIELDS
+
+
+ROW_CLASSES = {'clientes': ClienteRow, 'pedidos': PedidoRow}
+
+
+def row_class(coleccion):
+    """
+    Propósito: Clase de fila perezosa para coleccion, o None si MONGO_LAZY_ROWS está desactivado.
+    """
+    if not getattr(settings, 'MONGO_LAZY_ROWS', False):
+        return None
+    return ROW_CLASSES.get(coleccion)
+
+
+def raw_collection(collection):
+    # La misma colección, pero con cursores que entregan RawBSONDocument
+    return collection.with_options(codec_options=collection.codec_options.with_options(document_class=RawBSONDocument))
+
+
+def with_field(doc, campo, valor):
+    """
+    Propósito: Copia superficial de doc (dict o Row) con un campo extra.
+    """
+    if isinstance(doc, Row):
+        return doc.with_field(campo, valor)
+    return dict(doc, **{campo: valor})
+
+
+def bson_size(doc):
+    """
+    Propósito: Tamaño BSON de un documento o de una Row (sin volver a codificarla si no se ha leído).
+    """
+    if isinstance(doc, Row):
+        return len(doc.raw) if doc.raw is not None else len(bson.encode(doc.to_dict()))
+    return len(bson.encode(doc))
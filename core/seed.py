@@ -0,0 +1,216 @@
+# core/seed.py
+import bisect
+import itertools
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from bson import ObjectId
+
+from .bulk import BatchWriter
+from .documents import CENTAVOS, build_cliente, build_pedido, build_producto
+from .rollups import aplicar_rollups_pendientes, marcar_rollups_pendientes
+
+# Datos sintéticos reproducibles para benchmarks, pruebas de escala y desarrollo. Con la misma
+# semilla, los mismos tamaños y la misma Distribucion se generan exactamente los mismos
+# documentos, con la forma que escriben insert_cliente, insert_producto e insert_pedido.
+
+OTROS_DOMINIOS = ['hotmail.com', 'yahoo.com', 'outlook.com', 'empresa.cl', 'uc.cl']
+NOMBRES = ['Ana', 'Luis', 'María', 'José', 'Carmen', 'Pedro', 'Lucía', 'Jorge', 'Sofía', 'Diego']
+APELLIDOS = ['González', 'Muñoz', 'Rojas', 'Díaz', 'Pérez', 'Soto', 'Contreras', 'Silva', 'Martínez', 'Sepúlveda']
+
+
+class Distribucion:
+    """
+    Propósito: Parámetros de forma de los datos sintéticos.
+
+    Funcionamiento:
+    - skew: exponente Zipf de la popularidad de productos (0 = uniforme; con 1 el producto
+      '101' aparece el doble que el '102' y diez veces más que el '110').
+    - gmail: proporción de clientes con email @gmail.com.
+    - desde/hasta: rango de fecha_registro y fecha_pedido; por defecto los últimos 3 años
+      hasta hoy, así los filtros "último año" seleccionan la misma proporción en cualquier fecha.
+    - max_productos/max_cantidad: productos distintos por pedido y unidades por producto.
+    - Se resuelve una vez (hasta = hoy) y se pasa a los procesos: todos generan lo mismo.
+
+    """
+
+    def __init__(self, skew=1.0, gmail=0.35, desde=None, hasta=None, max_productos=4, max_cantidad=5):
+        self.skew = skew
+        self.gmail = gmail
+        self.hasta = hasta or date.today()
+        self.desde = desde or self.hasta - timedelta(days=3 * 365)
+        if self.desde > self.hasta:
+            raise ValueError('desde debe ser anterior a hasta.')
+        self.max_productos = max_productos
+        self.max_cantidad = max_cantidad
+        self._acumulados = {}
+
+    def fecha(self, rng):
+        return self.desde + timedelta(days=rng.randint(0, (self.hasta - self.desde).days))
+
+    def pesos_acumulados(self, n):
+        # Pesos Zipf acumulados para n productos, calculados una vez por tamaño de catálogo
+        if n not in self._acumulados:
+            self._acumulados[n] = list(itertools.accumulate(1 / (rango ** self.skew) for rango in range(1, n + 1)))
+        return self._acumulados[n]
+
+    def productos_de_pedido(self, rng, ids):
+        acumulados = self.pesos_acumulados(len(ids))
+        cuantos = min(len(ids), rng.randint(1, self.max_productos))
+        elegidos = set()
+        while len(elegidos) < cuantos:
+            elegidos.add(ids[bisect.bisect(acumulados, rng.random() * acumulados[-1])])
+        return sorted(elegidos)
+
+
+def _rng(semilla, nombre, inicio):
+    # Un generador por colección y posición: cada lote se genera igual sin importar el orden
+    # ni el proceso en que se genere
+    return random.Random(f'{semilla}:{nombre}:{inicio}')
+
+
+def producto_id(i):
+    return str(101 + i)
+
+
+def fake_productos(semilla, inicio, cantidad):
+    """
+    Propósito: Genera productos con _id '101', '102', ... y precios entre 1 y 500.
+    """
+    rng = _rng(semilla, 'productos', inicio)
+    return [
+        build_producto({
+            'id_producto': producto_id(i),
+            'nombre': f'Producto {producto_id(i)}',
+            'precio': (Decimal(rng.randint(100, 50000)) / 100).quantize(CENTAVOS),
+        })
+        for i in range(inicio, inicio + cantidad)
+    ]
+
+
+def catalogo(semilla, productos, batch_size=1000):
+    """
+    Propósito: Retorna {id_producto: producto} de los productos generados con la semilla.
+    """
+    resultado = {}
+    for inicio in range(0, productos, batch_size):
+        for prod in fake_productos(semilla, inicio, min(batch_size, productos - inicio)):
+            resultado[prod['_id']] = prod
+    return resultado
+
+
+def cliente_id(semilla, i):
+    return ObjectId(random.Random(f'{semilla}:cliente_id:{i}').randbytes(12))
+
+
+def fake_clientes(semilla, inicio, cantidad, distribucion=None):
+    """
+    Propósito: Genera clientes válidos para ClienteForm, con _id determinista.
+    """
+    distribucion = distribucion or Distribucion()
+    rng = _rng(semilla, 'clientes', inicio)
+    clientes = []
+    for i in range(inicio, inicio + cantidad):
+        nombre = f'{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)}'
+        dominio = 'gmail.com' if rng.random() < distribucion.gmail else rng.choice(OTROS_DOMINIOS)
+        cliente = build_cliente({
+            'nombre': nombre,
+            'email': f"{nombre.split()[0].lower()}.{i}@{dominio}",
+            'fecha_registro': distribucion.fecha(rng),
+            'direccion': f'Calle {rng.randint(1, 999)} #{rng.randint(1, 9999)}',
+            'telefono': f'+569{rng.randint(10000000, 99999999)}',
+        })
+        cliente['_id'] = cliente_id(semilla, i)
+        clientes.append(cliente)
+    return clientes
+
+
+def fake_pedidos(semilla, inicio, cantidad, total_clientes, catalogo, distribucion=None):
+    """
+    Propósito: Genera pedidos con build_pedido sobre clientes y productos ya generados.
+
+    Funcionamiento:
+    - catalogo es {id_producto: producto}; los productos se eligen según la popularidad
+      Zipf de la distribución, en el orden de sus _id ('101' es el más popular).
+    - El cliente se elige entre los total_clientes generados con la misma semilla.
+
+    """
+    distribucion = distribucion or Distribucion()
+    rng = _rng(semilla, 'pedidos', inicio)
+    ids = sorted(catalogo, key=lambda prod_id: (len(prod_id), prod_id))
+    pedidos = []
+    for _ in range(inicio, inicio + cantidad):
+        pedido = build_pedido(
+            str(cliente_id(semilla, rng.randrange(total_clientes))),
+            distribucion.fecha(rng),
+            catalogo,
+            {prod_id: rng.randint(1, distribucion.max_cantidad) for prod_id in distribucion.productos_de_pedido(rng, ids)},
+        )
+        pedido['_id'] = ObjectId(rng.randbytes(12))
+        pedidos.append(pedido)
+    return pedidos
+
+
+def generar_lote(coleccion, semilla, inicio, cantidad, totales, distribucion, productos=None):
+    """
+    Propósito: Genera el lote [inicio, inicio + cantidad) de una colección.
+
+    Funcionamiento:
+    - totales es {'clientes': n, 'productos': n, 'pedidos': n}.
+    - productos es el catálogo ya generado (se calcula si no se entrega).
+
+    """
+    if coleccion == 'productos':
+        return fake_productos(semilla, inicio, cantidad)
+    if coleccion == 'clientes':
+        return fake_clientes(semilla, inicio, cantidad, distribucion)
+    if productos is None:
+        productos = catalogo(semilla, totales['productos'])
+    return fake_pedidos(semilla, inicio, cantidad, totales['clientes'], productos, distribucion)
+
+
+def lotes(totales, batch_size):
+    """
+    Propósito: Lista (coleccion, inicio, cantidad) de todos los lotes a generar.
+    """
+    if totales['pedidos'] and not (totales['clientes'] and totales['productos']):
+        raise ValueError('Los pedidos necesitan al menos un cliente y un producto.')
+    return [
+        (coleccion, inicio, min(batch_size, totales[coleccion] - inicio))
+        for coleccion in ('productos', 'clientes', 'pedidos')
+        for inicio in range(0, totales[coleccion], batch_size)
+    ]
+
+
+def seed_database(db, clientes, productos, pedidos, semilla=42, batch_size=1000, workers=4,
+                  distribucion=None, on_progress=None):
+    """
+    Propósito: Carga un conjunto de datos sintético completo en db desde este proceso.
+
+    Funcionamiento:
+    - Genera cada colección por lotes y la escribe con BatchWriter (insert_many sin orden
+      desde un pool de hilos); los pedidos actualizan también los rollups.
+    - Como los _id son deterministas, repetir la carga sobre la misma base no duplica datos.
+    - Para volúmenes grandes, manage.py generate_data reparte los lotes entre procesos.
+    - Retorna {coleccion: documentos insertados}.
+
+    """
+    distribucion = distribucion or Distribucion()
+    totales = {'clientes': clientes, 'productos': productos, 'pedidos': pedidos}
+    productos_por_id = catalogo(semilla, productos, batch_size)
+    writers = {}
+    for coleccion, inicio, cantidad in lotes(totales, batch_size):
+        writer = writers.get(coleccion)
+        if writer is None:
+            writer = writers[coleccion] = BatchWriter(
+                db[coleccion],
+                workers=workers,
+                on_progress=on_progress,
+                after_batch=aplicar_rollups_pendientes if coleccion == 'pedidos' else None,
+            )
+        docs = generar_lote(coleccion, semilla, inicio, cantidad, totales, distribucion, productos_por_id)
+        writer.submit(marcar_rollups_pendientes(docs) if coleccion == 'pedidos' else docs, inicio + cantidad)
+    for writer in writers.values():
+        writer.close()
+    return {coleccion: writer.inserted for coleccion, writer in writers.items()}
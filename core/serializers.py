@@ -0,0 +1,44 @@
+# core/serializers.py
+import json
+from datetime import date, datetime
+
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+
+
+def _bson_default(valor):
+    """
+    Propósito: Convierte los tipos BSON que json no conoce.
+
+    Funcionamiento:
+    - json solo llama a esta función para valores que no sabe codificar, así que los
+      documentos se serializan tal cual llegan del cursor, sin copiarlos antes.
+    - ObjectId se codifica como texto, Decimal128 como texto decimal exacto y las fechas en ISO 8601.
+
+    """
+    if isinstance(valor, ObjectId):
+        return str(valor)
+    if isinstance(valor, Decimal128):
+        return str(valor.to_decimal())
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    raise TypeError(f'{type(valor).__name__} no es serializable a JSON')
+
+
+_encoder = json.JSONEncoder(default=_bson_default, ensure_ascii=False, separators=(',', ':'))
+
+# Codifica un documento (o cualquier valor) a JSON compacto
+dumps = _encoder.encode
+
+
+def csv_value(valor):
+    """
+    Propósito: Valor de una celda CSV: tipos BSON como en JSON, subdocumentos y listas como JSON.
+    """
+    if valor is None:
+        return ''
+    if isinstance(valor, (str, int, float)):
+        return valor
+    if isinstance(valor, (dict, list)):
+        return dumps(valor)
+    return _bson_default(valor)
@@ -0,0 +1,142 @@
+# core/streaming.py
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.template.loader import get_template, render_to_string
+
+from .serializers import dumps
+
+_MARCADOR = '<!--filas-->'
+
+# Plantillas de encabezado y fila por tipo de documento
+_FRAGMENTOS = {
+    'clientes': ('core/rows/cliente_header.html', 'core/rows/cliente.html', 'cliente'),
+    'pedidos': ('core/rows/pedido_header.html', 'core/rows/pedido.html', 'pedido'),
+}
+
+
+def stream_format(request):
+    """
+    Propósito: Indica si el request pidió el modo streaming (?stream=html o ?stream=ndjson).
+    """
+    formato = request.GET.get('stream')
+    return formato if formato in ('html', 'ndjson') else None
+
+
+def stream_cursor(collection, query, projection=None):
+    """
+    Propósito: Abre un cursor con batch_size ajustado para streaming.
+
+    Funcionamiento:
+    - Usa MONGO_STREAM_BATCH_SIZE documentos por getMore: lotes grandes reducen los
+      round trips sin acumular más que un lote en memoria.
+
+    """
+    return collection.find(query, projection).batch_size(getattr(settings, 'MONGO_STREAM_BATCH_SIZE', 500))
+
+
+def stream_aggregate(collection, pipeline, **aggregate_kwargs):
+    """
+    Propósito: Igual que stream_cursor, pero para un pipeline de agregación.
+    """
+    return collection.aggregate(pipeline, batchSize=getattr(settings, 'MONGO_STREAM_BATCH_SIZE', 500), **aggregate_kwargs)
+
+
+def _chunks(rows):
+    # Agrupa varias filas por escritura para no pagar el coste de un yield por documento
+    chunk_rows = getattr(settings, 'MONGO_STREAM_CHUNK_ROWS', 100)
+    buffer = []
+    for row in rows:
+        buffer.append(row)
+        if len(buffer) >= chunk_rows:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def _cerrar_cursores(secciones):
+    for _, _, cursor in secciones:
+        cursor.close()
+
+
+def _html_rows(secciones):
+    # Los cursores de todas las secciones ya están abiertos (una agregación se ejecuta al
+    # crearla): si algo falla o el cliente corta a mitad de una sección, se cierran todos
+    try:
+        for titulo_seccion, tipo, cursor in secciones:
+            header_name, row_name, var = _FRAGMENTOS[tipo]
+            row_template = get_template(row_name)
+            yield f'<h2>{titulo_seccion}</h2>\n<table>\n' + get_template(header_name).render({})
+            for doc in cursor:
+                yield row_template.render({var: doc})
+            cursor.close()
+            yield '</table>\n'
+    finally:
+        _cerrar_cursores(secciones)
+
+
+def _ndjson_rows(secciones):
+    etiquetar = len(secciones) > 1
+    try:
+        for _, tipo, cursor in secciones:
+            for doc in cursor:
+                if etiquetar:
+                    doc['_coleccion'] = tipo
+                yield dumps(doc) + '\n'
+            cursor.close()
+    finally:
+        _cerrar_cursores(secciones)
+
+
+class _Transmision:
+    """
+    Propósito: Contenido de un StreamingHttpResponse que cierra los cursores al cerrarse la respuesta.
+
+    Funcionamiento:
+    - Django llama a close() del contenido al terminar el request, incluso si el cliente
+      no llegó a leer nada: entonces los generadores no alcanzaron su finally y los cursores
+      se cierran aquí.
+
+    """
+
+    def __init__(self, partes, secciones):
+        self.partes = partes
+        self.secciones = secciones
+
+    def __iter__(self):
+        return self.partes
+
+    def close(self):
+        self.partes.close()
+        _cerrar_cursores(self.secciones)
+
+
+def streaming_response(request, titulo, secciones):
+    """
+    Propósito: Devuelve un StreamingHttpResponse que recorre los cursores en vivo.
+
+    Funcionamiento:
+    - secciones es una lista de (título, tipo, cursor), con tipo 'clientes' o 'pedidos'.
+    - En modo html renderiza base.html una sola vez, lo corta en el marcador y emite
+      el encabezado, las filas a medida que llegan del cursor y el pie de la página.
+    - En modo ndjson emite un documento JSON por línea (con _coleccion si hay varias
+      secciones), codificado con core.serializers como /export/ y /api/.
+    - Nunca materializa el cursor: la memoria se mantiene plana y el primer byte sale
+      tras el primer lote.
+    - Todos los cursores se cierran al terminar, si algo falla a mitad o si se cierra la
+      respuesta sin haberla recorrido.
+
+    """
+    if stream_format(request) == 'ndjson':
+        return StreamingHttpResponse(_Transmision(_chunks(_ndjson_rows(secciones)), secciones),
+                                     content_type='application/x-ndjson')
+
+    pagina = render_to_string('core/stream.html', {'titulo': titulo, 'marcador': _MARCADOR}, request=request)
+    cabecera, pie = pagina.split(_MARCADOR, 1)
+
+    def generar():
+        yield cabecera
+        yield from _chunks(_html_rows(secciones))
+        yield pie
+
+    return StreamingHttpResponse(_Transmision(generar(), secciones), content_type='text/html; charset=utf-8')
@@ -1,3 +1,1022 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import bson
+from bson import ObjectId, json_util
+from bson.decimal128 import Decimal128
+from bson.raw_bson import RawBSONDocument
+from pymongo.errors import BulkWriteError
+from django.core import signing
+from django.core.management import CommandError, call_command
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import Client, RequestFactory, SimpleTestCase, override_settings
+from django.urls import reverse
+
+from core import instrumentation, queries
+from core.bulk import BatchWriter
+from core.cache import ClienteResolver, QueryCache, catalog_cache, query_cache
+from core.documents import build_pedido, to_decimal
+from core.exports import COLUMNAS
+from core.instrumentation import RequestStats, command_listener
+from core.management.base import SeededMongoCommand
+from core.management.commands.benchmark import Command as BenchmarkCommand
+from core.mongo import MongoClientRegistry, MongoLeaseMiddleware
+from core.pagination import Page, decode_token, encode_token
+from core.plans import plan_problems, shape_key
+from core.rollups import (CLIENTES_MES, ROLLUPS_PENDIENTES, VENTAS_DIA, aplicar_rollups_pendientes,
+                          insert_pedido_con_rollups, marcar_rollups_pendientes)
+from core.rows import ClienteRow, PedidoRow, bson_size, row_class, with_field
+from core.streaming import streaming_response
+from core.writebehind import WriteBehindBuffer, read_spill
+
+try:
+    import mongomock
+except ImportError:  # Solo para las pruebas (requirements.txt)
+    mongomock = None
+
+# Servidor para las pruebas que necesitan MongoDB: MONGO_TEST_URI (con usuario y contraseña,
+# sus datos se reemplazan) o un mongod en el PATH que se inicia en un directorio temporal
+MONGO_TEST_URI = os.environ.get('MONGO_TEST_URI')
+HAY_MONGOD = bool(MONGO_TEST_URI or shutil.which('mongod'))
+
+
+def _pedido(cliente_id='c1', dia=date(2024, 5, 2), precio='9.99', cantidad=2):
+    pedido = build_pedido(cliente_id, dia, {'a': {'nombre': 'A', 'precio': precio}}, {'a': cantidad})
+    pedido['_id'] = ObjectId()
+    return pedido
+
+
+class PaginationTokenTests(SimpleTestCase):
+    """
+    Propósito: Tokens de keyset_paginate: ida y vuelta con tipos BSON y rechazo de tokens manipulados.
+    """
+
+    def test_ida_y_vuelta(self):
+        _id = ObjectId()
+        for valor in (None, Decimal128('150.25'), datetime(2024, 3, 1), 'texto', 7):
+            self.assertEqual(decode_token(encode_token(valor, _id)), (valor, _id))
+
+    def test_token_manipulado(self):
+        token = encode_token(Decimal128('10'), ObjectId())
+        self.assertIsNone(decode_token(token[:-1] + ('A' if token[-1] != 'A' else 'B')))
+        self.assertIsNone(decode_token(''))
+        self.assertIsNone(decode_token('no-es-un-token'))
+
+    def test_token_firmado_con_otra_sal(self):
+        # Un valor firmado por otra parte de la aplicación no sirve como posición
+        self.assertIsNone(decode_token(signing.dumps(json_util.dumps({'v': 1, 'id': 2}))))
+
+
+class CompileFiltroTests(SimpleTestCase):
+    """
+    Propósito: Consultas, órdenes e hints que genera queries.compile_filtro.
+    """
+
+    def test_clientes(self):
+        consulta = queries.compile_filtro('clientes', {
+            'registrado_desde': date(2024, 1, 1), 'registrado_hasta': date(2024, 1, 31),
+            'dominio': ' Gmail.COM ', 'orden': '-fecha_registro',
+        })
+        self.assertEqual(consulta.query, {
+            'fecha_registro': {'$gte': datetime(2024, 1, 1), '$lt': datetime(2024, 2, 1)},
+            'email_domain': 'gmail.com',
+        })
+        self.assertEqual(consulta.sort_key, 'fecha_registro')
+        self.assertTrue(consulta.descending)
+        self.assertIsNone(consulta.hint)
+
+    def test_pedidos(self):
+        consulta = queries.compile_filtro('pedidos', {
+            'monto_mayor_que': Decimal('100'), 'monto_hasta': Decimal('200.50'),
+            'producto': ['101', '102'], 'cliente': 'c1', 'limite': 20,
+        })
+        self.assertEqual(consulta.query, {
+            'monto_total': {'$gt': Decimal128('100'), '$lte': Decimal128('200.50')},
+            'productos.producto_id': {'$in': ['101', '102']},
+            'cliente_id': 'c1',
+        })
+        self.assertEqual((consulta.sort_key, consulta.descending, consulta.page_size), ('_id', False, 20))
+        self.assertEqual(queries.compile_filtro('pedidos', {'producto': ['101']}).query, {'productos.producto_id': '101'})
+
+    @override_settings(MONGO_FILTER_HINTS=True)
+    def test_hints(self):
+        self.assertEqual(queries.compile_filtro('pedidos', {'producto': ['101'], 'cliente': 'c1'}).hint, 'cliente_id_1__id_1')
+        self.assertEqual(queries.compile_filtro('pedidos', {'orden': 'monto_total'}).hint, 'monto_total_1__id_1')
+        self.assertEqual(queries.compile_filtro('clientes', {'dominio': 'gmail.com'}).hint, 'email_domain_1__id_1')
+        self.assertIsNone(queries.compile_filtro('clientes', {}).hint)
+
+    def test_colecciones_y_presets(self):
+        with self.assertRaises(ValueError):
+            queries.compile_filtro('productos', {})
+        with self.assertRaises(ValueError):
+            queries.preset('filter_clientes_dominio', {'dominio': '  '})
+        self.assertEqual(queries.preset('filter_clientes_dominio', {'dominio': 'ucv.cl'}).query, {'email_domain': 'ucv.cl'})
+
+
+class PlansTests(SimpleTestCase):
+    """
+    Propósito: Agrupación de comandos con shape_key y detección de problemas con plan_problems.
+    """
+
+    def test_shape_key(self):
+        uno = {'find': 'pedidos', 'filter': {'cliente_id': 'a', 'productos.producto_id': {'$in': ['1', '2']}},
+               'sort': {'_id': 1}, 'limit': 51, 'lsid': {'id': 1}, '$db': 'ecommerce_db'}
+        otro = {'find': 'pedidos', 'filter': {'cliente_id': 'b', 'productos.producto_id': {'$in': ['3']}},
+                'sort': {'_id': 1}, 'limit': 21, 'lsid': {'id': 2}, '$db': 'ecommerce_db'}
+        self.assertEqual(shape_key(uno), shape_key(otro))
+        self.assertNotEqual(shape_key(uno), shape_key(dict(uno, sort={'_id': -1})))
+        self.assertNotEqual(shape_key(uno), shape_key(dict(uno, filter={'cliente_id': 1})))
+
+    def test_plan_problems(self):
+        def resumen(stages, examined, returned):
+            return {'stages': stages, 'examined': examined, 'returned': returned, 'lookup_collscans': 0}
+
+        self.assertEqual(plan_problems(resumen(['LIMIT', 'FETCH', 'IXSCAN'], 51, 51)), [])
+        self.assertEqual(len(plan_problems(resumen(['COLLSCAN'], 1000, 10))), 2)
+        self.assertEqual(len(plan_problems(resumen(['FETCH', 'IXSCAN'], 500, 10))), 1)
+        self.assertEqual(plan_problems(resumen(['FETCH', 'IXSCAN'], 500, 10), max_ratio=100), [])
+        # Las agregaciones devuelven grupos y $text ordena por relevancia: no se mide la proporción
+        self.assertEqual(plan_problems(resumen(['GROUP', 'IXSCAN'], 500, 3)), [])
+        self.assertEqual(plan_problems(resumen(['TEXT_MATCH', 'IXSCAN'], 500, 3)), [])
+        self.assertTrue(plan_problems(dict(resumen(['IXSCAN'], 1, 1), lookup_collscans=2)))
+
+
+class PreciosTests(SimpleTestCase):
+    """
+    Propósito: Aritmética decimal de los precios y del monto_total de build_pedido.
+    """
+
+    def test_to_decimal(self):
+        self.assertEqual(to_decimal(Decimal128('19.99')), Decimal('19.99'))
+        self.assertEqual(to_decimal(0.1), Decimal('0.1'))
+        self.assertEqual(to_decimal('3'), Decimal('3'))
+
+    def test_build_pedido(self):
+        productos = {
+            'a': {'nombre': 'A', 'precio': Decimal128('0.10')},
+            'b': {'nombre': 'B', 'precio': 0.2},
+            'c': {'nombre': 'C', 'precio': '1.005'},
+        }
+        pedido = build_pedido('c1', date(2024, 5, 2), productos, {'a': 3, 'b': 1, 'c': 0})
+        self.assertEqual(pedido['fecha_pedido'], datetime(2024, 5, 2))
+        # 0.10 × 3 + 0.20 + 1.00 (cantidad mínima 1; 1.005 se redondea a centavos)
+        self.assertEqual(pedido['monto_total'], Decimal128('1.50'))
+        self.assertEqual([p['cantidad'] for p in pedido['productos']], [3, 1, 1])
+        self.assertTrue(all(isinstance(p['precio'], Decimal128) for p in pedido['productos']))
+
+
+class BenchmarkComparacionTests(SimpleTestCase):
+    """
+    Propósito: benchmark --baseline informa todas las regresiones de cada vista.
+    """
+
+    def _resultado(self, p95, errores):
+        return {'latency_ms': {'p95': p95}, 'errors': errores}
+
+    def test_latencia_y_errores_de_la_misma_vista(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            path = os.path.join(directorio, 'baseline.json')
+            with open(path, 'w', encoding='utf-8') as archivo:
+                json.dump({'meta': {'dataset': 'x'}, 'results': {
+                    'home': self._resultado(10.0, 0), 'reportes': self._resultado(10.0, 0),
+                }}, archivo)
+            informe = {'meta': {'dataset': 'x'}, 'results': {
+                'home': self._resultado(20.0, 3), 'reportes': self._resultado(11.0, 0),
+            }}
+            comando = BenchmarkCommand(stdout=StringIO(), stderr=StringIO())
+            with self.assertRaises(CommandError) as contexto:
+                comando._comparar(informe, {'baseline': path, 'metric': 'p95', 'threshold': 20.0})
+        mensaje = str(contexto.exception)
+        self.assertIn('home: p95 10.0 ms -> 20.0 ms', mensaje)
+        self.assertIn('home: errores 0 -> 3', mensaje)
+        self.assertNotIn('reportes', mensaje)
+
+
+class CommandListenerTests(SimpleTestCase):
+    """
+    Propósito: El listener cuenta documentos y bytes de las respuestas decodificadas y de las crudas.
+    """
+
+    def _stats(self, reply):
+        stats = RequestStats()
+        evento = mock.Mock(command_name='find', duration_micros=1500, reply=reply)
+        token = instrumentation._current.set(stats)
+        try:
+            command_listener.succeeded(evento)
+        finally:
+            instrumentation._current.reset(token)
+        return stats
+
+    def setUp(self):
+        self.reply = {'cursor': {'firstBatch': [{'a': 1}, {'a': 2}], 'id': 0, 'ns': 'db.c'}, 'ok': 1.0}
+
+    def test_respuesta_cruda(self):
+        raw = bson.encode(self.reply)
+        stats = self._stats(RawBSONDocument(raw))
+        self.assertEqual((stats.documents, stats.bytes), (2, len(raw)))
+
+    def test_respuesta_decodificada(self):
+        stats = self._stats(self.reply)
+        self.assertEqual((stats.documents, stats.bytes, stats.duration_ms), (2, 0, 1.5))
+        with override_settings(MONGO_INSTRUMENTATION={'MEASURE_BYTES': True}):
+            self.assertEqual(self._stats(self.reply).bytes, len(bson.encode(self.reply)))
+
+
+@skipUnless(mongomock, 'Requiere mongomock.')
+class QueryCacheTests(SimpleTestCase):
+    """
+    Propósito: bump() de una colección invalida los resultados que dependen de ella, y solo esos.
+    """
+
+    def setUp(self):
+        self.cache = QueryCache()
+        self.db = mongomock.MongoClient()[f'cache_{ObjectId()}']
+        self.consultas = 0
+
+    def _fetch(self, coleccion='pedidos', depends_on=()):
+        def consultar():
+            self.consultas += 1
+            return [{'_id': self.consultas}]
+        return self.cache.fetch(self.db[coleccion], ['find', {}], consultar, depends_on=depends_on)
+
+    def test_generaciones(self):
+        self.assertEqual(self._fetch(depends_on=['clientes']), [{'_id': 1}])
+        self.assertEqual(self._fetch(depends_on=['clientes']), [{'_id': 1}])
+        self.cache.bump(self.db.name, 'productos')
+        self.assertEqual(self._fetch(depends_on=['clientes']), [{'_id': 1}])
+        self.cache.bump(self.db.name, 'clientes')
+        self.assertEqual(self._fetch(depends_on=['clientes']), [{'_id': 2}])
+        self.cache.bump(self.db.name, 'pedidos')
+        self.assertEqual(self._fetch(depends_on=['clientes']), [{'_id': 3}])
+        self.assertEqual(self.cache.stats()['hits'], 2)
+        self.assertEqual(self.cache.stats()['bumps'], 3)
+
+    def test_la_forma_es_parte_de_la_clave(self):
+        self._fetch('pedidos')
+        self._fetch('clientes')
+        self.assertEqual(self.consultas, 2)
+
+    @override_settings(QUERY_CACHE={'ENABLED': False})
+    def test_desactivada(self):
+        self._fetch()
+        self._fetch()
+        self.assertEqual(self.consultas, 2)
+
+
+@skipUnless(mongomock, 'Requiere mongomock.')
+class ClienteResolverTests(SimpleTestCase):
+    """
+    Propósito: ClienteResolver resuelve una página con una sola consulta $in y recuerda lo que encontró.
+    """
+
+    def setUp(self):
+        self.resolver = ClienteResolver()
+        self.db = mongomock.MongoClient()['ecommerce_db']
+        self.ana = self.db['clientes'].insert_one({'nombre': 'Ana', 'email': 'ana@gmail.com', 'telefono': '1'}).inserted_id
+        self.inexistente = ObjectId()
+        self.pedidos = [_pedido(str(self.ana)), _pedido(str(self.ana)), _pedido(str(self.inexistente)), _pedido('no-es-id')]
+
+    def test_una_consulta_por_pagina(self):
+        with mock.patch.object(self.db['clientes'], 'find', wraps=self.db['clientes'].find) as find:
+            clientes = self.resolver.resolve(self.db, self.pedidos)
+            self.assertEqual(clientes, {str(self.ana): {'nombre': 'Ana', 'email': 'ana@gmail.com'}})
+            self.assertEqual(self.resolver.resolve(self.db, self.pedidos), clientes)
+        # El id inexistente también se recuerda; el inválido ni se consulta
+        find.assert_called_once()
+        self.assertEqual(sorted(find.call_args.args[0]['_id']['$in']), sorted([self.ana, self.inexistente]))
+        self.assertEqual(self.resolver.stats()['hits'], 2)
+
+    def test_annotate_no_modifica_los_pedidos(self):
+        page = Page(RequestFactory().get('/'), '', self.pedidos, None, None)
+        self.resolver.annotate(self.db, page)
+        self.assertEqual([p['cliente'] for p in page.items],
+                         [{'nombre': 'Ana', 'email': 'ana@gmail.com'}] * 2 + [None, None])
+        self.assertTrue(all('cliente' not in p for p in self.pedidos))
+
+
+class RowsTests(SimpleTestCase):
+    """
+    Propósito: Las filas perezosas de core/rows.py se comportan como los documentos que reemplazan.
+    """
+
+    def setUp(self):
+        self.pedido = _pedido()
+        self.raw = bson.encode(dict(self.pedido, extra='x'))
+
+    def test_decodifica_al_primer_acceso(self):
+        fila = PedidoRow(self.raw)
+        self.assertEqual(bson_size(fila), len(self.raw))
+        self.assertEqual(fila['monto_total'], self.pedido['monto_total'])
+        self.assertIsNone(fila.raw)
+        self.assertEqual(fila.fecha_pedido, self.pedido['fecha_pedido'])
+        self.assertIsNone(fila['cliente'])
+        self.assertNotIn('cliente', fila)
+        self.assertEqual(fila.get('cliente', 'sin cliente'), 'sin cliente')
+        with self.assertRaises(KeyError):
+            fila['extra']
+        self.assertEqual(fila.to_dict(), {campo: self.pedido[campo] for campo in COLUMNAS['pedidos']})
+
+    def test_with_field_copia(self):
+        fila = PedidoRow(self.raw)
+        copia = with_field(fila, 'cliente', {'nombre': 'Ana'})
+        self.assertEqual(copia['cliente'], {'nombre': 'Ana'})
+        self.assertEqual(copia['_id'], self.pedido['_id'])
+        self.assertIsNone(fila['cliente'])
+
+    def test_proyeccion(self):
+        fila = ClienteRow(bson.encode({'_id': ObjectId(), 'nombre': 'Ana'}))
+        self.assertEqual(fila['nombre'], 'Ana')
+        self.assertIsNone(fila['email'])
+
+    def test_row_class(self):
+        self.assertIsNone(row_class('pedidos'))
+        with override_settings(MONGO_LAZY_ROWS=True):
+            self.assertIs(row_class('pedidos'), PedidoRow)
+            self.assertIsNone(row_class('productos'))
+
+
+@skipUnless(mongomock, 'Requiere mongomock.')
+class MongoClientRegistryTests(SimpleTestCase):
+    """
+    Propósito: LRU, inactividad, préstamos y fork del registro de clientes, con clientes de mongomock.
+    """
+
+    def setUp(self):
+        self.registry = MongoClientRegistry()
+        self.ahora = 1000.0
+        self.cerrados = []
+        for parche in (
+            mock.patch('core.mongo.pymongo.MongoClient', side_effect=self._cliente),
+            mock.patch('core.mongo.time.monotonic', side_effect=lambda: self.ahora),
+        ):
+            parche.start()
+            self.addCleanup(parche.stop)
+
+    def _cliente(self, uri, **kwargs):
+        client = mongomock.MongoClient()
+        client.close = lambda: self.cerrados.append(client)
+        return client
+
+    def test_reutiliza_el_cliente(self):
+        self.assertIs(self.registry.get('ana', 'x'), self.registry.get('ana', 'x'))
+        self.assertIsNot(self.registry.get('ana', 'x'), self.registry.get('ana', 'y'))
+
+    @override_settings(MONGO_POOL={'MAX_CLIENTS': 2})
+    def test_lru(self):
+        ana, beto = self.registry.get('ana', 'x'), self.registry.get('beto', 'x')
+        self.registry.get('ana', 'x')
+        self.registry.get('carla', 'x')
+        self.assertEqual(self.cerrados, [beto])
+        self.assertIs(self.registry.get('ana', 'x'), ana)
+
+    @override_settings(MONGO_POOL={'IDLE_TIMEOUT': 10})
+    def test_inactivos(self):
+        ana = self.registry.get('ana', 'x')
+        beto = self.registry.get('beto', 'x', lease=True)
+        self.ahora += 11
+        self.registry.get('carla', 'x')
+        self.assertEqual(self.cerrados, [ana])
+        self.assertIs(self.registry.get('beto', 'x'), beto)
+
+    def test_cuenta_prestamos(self):
+        client = self.registry.get('ana', 'x', lease=True)
+        self.registry.get('ana', 'x', lease=True)
+        self.assertTrue(self.registry.retain(client))
+        self.assertFalse(self.registry.retain(mongomock.MongoClient()))
+        self.assertEqual(self.registry._por_cliente[id(client)].leases, 3)
+        for _ in range(4):
+            self.registry.release(client)
+        self.assertEqual(self.registry._por_cliente[id(client)].leases, 0)
+        self.assertEqual(self.cerrados, [])
+
+    @override_settings(MONGO_POOL={'MAX_CLIENTS': 1})
+    def test_prestado_desplazado_se_cierra_al_devolverlo(self):
+        ana = self.registry.get('ana', 'x', lease=True)
+        self.registry.retain(ana)
+        beto = self.registry.get('beto', 'x')
+        self.assertEqual(self.cerrados, [])
+        self.assertIsNot(self.registry.get('ana', 'x'), ana)
+        self.assertEqual(self.cerrados, [beto])
+        self.registry.release(ana)
+        self.assertEqual(self.cerrados, [beto])
+        self.registry.release(ana)
+        self.assertEqual(self.cerrados, [beto, ana])
+        self.assertNotIn(id(ana), self.registry._por_cliente)
+
+    def test_descarta_los_clientes_del_padre_tras_un_fork(self):
+        padre = self.registry.get('ana', 'x')
+        with mock.patch('core.mongo.os.getpid', return_value=os.getpid() + 1):
+            hijo = self.registry.get('ana', 'x')
+        self.assertIsNot(hijo, padre)
+        self.assertEqual(self.cerrados, [])
+        self.assertNotIn(id(padre), self.registry._por_cliente)
+
+
+class MongoLeaseMiddlewareTests(SimpleTestCase):
+    """
+    Propósito: Los préstamos de un request se devuelven con la respuesta, o al cerrarla si es en streaming.
+    """
+
+    def setUp(self):
+        self.client = object()
+        parche = mock.patch('core.mongo.registry.release')
+        self.release = parche.start()
+        self.addCleanup(parche.stop)
+
+    def _llamar(self, respuesta):
+        def vista(request):
+            request.mongo_leases.append(self.client)
+            return respuesta
+
+        return MongoLeaseMiddleware(vista)(RequestFactory().get('/'))
+
+    def test_respuesta_normal(self):
+        self._llamar(HttpResponse('ok'))
+        self.release.assert_called_once_with(self.client)
+
+    def test_streaming_al_cerrar(self):
+        respuesta = self._llamar(StreamingHttpResponse(iter(['a', 'b'])))
+        self.assertEqual(b''.join(respuesta.streaming_content), b'ab')
+        self.release.assert_not_called()
+        respuesta.close()
+        self.release.assert_called_once_with(self.client)
+
+    def test_streaming_cerrado_sin_recorrer(self):
+        self._llamar(StreamingHttpResponse(iter(['a']))).close()
+        self.release.assert_called_once_with(self.client)
+
+
+@skipUnless(mongomock, 'Requiere mongomock.')
+class WriteBehindFlushTests(SimpleTestCase):
+    """
+    Propósito: _flush derrama solo los inserts fallidos; un fallo de rollups no derrama pedidos escritos.
+    """
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.path = os.path.join(directorio.name, 'pendientes.ndjson')
+        ajustes = override_settings(WRITE_BEHIND={'SPILL_FILE': self.path})
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.client = mongomock.MongoClient()
+        self.buffer = WriteBehindBuffer()
+
+    def test_fallan_los_rollups(self):
+        pedidos = [_pedido() for _ in range(3)]
+        with mock.patch('core.writebehind.apply_rollups', side_effect=RuntimeError):
+            self.buffer._flush([(self.client, 'db', p) for p in pedidos])
+        stats = self.buffer.stats()
+        self.assertEqual((stats['written'], stats['rollups_failed'], stats['spilled']), (3, 3, 0))
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(self.client.db.pedidos.count_documents({}), 3)
+
+    def test_falla_el_insert(self):
+        pedidos = [_pedido() for _ in range(3)]
+        with mock.patch('core.writebehind.apply_rollups') as rollups, \
+                mock.patch.object(mongomock.Collection, 'insert_many', side_effect=RuntimeError):
+            self.buffer._flush([(self.client, 'db', p) for p in pedidos])
+        rollups.assert_not_called()
+        self.assertEqual(self.buffer.stats()['failed'], 3)
+        self.assertEqual([p['_id'] for _, p in read_spill(self.path)], [p['_id'] for p in pedidos])
+
+    def test_duplicados_y_errores_por_pedido(self):
+        pedidos = [_pedido() for _ in range(3)]
+        error = BulkWriteError({'writeErrors': [
+            {'index': 0, 'code': 11000, 'errmsg': 'duplicado'},
+            {'index': 2, 'code': 121, 'errmsg': 'no cumple el esquema'},
+        ]})
+        with mock.patch('core.writebehind.apply_rollups') as rollups, \
+                mock.patch.object(mongomock.Collection, 'insert_many', side_effect=error):
+            self.buffer._flush([(self.client, 'db', p) for p in pedidos])
+        # Solo el pedido escrito lleva rollups; solo el rechazado se derrama
+        self.assertEqual(rollups.call_args.args[1], [pedidos[1]])
+        self.assertEqual([p['_id'] for _, p in read_spill(self.path)], [pedidos[2]['_id']])
+
+
+@skipUnless(mongomock, 'Requiere mongomock.')
+class ReplayWriteBehindTests(SimpleTestCase):
+    """
+    Propósito: replay_write_behind reintenta el derrame y los .replay-* pendientes sin perder pedidos.
+    """
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.directorio = directorio.name
+        self.path = os.path.join(self.directorio, 'pendientes.ndjson')
+        self.client = mongomock.MongoClient()
+        for parche in (
+            mock.patch('core.management.base.get_service_client', return_value=self.client),
+            # mongomock no implementa los bulk_write de los rollups (se prueban con mongod)
+            mock.patch('core.rollups.apply_rollups'),
+        ):
+            parche.start()
+            self.addCleanup(parche.stop)
+
+    def _derramar(self, path, pedidos):
+        with override_settings(WRITE_BEHIND={'SPILL_FILE': path}):
+            WriteBehindBuffer().spill('ecommerce_db', pedidos)
+
+    def _replay(self, *args):
+        call_command('replay_write_behind', '--file', self.path, *args, stdout=StringIO())
+
+    def _ids(self):
+        return {p['_id'] for p in self.client['ecommerce_db']['pedidos'].find()}
+
+    def test_reintenta_replay_pendiente(self):
+        # Un .replay de una ejecución anterior fallida y un derrame nuevo
+        viejo, nuevo = _pedido(), _pedido()
+        self._derramar(f'{self.path}.replay', [viejo])
+        self._derramar(self.path, [nuevo])
+        self._replay()
+        self.assertEqual(self._ids(), {viejo['_id'], nuevo['_id']})
+        self.assertEqual(os.listdir(self.directorio), [])
+
+    def test_solo_replay_pendiente(self):
+        viejo = _pedido()
+        self._derramar(f'{self.path}.replay-20240101000000-1', [viejo])
+        self._replay()
+        self.assertEqual(self._ids(), {viejo['_id']})
+
+    def test_fallo_conserva_los_archivos(self):
+        pedido = _pedido()
+        self._derramar(self.path, [pedido])
+        error = BulkWriteError({'writeErrors': [{'index': 0, 'code': 121, 'errmsg': 'no cumple el esquema'}]})
+        with mock.patch.object(mongomock.Collection, 'insert_many', side_effect=error):
+            with self.assertRaises(CommandError):
+                self._replay()
+        conservados = os.listdir(self.directorio)
+        self.assertEqual(len(conservados), 1)
+        self.assertTrue(conservados[0].startswith('pendientes.ndjson.replay-'))
+
+        # Lo que se derrame después no pisa el archivo conservado y ambos se reintentan
+        otro = _pedido()
+        self._derramar(self.path, [otro])
+        self._replay()
+        self.assertEqual(self._ids(), {pedido['_id'], otro['_id']})
+        self.assertEqual(os.listdir(self.directorio), [])
+
+    def test_keep_no_pisa_el_derrame_nuevo(self):
+        pedido, nuevo = _pedido(), _pedido()
+        self._derramar(self.path, [pedido])
+        self._replay('--keep')
+        self._derramar(self.path, [nuevo])
+        self.assertEqual([p['_id'] for _, p in read_spill(self.path)], [nuevo['_id']])
+        self._replay()
+        self.assertEqual(self._ids(), {pedido['_id'], nuevo['_id']})
+        self.assertEqual(os.listdir(self.directorio), [])
+
+    def test_sin_pendientes(self):
+        salida = StringIO()
+        call_command('replay_write_behind', '--file', self.path, stdout=salida)
+        self.assertIn('No hay pedidos pendientes', salida.getvalue())
+
+
+@skipUnless(mongomock, 'Requiere mongomock.')
+class BulkImportTests(SimpleTestCase):
+    """
+    Propósito: bulk_import rechaza filas inválidas con su línea y reanuda desde el checkpoint sin duplicar.
+    """
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.archivo = os.path.join(directorio.name, 'clientes.csv')
+        with open(self.archivo, 'w', encoding='utf-8') as salida:
+            salida.write('nombre,email,fecha_registro,direccion,telefono\n')
+            salida.write('Ana Pérez,ana@gmail.com,2024-01-02,Calle 1,+56912345678\n')
+            salida.write('Sin email,no-es-email,2024-01-02,Calle 2,+56912345678\n')
+            salida.write('Luis Soto,luis@ucv.cl,2024-02-03,Calle 3,+56987654321\n')
+        self.client = mongomock.MongoClient()
+        parche = mock.patch('core.management.base.get_service_client', return_value=self.client)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def _importar(self, *args):
+        salida = StringIO()
+        call_command('bulk_import', 'clientes', self.archivo, *args, stdout=salida)
+        return salida.getvalue()
+
+    def test_importa_y_reanuda(self):
+        self.assertIn('2 insertados, 0 ya existentes, 1 rechazados', self._importar())
+        clientes = self.client['ecommerce_db']['clientes']
+        self.assertEqual(sorted(c['email_domain'] for c in clientes.find()), ['gmail.com', 'ucv.cl'])
+        with open(f'{self.archivo}.rechazados.ndjson', encoding='utf-8') as rechazados:
+            self.assertEqual([json_util.loads(linea)['linea'] for linea in rechazados], [2])
+
+        # El checkpoint salta las filas ya importadas; --restart las cuenta como existentes
+        self.assertIn('0 insertados, 0 ya existentes', self._importar())
+        self.assertIn('0 insertados, 2 ya existentes', self._importar('--restart'))
+        self.assertEqual(clientes.count_documents({}), 2)
+
+
+@skipUnless(mongomock, 'Requiere mongomock.')
+class RollupsPendientesTests(SimpleTestCase):
+    """
+    Propósito: aplicar_rollups_pendientes aplica los rollups de un pedido una sola vez aunque su lote se repita.
+    """
+
+    def setUp(self):
+        self.pedidos = mongomock.MongoClient()['ecommerce_db']['pedidos']
+        parche = mock.patch('core.rollups.apply_rollups')
+        self.apply_rollups = parche.start()
+        self.addCleanup(parche.stop)
+
+    def _aplicados(self):
+        return [p['_id'] for llamada in self.apply_rollups.call_args_list for p in llamada.args[1]]
+
+    def test_duplicados_marcados(self):
+        escrito, sin_rollups, contado = marcar_rollups_pendientes([_pedido(), _pedido(), _pedido()])
+        # sin_rollups se insertó pero el proceso cayó antes de sus rollups; contado ya se contó
+        self.pedidos.insert_many([dict(sin_rollups), {k: v for k, v in contado.items() if k != ROLLUPS_PENDIENTES}])
+        writer = BatchWriter(self.pedidos, after_batch=aplicar_rollups_pendientes)
+        writer.submit([escrito, sin_rollups, contado], 3)
+        writer.close()
+        self.assertEqual((writer.inserted, writer.duplicates), (1, 2))
+        self.assertEqual(sorted(self._aplicados()), sorted([escrito['_id'], sin_rollups['_id']]))
+        self.assertEqual(self.pedidos.count_documents({ROLLUPS_PENDIENTES: True}), 0)
+
+        # Repetir el lote ya no aplica nada
+        self.apply_rollups.reset_mock()
+        writer = BatchWriter(self.pedidos, after_batch=aplicar_rollups_pendientes)
+        writer.submit(marcar_rollups_pendientes([escrito, sin_rollups, contado]), 3)
+        writer.close()
+        self.assertEqual(self._aplicados(), [])
+
+    def test_fallan_los_rollups(self):
+        pedido = marcar_rollups_pendientes([_pedido()])[0]
+        self.apply_rollups.side_effect = RuntimeError
+        writer = BatchWriter(self.pedidos, after_batch=aplicar_rollups_pendientes)
+        writer.submit([pedido], 1)
+        with self.assertRaises(RuntimeError):
+            writer.close()
+        # El pedido quedó escrito y marcado: el siguiente intento aplica sus rollups
+        self.assertEqual(self.pedidos.count_documents({ROLLUPS_PENDIENTES: True}), 1)
+        self.apply_rollups.side_effect = None
+        writer = BatchWriter(self.pedidos, after_batch=aplicar_rollups_pendientes)
+        writer.submit([pedido], 1)
+        writer.close()
+        self.assertEqual(self._aplicados(), [pedido['_id'], pedido['_id']])
+        self.assertEqual(self.pedidos.count_documents({ROLLUPS_PENDIENTES: True}), 0)
+
+
+@skipUnless(mongomock, 'Requiere mongomock.')
+@override_settings(QUERY_CACHE={'ENABLED': False})
+class MongomockViewTestCase(SimpleTestCase):
+    """
+    Propósito: Base de las pruebas de vistas con una base de mongomock en lugar del cluster.
+
+    Funcionamiento:
+    - get_mongo_client retorna un cliente cuyo ['ecommerce_db'] es self.db.
+    - self.client es un cliente de pruebas con las credenciales en la sesión.
+    - query_cache se desactiva y catalog_cache se vacía: cada prueba parte de una base vacía.
+
+    """
+
+    def setUp(self):
+        self.db = mongomock.MongoClient()['ecommerce_db']
+        client = mock.MagicMock()
+        client.__getitem__.return_value = self.db
+        parche = mock.patch('core.views.get_mongo_client', return_value=client)
+        parche.start()
+        self.addCleanup(parche.stop)
+        catalog_cache.invalidate()
+        self.client = SeededMongoCommand().cliente('usuario', 'clave')
+
+
+class ReportesViewTests(MongomockViewTestCase):
+    """
+    Propósito: reportes_view muestra las ventas por día y los mejores clientes leyendo los rollups.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.hoy = datetime.combine(date.today(), datetime.min.time())
+        self.cliente_id = ObjectId()
+        self.db['clientes'].insert_one({'_id': self.cliente_id, 'nombre': 'Ana Pérez', 'email': 'ana@gmail.com'})
+        # Montos numéricos: mongomock no ordena Decimal128
+        self.db[VENTAS_DIA].insert_many([
+            {'_id': self.hoy - timedelta(days=i), 'pedidos': 1, 'monto': 10} for i in range(40)
+        ])
+        mes = self.hoy.strftime('%Y-%m')
+        self.db[CLIENTES_MES].insert_many([
+            {'_id': {'cliente_id': 'sin-nombre', 'mes': mes}, 'pedidos': 1, 'monto': 50},
+            {'_id': {'cliente_id': str(self.cliente_id), 'mes': mes}, 'pedidos': 3, 'monto': 300},
+            {'_id': {'cliente_id': 'otro-mes', 'mes': '2000-01'}, 'pedidos': 9, 'monto': 900},
+        ])
+
+    def test_tablero(self):
+        respuesta = self.client.get(reverse('reportes'))
+        self.assertEqual(respuesta.status_code, 200)
+        reporte = respuesta.context['reporte']
+        self.assertEqual(len(reporte['ventas_dia']), 30)
+        self.assertEqual(reporte['ventas_dia'][-1]['dia'], date.today())
+        self.assertEqual([c['nombre'] for c in reporte['top_clientes']], ['Ana Pérez', None])
+        self.assertEqual(reporte['top_clientes'][0]['monto'], Decimal('300.00'))
+        self.assertContains(respuesta, 'Ana Pérez')
+
+    def test_rango(self):
+        desde = date.today() - timedelta(days=2)
+        respuesta = self.client.get(reverse('reportes'), {'desde': desde, 'hasta': date.today()})
+        self.assertEqual([d['dia'] for d in respuesta.context['reporte']['ventas_dia']],
+                         [desde + timedelta(days=i) for i in range(3)])
+
+    @override_settings(ROLLUPS={'ENABLED': False})
+    def test_sin_rollups(self):
+        respuesta = self.client.get(reverse('reportes'))
+        self.assertNotIn('ventas_dia', respuesta.context['reporte'])
+
+
+class ExportViewTests(MongomockViewTestCase):
+    """
+    Propósito: Exportaciones y streaming: parámetros inválidos responden 400 y el NDJSON tiene un solo formato.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.pedido = build_pedido(str(ObjectId()), date(2024, 5, 2), {'101': {'nombre': 'Té', 'precio': '9.99'}}, {'101': 2})
+        self.db['pedidos'].insert_one(self.pedido)
+
+    def _ndjson(self, respuesta):
+        self.assertEqual(respuesta.status_code, 200)
+        return [json.loads(linea) for linea in b''.join(respuesta.streaming_content).decode('utf-8').splitlines()]
+
+    def test_mismo_ndjson_en_export_stream_y_api(self):
+        exportado = self._ndjson(self.client.get(reverse('export', args=['filter_pedidos_producto_101']), {'formato': 'ndjson'}))
+        transmitido = self._ndjson(self.client.get(reverse('filter_pedidos_producto_101'), {'stream': 'ndjson'}))
+        api = json.loads(self.client.get(reverse('api', args=['filter_pedidos_producto_101'])).content)['items']
+        self.assertEqual(exportado, transmitido)
+        for doc in (exportado[0], transmitido[0], api[0]):
+            self.assertEqual(doc['_id'], str(self.pedido['_id']))
+            self.assertEqual(doc['monto_total'], '19.98')
+            self.assertEqual(doc['fecha_pedido'], '2024-05-02T00:00:00')
+
+    def test_dominio_obligatorio(self):
+        respuesta = self.client.get(reverse('export', args=['filter_clientes_dominio']), {'dominio': ' '})
+        self.assertEqual(respuesta.status_code, 400)
+        respuesta = self.client.get(reverse('api', args=['filter_clientes_dominio']))
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('error', respuesta.json())
+        self.assertEqual(self.client.get(reverse('filter_clientes_dominio', args=[' '])).status_code, 400)
+
+    def test_formulario_invalido(self):
+        respuesta = self.client.get(reverse('export', args=['pedidos']), {'desde': 'ayer'})
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(respuesta['Content-Type'], 'application/json')
+        self.assertIn('desde', json.loads(respuesta.content))
+
+    def test_filtro_desconocido(self):
+        self.assertEqual(self.client.get(reverse('export', args=['nada'])).status_code, 404)
+
+
+class InsertPedidoViewTests(MongomockViewTestCase):
+    """
+    Propósito: El formulario de insert_pedido solo lee _id y nombre de los clientes.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.ana = self.db['clientes'].insert_one({'nombre': 'Ana', 'email': 'ana@gmail.com', 'direccion': 'Calle 1'}).inserted_id
+        self.db['productos'].insert_one({'_id': '101', 'nombre': 'Té', 'precio': 9.99})
+
+    def _opciones(self, respuesta):
+        return list(respuesta.context['form'].fields['cliente'].choices)[1:]
+
+    def test_proyeccion_de_clientes(self):
+        clientes = self.db['clientes']
+        with mock.patch.object(clientes, 'find', wraps=clientes.find) as find:
+            respuesta = self.client.get(reverse('insert_pedido'))
+            self.assertEqual(self._opciones(respuesta), [(self.ana, 'Ana')])
+            respuesta = self.client.post(reverse('insert_pedido'), {'cliente': str(self.ana), 'fecha_pedido': 'ayer'})
+            self.assertEqual(self._opciones(respuesta), [(self.ana, 'Ana')])
+        self.assertTrue(find.call_args_list)
+        for llamada in find.call_args_list:
+            # mongomock agrega _id a la proyección que recibe
+            self.assertLessEqual(set(llamada.args[1]), {'_id', 'nombre'})
+
+
+class ApiViewTests(MongomockViewTestCase):
+    """
+    Propósito: /api/ responde siempre en JSON (401, 400, 404) y su página sale de query_cache hasta un bump().
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.db['clientes'].insert_one({'nombre': 'Ana', 'email': 'ana@gmail.com', 'fecha_registro': datetime(2024, 5, 2)})
+
+    def _nombres(self):
+        respuesta = self.client.get(reverse('api', args=['clientes']))
+        self.assertEqual(respuesta.status_code, 200)
+        return [doc['nombre'] for doc in respuesta.json()['items']]
+
+    def test_filtro_desconocido(self):
+        respuesta = self.client.get(reverse('api', args=['nada']))
+        self.assertEqual(respuesta.status_code, 404)
+        self.assertEqual(respuesta.json(), {'error': 'Filtro desconocido: nada.'})
+
+    def test_formulario_invalido(self):
+        respuesta = self.client.get(reverse('api', args=['clientes']), {'registrado_desde': 'ayer', 'limite': 0})
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(set(respuesta.json()['errors']), {'registrado_desde', 'limite'})
+
+    @override_settings(QUERY_CACHE={'ENABLED': True})
+    def test_insercion_invalida_la_pagina(self):
+        query_cache.bump(self.db.name, 'clientes')
+        self.assertEqual(self._nombres(), ['Ana'])
+        # Sin pasar por la app la generación no cambia: la página sigue en la cache
+        self.db['clientes'].insert_one({'nombre': 'Beto', 'email': 'beto@gmail.com'})
+        self.assertEqual(self._nombres(), ['Ana'])
+        respuesta = self.client.post(reverse('insert_cliente'), {
+            'nombre': 'Carla', 'email': 'carla@gmail.com', 'fecha_registro': '2024-05-03',
+            'direccion': 'Calle 1', 'telefono': '+56912345678',
+        })
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertEqual(self._nombres(), ['Ana', 'Beto', 'Carla'])
+
+
+class SinSesionTests(SimpleTestCase):
+    """
+    Propósito: Sin credenciales /api/ responde 401 en JSON y las vistas asíncronas redirigen al login.
+    """
+
+    def test_api(self):
+        respuesta = Client().get(reverse('api', args=['home']))
+        self.assertEqual(respuesta.status_code, 401)
+        self.assertIn('error', respuesta.json())
+
+    def test_async_sin_credenciales(self):
+        respuesta = Client().get(reverse('async_home'))
+        self.assertRedirects(respuesta, reverse('login'), fetch_redirect_response=False)
+
+    def test_async_sin_conexion(self):
+        with mock.patch('core.async_views.async_registry.get', side_effect=ConnectionError):
+            respuesta = SeededMongoCommand().cliente('usuario', 'clave').get(reverse('async_filter_pedidos_2023'))
+        self.assertRedirects(respuesta, reverse('login'), fetch_redirect_response=False)
+
+
+class StreamingTests(SimpleTestCase):
+    """
+    Propósito: Las respuestas en streaming cierran todos los cursores, también los de secciones no alcanzadas.
+    """
+
+    def _secciones(self, primero):
+        cursores = [mock.MagicMock(), mock.MagicMock()]
+        cursores[0].__iter__.return_value = primero
+        cursores[1].__iter__.return_value = iter([{'nombre': 'Ana'}])
+        return cursores, [('Pedidos', 'pedidos', cursores[0]), ('Clientes', 'clientes', cursores[1])]
+
+    def _fallo(self):
+        yield {'_id': 1}
+        raise RuntimeError('se cortó la conexión')
+
+    def test_fallo_a_mitad_cierra_todos(self):
+        for formato in ('html', 'ndjson'):
+            with self.subTest(formato=formato):
+                cursores, secciones = self._secciones(self._fallo())
+                respuesta = streaming_response(RequestFactory().get('/', {'stream': formato}), 'Prueba', secciones)
+                with self.assertRaises(RuntimeError):
+                    b''.join(respuesta.streaming_content)
+                for cursor in cursores:
+                    cursor.close.assert_called()
+
+    def test_respuesta_sin_recorrer_cierra_todos(self):
+        cursores, secciones = self._secciones(iter([]))
+        streaming_response(RequestFactory().get('/', {'stream': 'ndjson'}), 'Prueba', secciones).close()
+        for cursor in cursores:
+            cursor.close.assert_called()
+
+
+@skipUnless(HAY_MONGOD, 'Requiere mongod en el PATH o MONGO_TEST_URI.')
+class MongodTestCase(SimpleTestCase):
+    """
+    Propósito: Base de las pruebas contra un mongod real cargado con los datos sintéticos de core/seed.py.
+
+    Funcionamiento:
+    - Prepara los datos como check_query_plans (SeededMongoCommand.open_dataset) una vez por clase.
+    - uri apunta los comandos de manage.py al mismo servidor y self.cliente tiene la sesión autenticada.
+
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.comando = SeededMongoCommand(stdout=StringIO(), stderr=StringIO())
+        opciones = {'uri': MONGO_TEST_URI, 'seed': True, 'mongod': 'mongod', 'semilla': 42,
+                    'clientes': 200, 'productos': 20, 'pedidos': 2000}
+        cls.mongo, username, password, ajustes = cls.comando.open_dataset(opciones)
+        cls.addClassCleanup(cls.comando.close_dataset)
+        cls.addClassCleanup(cls.mongo.close)
+        cls.db = cls.mongo['ecommerce_db']
+        cls.uri = MONGO_TEST_URI or (
+            f"mongodb://{username}:{password}@{ajustes['MONGO_CLUSTER_HOST']}/?{ajustes['MONGO_URI_OPTIONS']}"
+        )
+        configuracion = override_settings(QUERY_CACHE={'ENABLED': False}, **ajustes)
+        configuracion.enable()
+        cls.addClassCleanup(configuracion.disable)
+        cls.cliente = cls.comando.cliente(username, password)
+
+
+class RollupsTests(MongodTestCase):
+    """
+    Propósito: Los $inc de cada escritura coinciden con la reconstrucción de rebuild_rollups.
+    """
+
+    def _verificar(self):
+        call_command('rebuild_rollups', '--verify-only', uri=self.uri, stdout=StringIO())
+
+    def test_datos_sinteticos(self):
+        self._verificar()
+
+    def test_insert_pedido(self):
+        pedido = _pedido(cliente_id=str(self.db['clientes'].find_one()['_id']), dia=date.today())
+        dia = datetime.combine(date.today(), datetime.min.time())
+        antes = (self.db[VENTAS_DIA].find_one({'_id': dia}) or {}).get('pedidos', 0)
+        insert_pedido_con_rollups(self.mongo, self.db, pedido)
+        self.assertEqual(self.db[VENTAS_DIA].find_one({'_id': dia})['pedidos'], antes + 1)
+        self._verificar()
+
+    def test_lote_repetido(self):
+        pedidos = marcar_rollups_pendientes([_pedido() for _ in range(3)])
+        # Un intento anterior insertó los pedidos y cayó antes de aplicar sus rollups
+        self.db['pedidos'].insert_many([dict(p) for p in pedidos])
+        for _ in range(2):
+            writer = BatchWriter(self.db['pedidos'], after_batch=aplicar_rollups_pendientes)
+            writer.submit(marcar_rollups_pendientes(pedidos), 3)
+            writer.close()
+            self.assertEqual(writer.duplicates, 3)
+            self._verificar()
+
+    def test_rebuild_corrige(self):
+        self.db[VENTAS_DIA].update_one({}, {'$inc': {'pedidos': 5}})
+        with self.assertRaises(CommandError):
+            self._verificar()
+        call_command('rebuild_rollups', uri=self.uri, stdout=StringIO())
+        self._verificar()
+        self.assertIn('_id.mes_1_monto_-1', self.db[CLIENTES_MES].index_information())
+        self.assertEqual(self.db['pedidos'].count_documents({ROLLUPS_PENDIENTES: True}), 0)
+
+    def test_reportes(self):
+        respuesta = self.cliente.get(reverse('reportes'))
+        self.assertEqual(respuesta.status_code, 200)
+        desde = datetime.combine(date.today() - timedelta(days=29), datetime.min.time())
+        self.assertEqual(sum(d['pedidos'] for d in respuesta.context['reporte']['ventas_dia']),
+                         self.db['pedidos'].count_documents({'fecha_pedido': {'$gte': desde}}))
+
+
+class AsyncViewsTests(MongodTestCase):
+    """
+    Propósito: Cada vista asíncrona muestra la misma página que su versión síncrona, con y sin filas perezosas.
+    """
+
+    VISTAS = {
+        'home': ['clientes', 'pedidos'],
+        'filter_clientes_ultimo_ano': ['clientes'],
+        'filter_pedidos_monto_100': ['pedidos'],
+        'filter_clientes_gmail': ['clientes'],
+        'filter_pedidos_producto_101': ['pedidos'],
+        'filter_clientes_pedidos_500_ultimo_ano': ['clientes'],
+    }
+
+    def _pagina(self, nombre, colecciones):
+        respuesta = self.cliente.get(reverse(nombre))
+        self.assertEqual(respuesta.status_code, 200)
+        return {c: [(doc['_id'], (doc.get('cliente') or {}).get('nombre')) for doc in respuesta.context[c].items]
+                for c in colecciones}
+
+    def test_mismas_paginas(self):
+        for lazy in (False, True):
+            for nombre, colecciones in self.VISTAS.items():
+                with self.subTest(vista=nombre, lazy=lazy), override_settings(MONGO_LAZY_ROWS=lazy):
+                    sincrona = self._pagina(nombre, colecciones)
+                    self.assertTrue(any(sincrona.values()))
+                    self.assertEqual(self._pagina(f'async_{nombre}', colecciones), sincrona)
+
+
+@skipUnless(HAY_MONGOD, 'Requiere mongod en el PATH o MONGO_TEST_URI.')
+class QueryPlansTests(SimpleTestCase):
+    """
+    Propósito: Ejecuta check_query_plans (capture_view_commands + check_plans) sobre los datos sintéticos.
+    """
+
+    def test_planes_de_las_vistas(self):
+        salida = StringIO()
+        opciones = {'uri': MONGO_TEST_URI, 'seed': True} if MONGO_TEST_URI else {}
+        # Falla con CommandError si un plan usa COLLSCAN, examina de más o una vista no responde 200
+        call_command('check_query_plans', '--json', clientes=500, productos=20, pedidos=3000,
+                     stdout=salida, stderr=StringIO(), **opciones)
+        informe = json_util.loads(salida.getvalue())
+        self.assertFalse(informe['errors'])
+
+        # La página siguiente (SIGUIENTES) explica la condición keyset con $or
+        siguientes = [forma for forma in informe['shapes'] if any(v.endswith(':siguiente') for v in forma['views'])]
+        self.assertTrue(siguientes)
+        self.assertTrue(any('$or' in json_util.dumps(forma['command']) for forma in siguientes))
+        for forma in siguientes:
+            self.assertNotIn('COLLSCAN', forma['plan']['stages'])
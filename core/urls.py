@@ -17,7 +17,7 @@ Including another URLconf
 
 
 from django.urls import path
-from . import views
+from . import views, async_views
 
 urlpatterns = [
     path('', views.home_view, name='home'),
@@ -29,7 +29,24 @@ urlpatterns = [
     path('filter_clientes_ultimo_ano/', views.filter_clientes_ultimo_ano, name='filter_clientes_ultimo_ano'),
     path('filter_pedidos_monto_100/', views.filter_pedidos_monto_100, name='filter_pedidos_monto_100'),
     path('filter_clientes_gmail/', views.filter_clientes_gmail, name='filter_clientes_gmail'),
+    path('filter_clientes_dominio/<str:dominio>/', views.filter_clientes_dominio, name='filter_clientes_dominio'),
     path('filter_pedidos_2023/', views.filter_pedidos_2023, name='filter_pedidos_2023'),
     path('filter_pedidos_producto_101/', views.filter_pedidos_producto_101, name='filter_pedidos_producto_101'),
     path('filter_clientes_pedidos_500_ultimo_ano/', views.filter_clientes_pedidos_500_ultimo_ano, name='filter_clientes_pedidos_500_ultimo_ano'),
+    path('filtro/<str:coleccion>/', views.filtro_view, name='filtro'),
+    path('reportes/', views.reportes_view, name='reportes'),
+    path('buscar/', views.buscar_view, name='buscar'),
+    path('export/<str:filtro>/', views.export_view, name='export'),
+    path('api/<str:filtro>/', views.api_view, name='api'),
+    path('stats/mongo/', views.mongo_stats_view, name='mongo_stats'),
+
+    # Versiones asíncronas de los listados (servir con mongo/asgi.py)
+    path('async/home/', async_views.home_view, name='async_home'),
+    path('async/filter_clientes_ultimo_ano/', async_views.filter_clientes_ultimo_ano, name='async_filter_clientes_ultimo_ano'),
+    path('async/filter_pedidos_monto_100/', async_views.filter_pedidos_monto_100, name='async_filter_pedidos_monto_100'),
+    path('async/filter_clientes_gmail/', async_views.filter_clientes_gmail, name='async_filter_clientes_gmail'),
+    path('async/filter_clientes_dominio/<str:dominio>/', async_views.filter_clientes_dominio, name='async_filter_clientes_dominio'),
+    path('async/filter_pedidos_2023/', async_views.filter_pedidos_2023, name='async_filter_pedidos_2023'),
+    path('async/filter_pedidos_producto_101/', async_views.filter_pedidos_producto_101, name='async_filter_pedidos_producto_101'),
+    path('async/filter_clientes_pedidos_500_ultimo_ano/', async_views.filter_clientes_pedidos_500_ultimo_ano, name='async_filter_clientes_pedidos_500_ultimo_ano'),
 ]
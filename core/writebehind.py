@@ -0,0 +1,248 @@
+# core/writebehind.py
+import atexit
+import os
+import queue
+import threading
+import time
+
+from bson import ObjectId, json_util
+from bson.json_util import CANONICAL_JSON_OPTIONS
+from django.conf import settings
+from pymongo import WriteConcern
+from pymongo.errors import BulkWriteError
+
+from .bulk import DUPLICATE_KEY
+from .cache import query_cache
+from .mongo import registry
+from .rollups import apply_rollups
+
+# Escritura diferida de insert_pedido para picos de pedidos: la vista encola el pedido y un
+# hilo lo escribe junto con otros en un insert_many. Se activa con WRITE_BEHIND['ENABLED'].
+
+_FIN = object()
+
+
+def _write_behind_setting(name, default):
+    return getattr(settings, 'WRITE_BEHIND', {}).get(name, default)
+
+
+def enabled():
+    return _write_behind_setting('ENABLED', False)
+
+
+def spill_path():
+    return _write_behind_setting('SPILL_FILE', None)
+
+
+def read_spill(path):
+    """
+    Propósito: Lee un archivo de derrame y retorna [(base de datos, pedido)].
+    """
+    with open(path, encoding='utf-8') as archivo:
+        return [
+            (linea['db'], linea['pedido'])
+            for linea in (json_util.loads(texto, json_options=CANONICAL_JSON_OPTIONS) for texto in archivo if texto.strip())
+        ]
+
+
+class WriteBehindBuffer:
+    """
+    Propósito: Cola acotada de pedidos que un hilo escribe en lotes con insert_many.
+
+    Funcionamiento:
+    - submit(client, db, pedido) asigna el _id del pedido y lo encola. Si la cola
+      (MAX_QUEUE) está llena espera hasta PUT_TIMEOUT segundos (backpressure sobre los
+      requests); si sigue llena retorna False y la vista escribe el pedido directamente.
+    - El hilo junta hasta BATCH_SIZE pedidos o espera como mucho MAX_LATENCY_MS desde el
+      primero, y escribe cada lote con un insert_many sin orden con WRITE_CONCERN (por
+      defecto el del cliente); los rollups de los pedidos escritos se aplican con un solo
+      bulk_write por colección (sin transacción) y se incrementa la generación de pedidos
+      en query_cache.
+    - Como el _id se asigna al encolar, reintentar un lote es idempotente: los duplicados
+      cuentan como escritos.
+    - Los pedidos cuyo insert falla y, al cerrar el proceso (atexit), los pedidos aún en
+      cola se agregan a SPILL_FILE en Extended JSON canónico con fsync; manage.py
+      replay_write_behind los escribe después. Si fallan solo los rollups de pedidos ya
+      escritos no se derrama nada: se cuentan en rollups_failed y los corrige
+      manage.py rebuild_rollups.
+    - Cada pedido encolado mantiene prestado su cliente del registro (core.mongo) hasta
+      escribirse, para que el registro no lo cierre mientras espera en la cola.
+    - Tras un fork el proceso hijo empieza con una cola vacía y sin hilo.
+
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._reset()
+        self._counters = {'queued': 0, 'written': 0, 'duplicates': 0, 'failed': 0, 'spilled': 0, 'batches': 0, 'rejected': 0,
+                          'rollups_failed': 0}
+
+    def _reset(self):
+        self._queue = queue.Queue(maxsize=_write_behind_setting('MAX_QUEUE', 10000))
+        self._thread = None
+        self._pid = os.getpid()
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._reset()
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._counters[name] += n
+
+    def _ensure_worker(self):
+        with self._lock:
+            if os.getpid() != self._pid:
+                self._reset()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+                self._thread.start()
+
+    def submit(self, client, db, pedido):
+        self._ensure_worker()
+        pedido.setdefault('_id', ObjectId())
+        prestado = registry.retain(client)
+        try:
+            self._queue.put((client, db.name, pedido), timeout=_write_behind_setting('PUT_TIMEOUT', 1.0))
+        except queue.Full:
+            if prestado:
+                registry.release(client)
+            self._count('rejected')
+            return False
+        self._count('queued')
+        return True
+
+    def _run(self):
+        batch_size = _write_behind_setting('BATCH_SIZE', 500)
+        max_latency = _write_behind_setting('MAX_LATENCY_MS', 50) / 1000
+        while True:
+            item = self._queue.get()
+            if item is _FIN:
+                return
+            lote, limite = [item], time.monotonic() + max_latency
+            while len(lote) < batch_size:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if item is _FIN:
+                    self._flush(lote)
+                    return
+                lote.append(item)
+            self._flush(lote)
+
+    def _flush(self, lote):
+        # Un insert_many por cliente y base de datos (las sesiones pueden usar credenciales distintas)
+        grupos = {}
+        for client, db_name, pedido in lote:
+            grupos.setdefault((id(client), db_name), (client, db_name, []))[2].append(pedido)
+        for client, db_name, pedidos in grupos.values():
+            db = client[db_name]
+            try:
+                escritos = self._insert(db, pedidos)
+            except Exception:
+                # El insert_many falló entero: se derraman todos (reintentarlos es idempotente)
+                self._count('failed', len(pedidos))
+                self.spill(db_name, pedidos)
+                continue
+            if escritos:
+                self._rollups(db, escritos)
+                query_cache.bump(db_name, 'pedidos')
+        for client, _, _ in lote:
+            registry.release(client)
+        self._count('batches')
+
+    def _insert(self, db, pedidos):
+        # Retorna los pedidos escritos; derrama los que fallaron por algo distinto de un duplicado
+        opciones = _write_behind_setting('WRITE_CONCERN', None)
+        wc = WriteConcern(**opciones) if opciones else None
+        no_escritos, duplicados, fallidos = set(), 0, []
+        try:
+            db.get_collection('pedidos', write_concern=wc).insert_many(pedidos, ordered=False)
+        except BulkWriteError as exc:
+            for error in exc.details.get('writeErrors', []):
+                no_escritos.add(error['index'])
+                if error.get('code') == DUPLICATE_KEY:
+                    duplicados += 1
+                else:
+                    fallidos.append(pedidos[error['index']])
+        escritos = [p for i, p in enumerate(pedidos) if i not in no_escritos]
+        self._count('written', len(escritos))
+        self._count('duplicates', duplicados)
+        if fallidos:
+            self._count('failed', len(fallidos))
+            self.spill(db.name, fallidos)
+        return escritos
+
+    def _rollups(self, db, escritos):
+        # Los pedidos ya están escritos: si los rollups fallan no se derraman (al reintentarlos
+        # serían duplicados y sus rollups no se aplicarían); se cuentan y rebuild_rollups los corrige
+        if not getattr(settings, 'ROLLUPS', {}).get('ENABLED', True):
+            return
+        try:
+            apply_rollups(db, escritos)
+        except Exception:
+            self._count('rollups_failed', len(escritos))
+
+    def spill(self, db_name, pedidos):
+        path = spill_path()
+        if not path or not pedidos:
+            return
+        lineas = ''.join(
+            json_util.dumps({'db': db_name, 'pedido': pedido}, json_options=CANONICAL_JSON_OPTIONS) + '\n'
+            for pedido in pedidos
+        )
+        with self._spill_lock, open(path, 'a', encoding='utf-8') as archivo:
+            archivo.write(lineas)
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        self._count('spilled', len(pedidos))
+
+    def close(self, timeout=None):
+        """
+        Propósito: Detiene el hilo tras escribir lo que alcance en timeout y derrama el resto.
+
+        Funcionamiento:
+        - timeout por defecto es SHUTDOWN_TIMEOUT; se registra con atexit.
+        - Los pedidos que sigan en la cola al vencer el plazo se agregan a SPILL_FILE.
+
+        """
+        if os.getpid() != self._pid:
+            return
+        timeout = _write_behind_setting('SHUTDOWN_TIMEOUT', 5) if timeout is None else timeout
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            try:
+                self._queue.put(_FIN, timeout=timeout)
+            except queue.Full:
+                pass
+            thread.join(timeout)
+        pendientes = {}
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _FIN:
+                pendientes.setdefault(item[1], []).append(item[2])
+        for db_name, pedidos in pendientes.items():
+            self.spill(db_name, pedidos)
+        self._thread = None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats['pending'] = self._queue.qsize()
+        return stats
+
+
+write_behind = WriteBehindBuffer()
+atexit.register(write_behind.close)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=write_behind._reset_after_fork)
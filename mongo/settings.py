@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -48,6 +49,8 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "core.instrumentation.MongoInstrumentationMiddleware",
+    "core.mongo.MongoLeaseMiddleware",
 ]
 
 ROOT_URLCONF = "mongo.urls"
@@ -121,3 +124,171 @@ STATIC_URL = "static/"
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# MongoDB
+# Un MongoClient de larga vida por credenciales (ver core/mongo.py)
+
+MONGO_CLUSTER_HOST = "cluster0.cc5wfzr.mongodb.net"
+
+MONGO_URI_OPTIONS = "retryWrites=true&w=majority&appName=Cluster0"
+
+MONGO_URI_SCHEME = "mongodb+srv"  # "mongodb" para un mongod sin SRV (p. ej. manage.py benchmark)
+
+MONGO_POOL = {
+    "MAX_CLIENTS": 32,  # Clientes distintos (credenciales) por proceso
+    "IDLE_TIMEOUT": 300,  # Segundos sin uso antes de cerrar un cliente
+    "MAX_POOL_SIZE": 50,  # Conexiones por cliente
+    "MIN_POOL_SIZE": 0,
+    "MAX_IDLE_TIME_MS": 60000,
+    "CONNECT_TIMEOUT_MS": 10000,
+    "SERVER_SELECTION_TIMEOUT_MS": 10000,
+}
+
+# Paginación keyset de los listados (ver core/pagination.py)
+
+MONGO_PAGE_SIZE = 50
+
+MONGO_MAX_PAGE_SIZE = 500
+
+# Filas perezosas en los listados paginados (ver core/rows.py): cada documento se guarda
+# como BSON crudo y se decodifica al primer acceso desde la plantilla. manage.py row_memory
+# mide la diferencia de memoria por fila contra los dicts.
+MONGO_LAZY_ROWS = False
+
+# Modo streaming de los listados (?stream=html|ndjson, ver core/streaming.py)
+
+MONGO_STREAM_BATCH_SIZE = 500
+
+MONGO_STREAM_CHUNK_ROWS = 100
+
+# Conexión de servicio para comandos de manage.py y chequeos de inicio
+# (los requests usan las credenciales de la sesión)
+
+MONGO_DB_NAME = "ecommerce_db"
+
+MONGO_SERVICE_URI = None  # Por defecto se usa la variable de entorno MONGO_URI
+
+# Advierte al iniciar si alguna vista consulta sin índice (ver core/checks.py)
+MONGO_CHECK_INDEXES_ON_STARTUP = False
+
+# Límite de tiempo de las agregaciones de las vistas (maxTimeMS)
+MONGO_AGGREGATION_TIME_LIMIT_MS = 30000
+
+# Búsqueda de clientes y productos (ver core/queries.py, busqueda): resultados por defecto
+# y límite de tiempo de cada búsqueda (maxTimeMS)
+MONGO_SEARCH_LIMIT = 20
+
+MONGO_SEARCH_TIME_LIMIT_MS = 2000
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Con varios workers conviene un backend compartido (Redis/Memcached) para que la
+# versión del catálogo sea la misma en todos.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # Sesiones con SESSION_STORE = "cache"
+    "sessions": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "sessions",
+    },
+}
+
+# Sesiones fuera de SQLite: cada request solo lee mongo_username, mongo_password y el token
+# de credenciales verificadas. "cache" usa CACHES["sessions"] (memoria local: con varios
+# workers debe ser un backend compartido); "file" las guarda en SESSION_FILE_PATH; "db"
+# vuelve a la tabla django_session.
+SESSION_STORE = os.environ.get("SESSION_STORE", "cache")
+
+SESSION_ENGINE = {
+    "cache": "django.contrib.sessions.backends.cache",
+    "file": "django.contrib.sessions.backends.file",
+    "db": "django.contrib.sessions.backends.db",
+}[SESSION_STORE]
+
+SESSION_CACHE_ALIAS = "sessions"
+
+SESSION_FILE_PATH = os.environ.get("SESSION_FILE_PATH")  # None = directorio temporal del sistema
+
+# Segundos durante los que una sesión con credenciales ya verificadas no vuelve a hacer
+# ping al crear su cliente (ver core/mongo.py, verified_token)
+MONGO_VERIFIED_TTL = 300
+
+# Cache del catálogo de productos (ver core/cache.py)
+CATALOG_CACHE = {
+    "ALIAS": "default",
+    "TTL": 300,  # Segundos
+    "MAX_ENTRIES": 8,  # Versiones/bases en la LRU local
+    "MAX_BYTES": 16 * 1024 * 1024,  # Tamaño BSON máximo de la LRU local
+    "CHANGE_STREAM": False,  # Invalida con un change stream sobre productos
+}
+
+# Tamaño de los bloques enviados por las exportaciones (ver core/exports.py)
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+# Rollups de ventas mantenidos en cada insert_pedido y bulk_import (ver core/rollups.py).
+# TRANSACTIONS: con None, insert_pedido escribe el pedido y sus $inc en una transacción si el
+# servidor es replica set o sharded. En un standalone (o con False) son dos escrituras y una
+# caída entre ambas deja los rollups cortos hasta ejecutar manage.py rebuild_rollups.
+ROLLUPS = {
+    "ENABLED": True,
+    "TRANSACTIONS": None,
+}
+
+# Días de ventas diarias que muestra /reportes/ sin rango de fechas (desde rollup_ventas_dia)
+REPORTES_DIAS = 30
+
+# Cache de resultados de los filtros (ver core/cache.py, QueryCache). Las generaciones por
+# colección viven en CACHES[ALIAS]: con varios workers debe ser un backend compartido para
+# que una inserción invalide en todos.
+QUERY_CACHE = {
+    "ENABLED": True,
+    "ALIAS": "default",
+    "TTL": 60,  # Segundos
+    "TTLS": {},  # TTL por colección, p. ej. {"clientes": 300}
+    "MAX_ENTRIES": 256,
+    "MAX_BYTES": 32 * 1024 * 1024,  # Tamaño BSON máximo de la LRU local
+    "WAIT_TIMEOUT": 30,  # Segundos que espera un request a que otro calcule la misma consulta
+}
+
+# Instrumentación de comandos de MongoDB por request (ver core/instrumentation.py).
+# Las estadísticas por vista se consultan en /stats/mongo/ con un usuario staff o con la
+# cabecera X-Stats-Token igual a STATS_TOKEN.
+MONGO_INSTRUMENTATION = {
+    "ENABLED": True,
+    # Tamaño BSON de las respuestas ya decodificadas. El driver no expone el tamaño de la
+    # respuesta cruda y medirla cuesta volver a codificarla, por eso está desactivado; las
+    # respuestas RawBSONDocument (MONGO_LAZY_ROWS) se miden siempre, sin costo.
+    "MEASURE_BYTES": False,
+    "STATS_TOKEN": os.environ.get("MONGO_STATS_TOKEN"),
+}
+
+# Hints de índice en los filtros (ver core/queries.py). Desactivado por defecto: un hint
+# a un índice que no existe hace fallar la consulta. Activar solo donde se haya ejecutado
+# manage.py ensure_indexes (core/indexes.py); con False se deja elegir al planificador.
+MONGO_FILTER_HINTS = False
+
+# Escritura diferida de insert_pedido (ver core/writebehind.py): los pedidos se encolan y
+# un hilo por proceso los escribe en lotes con insert_many. Lo que no se alcance a escribir
+# al cerrar el proceso queda en SPILL_FILE (manage.py replay_write_behind).
+WRITE_BEHIND = {
+    "ENABLED": False,
+    "BATCH_SIZE": 500,  # Pedidos por insert_many
+    "MAX_LATENCY_MS": 50,  # Espera máxima desde el primer pedido del lote
+    "MAX_QUEUE": 10000,  # Pedidos en cola por proceso
+    "PUT_TIMEOUT": 1.0,  # Segundos que espera un request con la cola llena antes de escribir directo
+    # None usa el write concern del cliente, como el resto de las escrituras; {"w": 1}
+    # responde antes pero un pedido confirmado puede perderse si cae el primario
+    "WRITE_CONCERN": None,
+    "SHUTDOWN_TIMEOUT": 5,  # Segundos para vaciar la cola al cerrar antes de derramar
+    "SPILL_FILE": os.environ.get("WRITE_BEHIND_SPILL_FILE", str(BASE_DIR / "pedidos_pendientes.ndjson")),
+}
+
+# Nombre y email de los clientes en los listados de pedidos (ver core/cache.py, ClienteResolver)
+CLIENTE_CACHE = {
+    "TTL": 60,  # Segundos
+    "MAX_ENTRIES": 10000,
+    "MAX_BYTES": 4 * 1024 * 1024,
+}